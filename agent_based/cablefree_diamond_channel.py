@@ -35,228 +35,533 @@
 # .1.3.6.1.4.1.91111.4.80.1.1.2.1.13 --> currentRxModulation / ModulationType
 # .1.3.6.1.4.1.91111.4.80.1.1.2.1.14 --> txMuteStatus / INTEGER  { muteoff ( 0 ) , muteon ( 1 ) } 
 # .1.3.6.1.4.1.91111.4.80.1.1.2.1.15 --> modemLockStatus / INTEGER  { unlocked ( 0 ) , locked ( 1 ) } 
+#
+# The live columns and the location are fetched by the
+# cablefree_diamond_device section. Frequencies, TR side and bandwidth are
+# static and come from the cablefree_diamond_config section, which is
+# fetched at a long interval.
+# Frequencies, TR spacing and side are reported to the HW/SW inventory by
+# inventory_cablefree_diamond.py, not by this check.
+#
+# When the hop goes down, every channel loses its lock and reports LINK DOWN
+# along with the RSL, SNR and modulation of a dead link. With the parameter
+# "Dependency on the hop state" set, these problems are reported as OK while
+# "Diamond Hop State" is CRIT, so the outage alerts once per device.
+
+import math
+import time
 
 from cmk.base.plugins.agent_based.agent_based_api.v1 import (
+    check_levels,
+    Metric,
     register,
-    SNMPTree,
-    exists,
     Service,
-    check_levels,
     Result,
     State,
     render,
     get_value_store,
 )
-from cmk.base.plugins.agent_based.agent_based_api.v1.type_defs import StringTable
-
-
-def parse_sysDescr(string_table):
-    parsed = {}
-    for row in string_table:
-        channel_id = row[0]
-        parsed[channel_id] = {
-            'channelStatusIndex': row[0],
-            'channelStatuslocation': row[1],
-            'txFrequency': row[2],
-            'rxFrequency': row[3],
-            'trSpacing': row[4],
-            'trSide': row[5],
-            'bandWidth': row[6],
-            'capacity': row[7],
-            'rsl': row[8],
-            'snr': row[9],
-            'txPower': row[10],
-            'currentTxModulation': row[11],
-            'currentRxModulation': row[12],
-            'txMuteStatus': row[13],
-            'modemLockStatus': row[14],
-        }
-    return parsed
-
-register.snmp_section(
-    name='cablefree_diamond_channel',
-    detect = exists(".1.3.6.1.4.1.91111.4.80.1.1.1.*"),  # Check if generalStatusTable exists
-    fetch=SNMPTree(
-        base='.1.3.6.1.4.1.91111.4.80.1.1.2.1',
-        oids=[
-            '1',  #channelStatusIndex
-            '2',  #channelStatuslocation
-            '3',  #txFrequency
-            '4',  #rxFrequency
-            '5',  #trSpacing
-            '6',  #trSide
-            '7',  #bandWidth
-            '8',  #capacity
-            '9',  #rsl
-            '10',  #snr
-            '11',  #txPower
-            '12',  #currentTxModulation
-            '13',  #currentRxModulation
-            '14',  #txMuteStatus
-            '15',  #modemLockStatus
-        ],
-    ),
-    parse_function=parse_sysDescr,
+from .utils.cablefree_diamond import (
+    aggregate_samples,
+    availability_since,
+    ChannelConfig,
+    ChannelState,
+    check_flapping,
+    check_value,
+    damping_params,
+    histogram_shares,
+    hop_dependent,
+    hours_to_level,
+    is_flapping,
+    load_state,
+    MODULATION_NAMES,
+    monitored_here,
+    new_samples,
+    pack_trend,
+    quantile_estimate,
+    render_modulation,
+    store_state,
+    update_availability,
+    update_damped,
+    update_histogram,
+    update_quantile,
+    update_trend,
 )
+from .utils.cablefree_diamond_profiling import instrument_check
+
+
+# Time constant of the RSL/SNR trends in minutes
+TREND_PERIOD = 60
+
+# Learned RSL/SNR baseline: percentile, margin below it in dB and samples
+# needed before it is used
+BASELINE_DEFAULTS = {
+    'percentile': 5.0,
+    'margin': 3.0,
+    'learning': 1440,
+}
+
+# Rolling availability window in hours, at most AVAILABILITY_HOURS
+AVAILABILITY_WINDOW = 24
+
+# Time constant of the time-in-modulation histograms in days
+MODULATION_PERIOD = 30
+
+
+def _either(preferred, fallback):
+    return fallback if preferred is None else preferred
+
+
+def _migrate_state(value_store, item):
+    """Convert the per-key layout of older versions"""
+    def pop(name):
+        value = value_store.pop(f"cablefree_diamond_channel_{item}_{name}", None)
+        return None if value is None else int(value)
+
+    return ChannelState(
+        bandwidth=pop('bandwidth'),
+        tx_modulation=pop('tx_modulation'),
+        rx_modulation=pop('rx_modulation'),
+    )
+
+
+def _update_trends(channel_data, params, state, now):
+    period = params.get('trend_period', TREND_PERIOD) * 60
+    trends = {}
+    for name in ('rsl', 'snr'):
+        value = getattr(channel_data, name)
+        if value is not None:
+            trends[name] = update_trend(getattr(state, f'{name}_trend'), now, value, period)
+    return trends
+
+
+def _check_trends(params, trends):
+    for name, label, unit in (('rsl', 'RSL', 'dBm'), ('snr', 'SNR', 'dB')):
+        trend = trends.get(name)
+        if trend is None:
+            continue
+        yield from check_levels(
+            trend.slope,
+            label=f'{label} trend',
+            metric_name=f'cablefree_diamond_channel_{name}_trend',
+            render_func=lambda v: f'{v:+.2f}dB/h',
+            notice_only=True,
+        )
+        yield Result(
+            state=State.OK,
+            notice=f'{label} mean {trend.mean:.1f}{unit}, deviation {math.sqrt(trend.variance):.2f}dB',
+        )
+
+    # project the smoothed RSL onto the critical level, once it is crossed
+    # the RSL levels themselves alert
+    rsl_levels = params.get('rsl')
+    horizon = params.get('trend_horizon')
+    rsl_trend = trends.get('rsl')
+    if rsl_levels and horizon and rsl_trend is not None:
+        if rsl_trend.mean <= rsl_levels[1]:
+            yield Result(state=State.OK, notice=f'RSL mean already below {rsl_levels[1]}dBm')
+            return
+        hours = hours_to_level(rsl_trend, rsl_levels[1])
+        if hours is not None and hours <= horizon:
+            yield Result(
+                state=State.WARN,
+                summary=f'RSL projected to reach {rsl_levels[1]}dBm in {render.timespan(hours * 3600)}',
+            )
 
 
-def discovery_cablefree_diamond_channel(section):
-    for channel_id in section:
-        yield Service(item=channel_id)
+def _baseline_params(params):
+    baseline = dict(BASELINE_DEFAULTS)
+    baseline.update(params.get('baseline') or {})
+    return baseline
 
 
-def check_cablefree_diamond_channel(item, params, section):
+def _below_baseline(value, record, baseline):
+    """Distance below the learned percentile, None while learning or above"""
+    samples, learned = quantile_estimate(record)
+    if value is None or learned is None or samples < baseline['learning']:
+        return None
+    return learned - value if value < learned - baseline['margin'] else None
+
+
+def _update_baselines(channel_data, params, state):
+    # always learned, so switching the anomaly mode on needs no learning time.
+    # Unlocked and anomalous readings are left out, a long fade must not
+    # drag the baseline down until it looks normal.
+    baseline = _baseline_params(params)
+    baselines = {}
+    if channel_data.modem_locked is False:
+        return baselines
+    for name in ('rsl', 'snr'):
+        value = getattr(channel_data, name)
+        record = getattr(state, f'{name}_baseline')
+        if value is not None and _below_baseline(value, record, baseline) is None:
+            baselines[name] = update_quantile(record, value, baseline['percentile'] / 100)
+    return baselines
+
+
+def _check_baselines(channel_data, params, state):
+    """Compare with the baselines learned before this reading"""
+    if 'baseline' not in params:
+        return
+    baseline = _baseline_params(params)
+    for name, label, unit in (('rsl', 'RSL', 'dBm'), ('snr', 'SNR', 'dB')):
+        value = getattr(channel_data, name)
+        samples, learned = quantile_estimate(getattr(state, f'{name}_baseline'))
+        if value is None or learned is None or samples < baseline['learning']:
+            yield Result(
+                state=State.OK,
+                notice=f'{label} baseline: learning ({samples}/{baseline["learning"]} samples)',
+            )
+            continue
+        below = _below_baseline(value, getattr(state, f'{name}_baseline'), baseline)
+        if below is not None:
+            yield Result(
+                state=State.WARN,
+                summary=f'{label} {value}{unit} is {below:.1f}dB below its learned '
+                f'{baseline["percentile"]:g}th percentile {learned:.1f}{unit}',
+            )
+        else:
+            yield Result(
+                state=State.OK,
+                notice=f'{label} baseline: {baseline["percentile"]:g}th percentile {learned:.1f}{unit}',
+            )
+
+
+def _update_availability(channel_data, state, now, utc_offset):
+    return update_availability(
+        state.availability_hours,
+        state.availability_days,
+        state.poll_time,
+        state.locked,
+        now,
+        channel_data.modem_locked,
+        utc_offset,
+    )
+
+
+def _check_availability(params, hours, days, now, utc_offset):
+    """SLA figures of today, the last 30 days and the rolling window"""
+    availability = params.get('availability') or {}
+    window = availability.get('window', AVAILABILITY_WINDOW)
+    today = (now + utc_offset) // 86400
+    periods = (
+        ('day', 'today', availability_since(days, today)),
+        ('month', '30 days', availability_since(days, today - 29)),
+        ('window', f'{window} hours', availability_since(hours, (now + utc_offset) // 3600 - window + 1)),
+    )
+    for name, label, figures in periods:
+        if figures.percent is None:
+            continue
+        yield from check_levels(
+            figures.percent,
+            levels_lower=availability.get(f'levels_{name}'),
+            label=f'Availability {label}',
+            metric_name=f'cablefree_diamond_channel_availability_{name}',
+            render_func=lambda v: f'{v:.3f}%',
+            notice_only=name != 'month',
+        )
+        yield from check_levels(
+            figures.outages,
+            levels_upper=availability.get(f'outages_{name}'),
+            label=f'Outages {label}',
+            metric_name=f'cablefree_diamond_channel_outages_{name}',
+            render_func=lambda v: f'{v:.0f}',
+            notice_only=True,
+        )
+        yield Metric(f'cablefree_diamond_channel_unlocked_time_{name}', figures.unlocked)
+        yield Result(
+            state=State.OK,
+            notice=f'Unlocked {label}: {render.timespan(figures.unlocked)} '
+            f'of {render.timespan(figures.observed)} observed',
+        )
+
+
+def _update_modulation_time(params, state, now):
+    # the time since the last check is accounted to the modulation seen then
+    elapsed = now - state.poll_time if state.poll_time is not None else 0
+    period = params.get('modulation_period', MODULATION_PERIOD) * 86400
+    return {
+        direction: update_histogram(
+            getattr(state, f'{direction}_modulation_time'),
+            getattr(state, f'{direction}_modulation'),
+            elapsed,
+            period,
+        ) for direction in ('tx', 'rx')
+    }
+
+
+def _check_modulation_time(params, histograms):
+    shares = {direction: histogram_shares(record) for direction, record in histograms.items()}
+    if not any(shares.values()):
+        return
+    for direction, direction_shares in shares.items():
+        for level, share in enumerate(direction_shares or []):
+            yield Metric(f'cablefree_diamond_channel_{direction}_modulation_time_{level}', share)
+
+    lines = [
+        f'{name}: ' + ' / '.join(
+            '-' if shares[direction] is None else f'{shares[direction][level]:.1f}%'
+            for direction in ('tx', 'rx'))
+        for level, name in MODULATION_NAMES.items()
+        if any(direction_shares and direction_shares[level] for direction_shares in shares.values())
+    ]
+    yield Result(state=State.OK, notice='Time in modulation (TX / RX):\n' + '\n'.join(lines))
+
+    below = params.get('modulation_below')
+    if not below:
+        return
+    level = below['level']
+    for direction, label in (('tx', 'TX'), ('rx', 'RX')):
+        if shares[direction] is None:
+            continue
+        yield from check_levels(
+            sum(shares[direction][:level]),
+            levels_upper=below.get('levels'),
+            label=f'{label} time below {MODULATION_NAMES[level]}',
+            metric_name=f'cablefree_diamond_channel_{direction}_modulation_below',
+            render_func=lambda v: f'{v:.2f}%',
+            notice_only=True,
+        )
+
+
+def _update_samples(item, section, state):
+    """Aggregate the sampler records newer than the last check"""
+    records = section.get(item, []) if section else []
+    if not records:
+        return None, state.sample_seq
+    return (aggregate_samples(item, new_samples(records, state.sample_seq)),
+            max(r.seq for r in records))
+
+
+def _check_samples(samples, params):
+    """Fades between two check cycles, seen by the high-resolution sampler"""
+    yield Result(
+        state=State.OK,
+        notice=f'Sampler: {samples.samples} samples in {render.timespan(samples.seconds)}',
+    )
+    for name, label, unit in (('rsl', 'RSL', 'dBm'), ('snr', 'SNR', 'dB')):
+        if getattr(samples, f'{name}_min') is None:
+            continue
+        yield Result(
+            state=State.OK,
+            notice=f'{label} min/avg/max/5th percentile: ' + ' / '.join(
+                f'{getattr(samples, f"{name}_{stat}")}{unit}' for stat in ('min', 'avg', 'max', 'p5')),
+        )
+    if samples.rsl_min is not None:
+        yield from check_levels(
+            samples.rsl_min,
+            levels_lower=params.get('rsl'),
+            label='RSL minimum (sampled)',
+            metric_name='cablefree_diamond_channel_rsl_min',
+            render_func=lambda v: f'{v}dBm',
+            notice_only=True,
+        )
+    for stat in ('rsl_p5', 'snr_min', 'snr_p5'):
+        value = getattr(samples, stat)
+        if value is not None:
+            yield Metric(f'cablefree_diamond_channel_{stat}', value)
+    yield from check_levels(
+        samples.unlocked,
+        levels_upper=params.get('sample_unlocks'),
+        label='Unlocked samples',
+        metric_name='cablefree_diamond_channel_unlocked_samples',
+        render_func=lambda v: f'{v:.0f}',
+        notice_only=not samples.unlocked,
+    )
+
+
+def _update_damping(channel_data, config, damping, state, now):
+    """Dampened bandwidth and modulations, seeded with the last readings"""
+    readings = (
+        ('bandwidth', config.bandwidth, damping.get('bandwidth_step', 1)),
+        ('tx_modulation', channel_data.tx_modulation, damping.get('modulation_step', 1)),
+        ('rx_modulation', channel_data.rx_modulation, damping.get('modulation_step', 1)),
+    )
+    records, damped = {}, {}
+    for name, value, step in readings:
+        records[name], damped[name] = update_damped(
+            getattr(state, f'{name}_damping'),
+            value,
+            now,
+            hold_down=damping['hold_down'],
+            min_step=step,
+            window=damping['flap_window'] * 60,
+            initial=getattr(state, name),
+        )
+    return records, damped
+
+
+def _check_damped(label, damped, damping, now, render_func):
+    yield from check_flapping(label, damped, damping)
+    if damped.pending is not None:
+        yield Result(
+            state=State.OK,
+            notice=f'{label} {render_func(damped.pending)} held down for '
+            f'{render.timespan(now - damped.pending_since)} of {render.timespan(damping["hold_down"])}',
+        )
+
+
+def discovery_cablefree_diamond_channel(
+    section_cablefree_diamond_device,
+    section_cablefree_diamond_config,
+    section_cablefree_diamond_samples,
+):
+    if not section_cablefree_diamond_device:
+        return
+    for channel_id, row in section_cablefree_diamond_device.channels.items():
+        if monitored_here(section_cablefree_diamond_device, row):
+            yield Service(item=channel_id)
+
+
+def _check_cablefree_diamond_channel(
+    item,
+    params,
+    section_cablefree_diamond_device,
+    section_cablefree_diamond_config,
+    section_cablefree_diamond_samples,
+):
+    section = section_cablefree_diamond_device.channels if section_cablefree_diamond_device else {}
     if item not in section:
         return
     
     channel_data = section[item]
+    config = None
+    if section_cablefree_diamond_config is not None:
+        config = section_cablefree_diamond_config.channels.get(item)
+    if config is None:
+        config = ChannelConfig(item, None, None, None, None, None)
     value_store = get_value_store()
     
-    # State management keys
-    bandwidth_key = f"cablefree_diamond_channel_{item}_bandwidth"
-    tx_modulation_key = f"cablefree_diamond_channel_{item}_tx_modulation"
-    rx_modulation_key = f"cablefree_diamond_channel_{item}_rx_modulation"
+    state = load_state(value_store, ChannelState, lambda vs: _migrate_state(vs, item))
+    now = int(time.time())
+    utc_offset = time.localtime(now).tm_gmtoff
+    trends = _update_trends(channel_data, params, state, now)
+    baselines = _update_baselines(channel_data, params, state)
+    hours, days = _update_availability(channel_data, state, now, utc_offset)
+    modulation_time = _update_modulation_time(params, state, now)
+    damping = damping_params(params)
+    damping_records, damped = _update_damping(channel_data, config, damping, state, now)
+    samples, sample_seq = _update_samples(item, section_cablefree_diamond_samples, state)
     
-    summary = f"Channel {channel_data['channelStatusIndex']} is {channel_data['channelStatuslocation']}"
-    
-    yield from check_levels(
-        int(channel_data['txFrequency']),
-        levels_upper=params.get('txFrequency', None),
-        label='TX Frequency',
-        metric_name=f'cablefree_diamond_channel_{item}_tx_frequency',
-        render_func=lambda v: normalize_value(v, 1000, ['kHz', 'MHz', 'GHz'])
-    )
-    yield from check_levels(
-        int(channel_data['rxFrequency']),
-        levels_upper=params.get('rxFrequency', None),
-        label='RX Frequency',
-        metric_name=f'cablefree_diamond_channel_{item}_rx_frequency',
-        render_func=lambda v: normalize_value(v, 1000, ['kHz', 'MHz', 'GHz'])
-    )
-    yield from check_levels(
-        int(channel_data['trSpacing']),
-        levels_upper=params.get('trSpacing', None),
-        label='TR Spacing',
-        metric_name=f'cablefree_diamond_channel_{item}_tr_spacing',
-        render_func=lambda v: normalize_value(v, 1000, ['kHz', 'MHz', 'GHz'])
-    )
-    summary += f", TR Side is {channel_data['trSide']}"
+    summary = f"Channel {channel_data.index} is {'remote' if channel_data.is_remote else 'local'}"
     
-    # Bandwidth change monitoring
-    current_bandwidth = int(channel_data['bandWidth'])
-    previous_bandwidth = value_store.get(bandwidth_key, current_bandwidth)
+    # Bandwidth change monitoring, dampened
+    current_bandwidth = config.bandwidth
+    bandwidth = damped['bandwidth']
     
-    if previous_bandwidth != current_bandwidth:
-        bandwidth_change = current_bandwidth - previous_bandwidth
+    if not is_flapping(bandwidth, damping) and None not in (bandwidth.stable, bandwidth.previous):
+        bandwidth_change = bandwidth.stable - bandwidth.previous
         if bandwidth_change < 0:
             summary += f", Bandwidth decreased by {normalize_value(abs(bandwidth_change), 1000, ['kHz', 'MHz', 'GHz'])}"
             yield Result(state=State.WARN, summary=summary)
-        else:
+        elif bandwidth_change > 0:
             summary += f", Bandwidth increased by {normalize_value(bandwidth_change, 1000, ['kHz', 'MHz', 'GHz'])}"
+    yield from _check_damped('Bandwidth', bandwidth, damping, now,
+                             lambda v: normalize_value(v, 1000, ['kHz', 'MHz', 'GHz']))
     
-    value_store[bandwidth_key] = current_bandwidth
-    
-    yield from check_levels(
-        current_bandwidth,
-        levels_upper=params.get('bandWidth', None),
-        label='Bandwidth',
-        metric_name=f'cablefree_diamond_channel_{item}_band_width',
-        render_func=lambda v: normalize_value(v, 1000, ['kHz', 'MHz', 'GHz'])
-    )
+    # Without the config section (not fetched yet, or no row for the
+    # channel) the bandwidth is unknown, which is no problem of the channel
+    if current_bandwidth is not None:
+        yield from check_value(
+            current_bandwidth,
+            levels_upper=params.get('bandWidth', None),
+            label='Bandwidth',
+            metric_name='cablefree_diamond_channel_band_width',
+            render_func=lambda v: normalize_value(v, 1000, ['kHz', 'MHz', 'GHz'])
+        )
     
-    # Get bandwidth values
-    current_capacity = int(channel_data['capacity'])
-    
-    
-    yield from check_levels(
-        int(channel_data['capacity']),
+    yield from check_value(
+        channel_data.capacity,
         levels_upper=params.get('capacity', None),
         label='Capacity',
-        metric_name=f'cablefree_diamond_channel_{item}_capacity',
+        metric_name='cablefree_diamond_channel_capacity',
         render_func=lambda v: normalize_value(v, 1000, ['Kbps', 'Mbps', 'Gbps'])
     )
     
-    yield from check_levels(
-        int(channel_data['rsl']) / 10,
+    yield from check_value(
+        channel_data.rsl,
         levels_lower=params.get('rsl', None),
         label='RSL',
-        metric_name=f'cablefree_diamond_channel_{item}_rsl',
+        metric_name='cablefree_diamond_channel_rsl',
         render_func=lambda v: f'{v}dBm'
     )
     
-    yield from check_levels(
-        int(channel_data['snr']) / 10,
+    yield from check_value(
+        channel_data.snr,
         levels_upper=params.get('snr', None),
         label='SNR',
-        metric_name=f'cablefree_diamond_channel_{item}_snr',
+        metric_name='cablefree_diamond_channel_snr',
         render_func=lambda v: f'{v}dB'
     )
-    yield from check_levels(
-        int(channel_data['txPower']),
+    yield from _check_trends(params, trends)
+    yield from _check_baselines(channel_data, params, state)
+    if samples is not None:
+        yield from _check_samples(samples, params)
+    yield from _check_availability(params, hours, days, now, utc_offset)
+    
+    yield from check_value(
+        channel_data.tx_power,
         levels_upper=params.get('txPower', None),
         label='TX Power',
-        metric_name=f'cablefree_diamond_channel_{item}_tx_power',
+        metric_name='cablefree_diamond_channel_tx_power',
         render_func=lambda v: f'{v}dBm'
     )
     
     # Modulation change monitoring
-    current_tx_modulation = channel_data['currentTxModulation']
-    current_rx_modulation = channel_data['currentRxModulation']
-    
-    previous_tx_modulation = value_store.get(tx_modulation_key, current_tx_modulation)
-    previous_rx_modulation = value_store.get(rx_modulation_key, current_rx_modulation)
+    current_tx_modulation = channel_data.tx_modulation
+    current_rx_modulation = channel_data.rx_modulation
     
-    # Check for modulation changes from higher to lower
-    # Assuming modulation values are numeric where higher numbers = higher modulation
-    try:
-        tx_modulation_change = int(current_tx_modulation) - int(previous_tx_modulation)
-        rx_modulation_change = int(current_rx_modulation) - int(previous_rx_modulation)
-        
-        if tx_modulation_change < 0:
-            summary += f", TX Modulation decreased from {previous_tx_modulation} to {current_tx_modulation}"
-            yield Result(state=State.WARN, summary=summary)
-        elif tx_modulation_change > 0:
-            summary += f", TX Modulation increased from {previous_tx_modulation} to {current_tx_modulation}"
-        
-        if rx_modulation_change < 0:
-            summary += f", RX Modulation decreased from {previous_rx_modulation} to {current_rx_modulation}"
-            yield Result(state=State.WARN, summary=summary)
-        elif rx_modulation_change > 0:
-            summary += f", RX Modulation increased from {previous_rx_modulation} to {current_rx_modulation}"
-            
-    except ValueError:
-        # If modulation values are not numeric, just display current values
-        pass
+    # Check for modulation changes from higher to lower, dampened
+    # Modulation levels are numeric where higher numbers = higher modulation
+    for direction, label in (('tx', 'TX'), ('rx', 'RX')):
+        modulation = damped[f'{direction}_modulation']
+        if not is_flapping(modulation, damping) and None not in (modulation.stable, modulation.previous):
+            if modulation.stable < modulation.previous:
+                summary += f", {label} Modulation decreased from {render_modulation(modulation.previous)} to {render_modulation(modulation.stable)}"
+                yield Result(state=State.WARN, summary=summary)
+            elif modulation.stable > modulation.previous:
+                summary += f", {label} Modulation increased from {render_modulation(modulation.previous)} to {render_modulation(modulation.stable)}"
+        yield from _check_damped(f'{label} Modulation', modulation, damping, now, render_modulation)
     
-    value_store[tx_modulation_key] = current_tx_modulation
-    value_store[rx_modulation_key] = current_rx_modulation
+    store_state(value_store, state._replace(
+        bandwidth=_either(current_bandwidth, state.bandwidth),
+        tx_modulation=_either(current_tx_modulation, state.tx_modulation),
+        rx_modulation=_either(current_rx_modulation, state.rx_modulation),
+        **{f'{name}_trend': pack_trend(trend) for name, trend in trends.items()},
+        **{f'{name}_baseline': record for name, record in baselines.items()},
+        poll_time=now,
+        locked=channel_data.modem_locked,
+        availability_hours=hours,
+        availability_days=days,
+        **{f'{direction}_modulation_time': record for direction, record in modulation_time.items()},
+        **{f'{name}_damping': record for name, record in damping_records.items()},
+        sample_seq=sample_seq,
+    ))
     
     # Add modulation metrics for graphing
-    tx_modulation_value = int(current_tx_modulation)
-    yield from check_levels(
-        tx_modulation_value,
+    yield from check_value(
+        current_tx_modulation,
         levels_upper=None,  # No thresholds for modulation
         label='TX Modulation',
-        metric_name=f'cablefree_diamond_channel_{item}_tx_modulation',
+        metric_name='cablefree_diamond_channel_tx_modulation',
         render_func=lambda v: f'Level {v}'
     )
     
-    rx_modulation_value = int(current_rx_modulation)
-    yield from check_levels(
-        rx_modulation_value,
+    yield from check_value(
+        current_rx_modulation,
         levels_upper=None,  # No thresholds for modulation
         label='RX Modulation',
-        metric_name=f'cablefree_diamond_channel_{item}_rx_modulation',
+        metric_name='cablefree_diamond_channel_rx_modulation',
         render_func=lambda v: f'Level {v}'
     )
+    yield from _check_modulation_time(params, modulation_time)
     
-    summary += f", Current TX Modulation is {current_tx_modulation}"
-    summary += f", Current RX Modulation is {current_rx_modulation}"
-    summary += f", TX Mute Status is {'Muted' if channel_data['txMuteStatus'] == '1' else 'Unmuted'}"
+    summary += f", Current TX Modulation is {render_modulation(current_tx_modulation)}"
+    summary += f", Current RX Modulation is {render_modulation(current_rx_modulation)}"
+    summary += f", TX Mute Status is {'Muted' if channel_data.tx_muted else 'Unmuted'}"
     
     # Check modem lock status - CRITICAL if unlocked (link down)
-    modem_lock_status = channel_data['modemLockStatus']
-    if modem_lock_status == '0':  # Unlocked
+    if channel_data.modem_locked is False:  # Unlocked
         summary += f", Modem Lock Status is Unlocked (LINK DOWN)"
         yield Result(state=State.CRIT, summary=summary)
         return  # Return early with CRITICAL state
@@ -266,11 +571,32 @@ def check_cablefree_diamond_channel(item, params, section):
     yield Result(state=State.OK, summary=summary)
 
 
+def check_cablefree_diamond_channel(
+    item,
+    params,
+    section_cablefree_diamond_device,
+    section_cablefree_diamond_config,
+    section_cablefree_diamond_samples,
+):
+    yield from hop_dependent(
+        _check_cablefree_diamond_channel(
+            item,
+            params,
+            section_cablefree_diamond_device,
+            section_cablefree_diamond_config,
+            section_cablefree_diamond_samples,
+        ),
+        params,
+        section_cablefree_diamond_device,
+    )
+
+
 register.check_plugin(
     name='cablefree_diamond_channel',
     service_name='Diamond Channel %s',  # %s will be replaced with the channel ID
+    sections=['cablefree_diamond_device', 'cablefree_diamond_config', 'cablefree_diamond_samples'],
     discovery_function=discovery_cablefree_diamond_channel,
-    check_function=check_cablefree_diamond_channel,
+    check_function=instrument_check('cablefree_diamond_channel', check_cablefree_diamond_channel),
     check_ruleset_name='cablefree_diamond',
     check_default_parameters={},
 )
@@ -1,144 +1,94 @@
 """
-Checkmk SNMP check for CableFree Diamond radios – aggregated channel summaries
+Checkmk SNMP check for CableFree Diamond radios – channel summary table
 --------------------------------------------------------------------------
 
-This agent‑based plugin supplements the existing per‑channel check by
-producing a handful of services that summarise key metrics across all
-radio channels.  Rather than yielding one service per channel, it
-creates one service per metric (bandwidth, capacity, RSL, SNR and TX
-power) and lists the values for each channel on separate lines.  This
-makes it easier to get an overview of the radio’s status when there
-are many channels.
-
-The plugin detects CableFree devices by examining the system description
-OID (.1.3.6.1.2.1.1.1.0) for the string "CableFree GigaBit Ethernet
-Switch".  It then performs a bulk SNMP walk of the channel status table
-(.1.3.6.1.4.1.91111.4.80.1.1.2.1) to retrieve the same OIDs used by the
-per‑channel check:
+This agent‑based plugin supplements the per‑channel check with a single
+service per device, "Diamond Channel Summary".  Its summary gives the
+number of channels, its details hold one aligned table with a row per
+channel (local and remote) and the columns defined in ``_COLUMNS``
+below: location, TX and RX frequency, bandwidth, capacity, RSL, SNR,
+TX power and the TX and RX modulation.  This makes it easier to get an
+overview of the radio's status when there are many channels.
+
+CableFree devices are detected by the section via the system description
+(.1.3.6.1.2.1.1.1.0, "CableFree GigaBit Ethernet Switch") or the
+sysObjectID, which Checkmk fetches for every SNMP host anyway.
+
+The plugin does not declare an SNMP section of its own.  It subscribes to
+the ``cablefree_diamond_device`` section shared by all Diamond checks, so
+the channel status table (.1.3.6.1.4.1.91111.4.80.1.1.2.1) is walked
+exactly once per poll cycle and parsed once for all plugins.
+The static columns (frequencies, bandwidth) come from the
+``cablefree_diamond_config`` section, which is fetched at a long interval.
+The columns used are a subset of those of the per-channel check:
 
     1  channelStatusIndex
     2  channelStatuslocation
-    3  txFrequency (kHz)
-    4  rxFrequency (kHz)
-    5  trSpacing (kHz)
-    6  trSide
-    7  bandWidth (kHz)
+    3  txFrequency (kHz, config)
+    4  rxFrequency (kHz, config)
+    7  bandWidth (kHz, config)
     8  capacity (Kbps)
     9  rsl (dBm × 10)
     10 snr (dB × 10)
     11 txPower (dBm)
     12 currentTxModulation
     13 currentRxModulation
-    14 txMuteStatus
-    15 modemLockStatus
-
-For each metric listed in the ``SUMMARY_METRICS`` constant below, the
-discovery function yields a new service.  The check function then
-iterates over every channel in the SNMP section, extracts the relevant
-metric and appends it to a list of summary lines.  Numeric values are
-converted to appropriate units: bandwidth remains in kHz, capacity in
-Kbps, RSL and SNR are divided by 10 to yield dBm/dB, and TX power is
-shown in dBm.
-
-If no channels are discovered (e.g. because the device did not respond
-or returned no rows), the service reports “no data” instead of an
-empty summary.  All summary services are reported with an OK state
-because this check does not implement threshold handling; thresholds
-should continue to be applied via the per‑channel check.
+
+The section already holds converted values: bandwidth in kHz, capacity
+in Kbps, RSL and SNR in dBm/dB and TX power in dBm.  Values the device
+reported as garbage, and the static columns while the config section is
+missing, are shown as "?".
+
+If the device section holds no channels, the service reports "no channel
+data" instead of an empty table.  The service is always OK because it
+implements no threshold handling; thresholds are applied by the
+per‑channel check.
 
 To enable this plugin, drop it into ``local/lib/check_mk/base/plugins/agent_based/``
-on your Checkmk site and run a service discovery.  It can coexist with
-the original per‑channel plugin because it registers under a different
-SNMP section and check name.
+on your Checkmk site together with ``cablefree_diamond_device.py`` (which
+provides the section) and run a service discovery.
 """
 
 from cmk.base.plugins.agent_based.agent_based_api.v1 import (
-    SNMPTree,
     Service,
     Result,
     State,
     register,
-    exists,
-)
-
-# ---------------------------------------------------------------------------
-# SNMP section – fetches the same channel status table as
-# cablefree_diamond_channel.  Checkmk caches SNMP responses per host so
-# the device is not actually queried twice.
-# ---------------------------------------------------------------------------
-
-def _parse_channel_table(string_table):
-    parsed = {}
-    for row in string_table:
-        channel_id = row[0]
-        parsed[channel_id] = {
-            'channelStatusIndex':    row[0],
-            'channelStatuslocation': row[1],
-            'txFrequency':           row[2],
-            'rxFrequency':           row[3],
-            'trSpacing':             row[4],
-            'trSide':                row[5],
-            'bandWidth':             row[6],
-            'capacity':              row[7],
-            'rsl':                   row[8],
-            'snr':                   row[9],
-            'txPower':               row[10],
-            'currentTxModulation':   row[11],
-            'currentRxModulation':   row[12],
-            'txMuteStatus':          row[13],
-            'modemLockStatus':       row[14],
-        }
-    return parsed
-
-
-register.snmp_section(
-    name="cablefree_diamond_channel_summary",
-    detect=exists(".1.3.6.1.4.1.91111.4.80.1.1.1.*"),
-    fetch=SNMPTree(
-        base=".1.3.6.1.4.1.91111.4.80.1.1.2.1",
-        oids=["1","2","3","4","5","6","7","8","9","10","11","12","13","14","15"],
-    ),
-    parse_function=_parse_channel_table,
 )
+from .utils.cablefree_diamond import ChannelConfig, render_modulation
+from .utils.cablefree_diamond_profiling import instrument_check
 
 
 # ---------------------------------------------------------------------------
 # Table column definitions
 # Each entry is (header_label, extractor_callable).
-# The extractor receives a channel_data dict and returns a display string.
+# The extractor receives a parsed ChannelRow and its ChannelConfig and
+# returns a display string.
 # ---------------------------------------------------------------------------
 
-def _rsl(d):
-    return f"{int(d['rsl']) / 10.0:.1f} dBm"
-
-def _snr(d):
-    return f"{int(d['snr']) / 10.0:.1f} dB"
+def _fmt(value, unit, fmt="{}"):
+    if value is None:
+        return "?"
+    return f"{fmt.format(value)} {unit}"
 
 _COLUMNS = [
-    ("Ch",       lambda d: d.get("channelStatusIndex", "?")),
-    ("Location", lambda d: d.get("channelStatuslocation", "?")),
-    ("Tx Freq",  lambda d: f"{d.get('txFrequency', '?')} kHz"),
-    ("Rx Freq",  lambda d: f"{d.get('rxFrequency', '?')} kHz"),
-    ("BW",       lambda d: f"{d.get('bandWidth', '?')} kHz"),
-    ("Capacity", lambda d: f"{d.get('capacity', '?')} Kbps"),
-    ("RSL",      _rsl),
-    ("SNR",      _snr),
-    ("Tx Pwr",   lambda d: f"{d.get('txPower', '?')} dBm"),
-    ("Tx Mod",   lambda d: d.get("currentTxModulation", "?")),
-    ("Rx Mod",   lambda d: d.get("currentRxModulation", "?")),
+    ("Ch",       lambda d, c: d.index),
+    ("Location", lambda d, c: "remote" if d.is_remote else "local"),
+    ("Tx Freq",  lambda d, c: _fmt(c.tx_frequency, "kHz")),
+    ("Rx Freq",  lambda d, c: _fmt(c.rx_frequency, "kHz")),
+    ("BW",       lambda d, c: _fmt(c.bandwidth, "kHz")),
+    ("Capacity", lambda d, c: _fmt(d.capacity, "Kbps")),
+    ("RSL",      lambda d, c: _fmt(d.rsl, "dBm", "{:.1f}")),
+    ("SNR",      lambda d, c: _fmt(d.snr, "dB", "{:.1f}")),
+    ("Tx Pwr",   lambda d, c: _fmt(d.tx_power, "dBm")),
+    ("Tx Mod",   lambda d, c: render_modulation(d.tx_modulation)),
+    ("Rx Mod",   lambda d, c: render_modulation(d.rx_modulation)),
 ]
 
 
-def _safe_cell(fn, channel_data):
-    """Call an extractor function safely, returning '?' on any error."""
-    try:
-        return str(fn(channel_data))
-    except (ValueError, TypeError, KeyError):
-        return "?"
-
-
-def _build_table(section):
+def _build_table(section, config=None):
     """Return a plain-text aligned table for all channels in *section*."""
+    channel_config = config.channels if config is not None else {}
     headers = [hdr for hdr, _ in _COLUMNS]
     extractors = [fn for _, fn in _COLUMNS]
 
@@ -154,7 +104,8 @@ def _build_table(section):
     # Build all cell strings first so we can compute column widths.
     rows = []
     for channel_id in sorted_ids:
-        rows.append([_safe_cell(fn, section[channel_id]) for fn in extractors])
+        cfg = channel_config.get(channel_id) or ChannelConfig(channel_id, None, None, None, None, None)
+        rows.append([fn(section[channel_id], cfg) for fn in extractors])
 
     # Column width = max of header width and widest data cell.
     widths = [
@@ -174,9 +125,9 @@ def _build_table(section):
 # Discovery – a single service per device
 # ---------------------------------------------------------------------------
 
-def discovery_diamond_channel_summary(section):
+def discovery_diamond_channel_summary(section_cablefree_diamond_device, section_cablefree_diamond_config):
     """Yield one summary service when any channel data is present."""
-    if section:
+    if section_cablefree_diamond_device and section_cablefree_diamond_device.channels:
         yield Service()
 
 
@@ -184,14 +135,15 @@ def discovery_diamond_channel_summary(section):
 # Check
 # ---------------------------------------------------------------------------
 
-def check_diamond_channel_summary(section):
+def check_diamond_channel_summary(section_cablefree_diamond_device, section_cablefree_diamond_config):
     """Produce an aligned table of all channels and their key metrics."""
+    section = section_cablefree_diamond_device.channels if section_cablefree_diamond_device else {}
     if not section:
         yield Result(state=State.OK, summary="no channel data")
         return
 
     n = len(section)
-    table = _build_table(section)
+    table = _build_table(section, section_cablefree_diamond_config)
     yield Result(
         state=State.OK,
         summary=f"{n} channel(s)",
@@ -205,8 +157,10 @@ def check_diamond_channel_summary(section):
 
 register.check_plugin(
     name="cablefree_diamond_channel_summary",
+    # Shares the sections of the per-channel check: one walk, one parse.
+    sections=["cablefree_diamond_device", "cablefree_diamond_config"],
     # No %s – produces exactly one service named "Diamond Channel Summary".
     service_name="Diamond Channel Summary",
     discovery_function=discovery_diamond_channel_summary,
-    check_function=check_diamond_channel_summary,
+    check_function=instrument_check('cablefree_diamond_channel_summary', check_diamond_channel_summary),
 )
\ No newline at end of file
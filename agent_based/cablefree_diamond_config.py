@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Static configuration of the CableFree Diamond.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# The columns below rarely change. They are fetched by a section of their
+# own, so it can be given a long interval with the rule "Fetch intervals for
+# SNMP sections" (e.g. 6 hours). In between Checkmk hands the persisted
+# section to the general, channel and port checks, which merge it with their
+# live data.
+#
+# The tables are shared with the device section. To walk every column only
+# once per cycle, the index comes from the OID end and the location of a
+# channel from the device section.
+#
+# generalStatusTable
+# .1.3.6.1.4.1.91111.4.80.1.1.1.1.2 --> generalStatuslocation / OCTET STRING
+# .1.3.6.1.4.1.91111.4.80.1.1.1.1.3 --> ipStatus / OCTET STRING
+# .1.3.6.1.4.1.91111.4.80.1.1.1.1.7 --> xpicMode / INTEGER  { disabled ( 0 ) , enabled ( 1 ) }
+# .1.3.6.1.4.1.91111.4.80.1.1.1.1.8 --> siteName / OCTET STRING
+#
+# channelStatusTable
+# .1.3.6.1.4.1.91111.4.80.1.1.2.1.3 --> txFrequency / INTEGER32 ("kHz")
+# .1.3.6.1.4.1.91111.4.80.1.1.2.1.4 --> rxFrequency / INTEGER32 ("kHz")
+# .1.3.6.1.4.1.91111.4.80.1.1.2.1.5 --> trSpacing / INTEGER32 ("kHz")
+# .1.3.6.1.4.1.91111.4.80.1.1.2.1.6 --> trSide / INTEGER  { low ( 0 ) , high ( 1 ) }
+# .1.3.6.1.4.1.91111.4.80.1.1.2.1.7 --> bandWidth / Integer32 ("kHz")
+#
+# portConfigTable
+# .1.3.6.1.4.1.91111.4.80.11.1.2.1.4 --> portSpeed / INTEGER { speedundefined(0), speed10m(1), ... speed10g(6) }
+# .1.3.6.1.4.1.91111.4.80.11.1.2.1.5 --> portFlowctrlEnable / INTEGER { disabled(0), enabled(1) }
+
+from cmk.base.plugins.agent_based.agent_based_api.v1 import (
+    OIDEnd,
+    register,
+    SNMPTree,
+)
+from .utils.cablefree_diamond import DETECT_DIAMOND, parse_config, parse_config_agent
+from .utils.cablefree_diamond_profiling import instrument_parse
+
+
+register.snmp_section(
+    name='cablefree_diamond_config',
+    detect=DETECT_DIAMOND,
+    fetch=[
+        SNMPTree(
+            base='.1.3.6.1.4.1.91111.4.80.1.1.1.1',
+            oids=[
+                OIDEnd(),  # generalStatusIndex
+                '2',  # generalStatuslocation
+                '3',  # ipStatus
+                '7',  # xpicMode
+                '8',  # siteName
+            ],
+        ),
+        SNMPTree(
+            base='.1.3.6.1.4.1.91111.4.80.1.1.2.1',
+            oids=[
+                OIDEnd(),  # channelStatusIndex
+                '3',  # txFrequency
+                '4',  # rxFrequency
+                '5',  # trSpacing
+                '6',  # trSide
+                '7',  # bandWidth
+            ],
+        ),
+        SNMPTree(
+            base='.1.3.6.1.4.1.91111.4.80.11.1.2.1',
+            oids=[
+                OIDEnd(),  # swPortIndex
+                '4',  # portSpeed
+                '5',  # portFlowctrlEnable
+            ],
+        ),
+    ],
+    parse_function=instrument_parse('cablefree_diamond_config', parse_config),
+)
+
+# Same tables delivered by the special agent agent_cablefree_diamond
+register.agent_section(
+    name='cablefree_diamond_config_agent',
+    parsed_section_name='cablefree_diamond_config',
+    parse_function=instrument_parse('cablefree_diamond_config_agent', parse_config_agent),
+)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Live data of a CableFree Diamond in one section.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# The changing columns of the general, channel and port tables and the
+# octet counters of the switch are fetched and parsed together into one
+# DiamondDevice. The general, channel, channel summary, port and
+# utilization checks all subscribe to it, so a host costs one detect and
+# one parse per cycle and every service sees the same snapshot. The
+# channels of both units are paired once here (DiamondDevice.peers).
+#
+# The static columns stay in the cablefree_diamond_config section, which
+# is fetched at a long interval.
+#
+# The columns used are listed in the check plugins:
+# cablefree_diamond_general.py, cablefree_diamond_channel.py,
+# cablefree_diamond_ports.py and cablefree_diamond_utilization.py.
+
+from cmk.base.plugins.agent_based.agent_based_api.v1 import (
+    OIDEnd,
+    register,
+    SNMPTree,
+)
+from .utils.cablefree_diamond import DETECT_DIAMOND, parse_device, parse_device_agent
+from .utils.cablefree_diamond_profiling import instrument_parse
+
+
+register.snmp_section(
+    name='cablefree_diamond_device',
+    detect=DETECT_DIAMOND,
+    fetch=[
+        SNMPTree(
+            base='.1.3.6.1.4.1.91111.4.80.1.1.1.1',
+            oids=[
+                '1',  # generalStatusIndex
+                '4',  # temperature
+                '5',  # tr1RSSI
+                '6',  # tr2RSSI
+                '9',  # systemUptime
+                '10',  # mcuUptime
+                '11',  # systemAlarm
+            ],
+        ),
+        SNMPTree(
+            base='.1.3.6.1.4.1.91111.4.80.1.1.2.1',
+            oids=[
+                '1',  # channelStatusIndex
+                '2',  # channelStatuslocation
+                '8',  # capacity
+                '9',  # rsl
+                '10',  # snr
+                '11',  # txPower
+                '12',  # currentTxModulation
+                '13',  # currentRxModulation
+                '14',  # txMuteStatus
+                '15',  # modemLockStatus
+            ],
+        ),
+        SNMPTree(
+            base='.1.3.6.1.4.1.91111.4.80.11.1.2.1',
+            oids=[
+                '1',  # swPortIndex
+                '2',  # portLink
+                '3',  # portSpeedCurrent
+                '6',  # portFlowctrlRx
+                '7',  # portFlowctrlTx
+            ],
+        ),
+        SNMPTree(
+            base='.1.3.6.1.2.1.31.1.1.1',
+            oids=[
+                OIDEnd(),  # ifIndex
+                '1',  # ifName
+                '6',  # ifHCInOctets
+                '10',  # ifHCOutOctets
+            ],
+        ),
+    ],
+    parse_function=instrument_parse('cablefree_diamond_device', parse_device),
+)
+
+# Same tables delivered by the special agent agent_cablefree_diamond
+register.agent_section(
+    name='cablefree_diamond_device_agent',
+    parsed_section_name='cablefree_diamond_device',
+    parse_function=instrument_parse('cablefree_diamond_device_agent', parse_device_agent),
+)
@@ -31,288 +31,215 @@
 # .1.3.6.1.4.1.91111.4.80.1.1.1.1.9 --> systemUptime / OCTET STRING
 # .1.3.6.1.4.1.91111.4.80.1.1.1.1.10 --> mcuUptime / OCTET STRING
 # .1.3.6.1.4.1.91111.4.80.1.1.1.1.11 --> systemAlarm / INTEGER  { normal ( 0 ) , alarm ( 1 ) } 
+#
+# The live columns are fetched by the cablefree_diamond_device section.
+# Location, IP, XPIC mode and site name are static. They are fetched by the
+# cablefree_diamond_config section and reported to the HW/SW inventory by
+# inventory_cablefree_diamond.py, not by this check.
+#
+# When the hop goes down, the TR RSSI of the receivers and the readings of
+# the remote unit, which travel over the hop, no longer mean much. With the
+# parameter "Dependency on the hop state" set, their problems are reported
+# as OK while "Diamond Hop State" is CRIT. A detected restart is never
+# suppressed: it is reported in one cycle only, and it may well be the cause
+# of the outage.
 
 import time
-from datetime import datetime
 
 from cmk.base.plugins.agent_based.agent_based_api.v1 import (
     register,
-    SNMPTree,
-    exists,
     Service,
-    check_levels,
     Result,
     State,
     render,
     get_value_store,
 )
+from .utils.cablefree_diamond import (
+    check_value,
+    GeneralState,
+    hop_dependent,
+    load_state,
+    monitored_here,
+    RESTART_HISTORY,
+    RESTART_RECORD,
+    ring_append,
+    store_state,
+)
+from .utils.cablefree_diamond_profiling import instrument_check
 
 
-def parse_uptime_to_minutes(uptime_str):
-    """
-    Parse uptime string and convert to minutes.
-    Expected format: "0d 00:24:25" (days, hours:minutes:seconds)
-    """
-    try:
-        # Remove any extra spaces
-        uptime_str = uptime_str.strip()
-        
-        # Split by space to separate days from time
-        parts = uptime_str.split()
-        
-        total_minutes = 0
-        
-        if len(parts) >= 2:
-            # Parse days (e.g., "0d")
-            days_part = parts[0]
-            if days_part.endswith('d'):
-                days = int(days_part[:-1])  # Remove 'd' and convert to int
-                total_minutes += days * 24 * 60
-            
-            # Parse time part (e.g., "00:24:25")
-            time_part = parts[1]
-            time_components = time_part.split(':')
-            
-            if len(time_components) >= 3:
-                hours = int(time_components[0])
-                minutes = int(time_components[1])
-                seconds = int(time_components[2])
-                
-                total_minutes += hours * 60 + minutes + seconds / 60
-            elif len(time_components) == 2:
-                # If only hours:minutes format
-                hours = int(time_components[0])
-                minutes = int(time_components[1])
-                total_minutes += hours * 60 + minutes
-        else:
-            # If no space separator, try to parse as just time
-            time_components = uptime_str.split(':')
-            if len(time_components) >= 3:
-                hours = int(time_components[0])
-                minutes = int(time_components[1])
-                seconds = int(time_components[2])
-                total_minutes += hours * 60 + minutes + seconds / 60
-            elif len(time_components) == 2:
-                hours = int(time_components[0])
-                minutes = int(time_components[1])
-                total_minutes += hours * 60 + minutes
-        
-        return total_minutes
-    except (ValueError, AttributeError, IndexError):
-        # If parsing fails, return 0 to trigger alarm
-        return 0
-
-
-def detect_restart(current_uptime_minutes, previous_uptime_minutes, current_time):
+def detect_restart(current_uptime, previous_uptime, current_time):
     """
     Detect if a restart occurred by comparing current and previous uptime values.
     A restart is detected if current uptime is less than previous uptime.
     """
-    if previous_uptime_minutes is None:
+    if previous_uptime is None or current_uptime is None:
         return False, None
     
-    if current_uptime_minutes < previous_uptime_minutes:
+    if current_uptime < previous_uptime:
         return True, current_time
     
     return False, None
 
 
-def parse_sysDescr(string_table):
-    parsed = {}
-    for row in string_table:
-        instance_id = row[0]
-        parsed[instance_id] = {
-            'generalStatusIndex': row[0],
-            'generalStatuslocation': row[1],
-            'ipStatus': row[2],
-            'temperature': row[3],
-            'tr1RSSI': row[4],
-            'tr2RSSI': row[5],
-            'xpicMode': row[6],
-            'siteName': row[7],
-            'systemUptime': row[8],
-            'mcuUptime': row[9],
-            'systemAlarm': row[10],
-        }
-    return parsed
-
-register.snmp_section(
-    name='cablefree_diamond_general',
-    detect = exists(".1.3.6.1.4.1.91111.4.80.1.1.1.*"),  # Check if generalStatusTable exists
-    fetch=SNMPTree(
-        base='.1.3.6.1.4.1.91111.4.80.1.1.1.1',
-        oids=[
-            '1',  #generalStatusIndex
-            '2',  #generalStatuslocation
-            '3',  #ipStatus
-            '4',  #temperature
-            '5',  #tr1RSSI
-            '6',  #tr2RSSI
-            '7',  #xpicMode
-            '8',  #siteName
-            '9',  #systemUptime
-            '10', #mcuUptime
-            '11', #systemAlarm
-        ],
-    ),
-    parse_function=parse_sysDescr,
-)
+def _to_int(seconds):
+    return None if seconds is None else int(seconds)
+
+
+def _migrate_state(value_store, item):
+    """Convert the per-key layout of older versions (uptimes in minutes)"""
+    def minutes(key):
+        value = value_store.pop(key, None)
+        return None if value is None else int(value * 60)
+
+    def history(key):
+        ring = b''
+        for entry in value_store.pop(key, None) or []:
+            try:
+                values = (int(entry['timestamp']),
+                          int((entry.get('uptime_before') or 0) * 60),
+                          int((entry.get('uptime_after') or 0) * 60))
+            except (KeyError, TypeError, ValueError):
+                continue
+            ring = ring_append(ring, RESTART_RECORD, values, RESTART_HISTORY)
+        return ring
+
+    return GeneralState(
+        system_uptime=minutes(f"system_uptime_{item}"),
+        mcu_uptime=minutes(f"mcu_uptime_{item}"),
+        system_restarts=history(f"system_restart_history_{item}"),
+        mcu_restarts=history(f"mcu_restart_history_{item}"),
+    )
 
 
 def discovery_cablefree_diamond_general(section):
-    for instance_id in section:
-        yield Service(item=instance_id)
+    for instance_id, row in section.general.items():
+        if monitored_here(section, row):
+            yield Service(item=instance_id)
 
 
-def check_cablefree_diamond_general(item, params, section):
-    if item not in section:
-        return
-    
-    instance_data = section[item]
+def _check_restarts(item, instance_data):
+    """Restart results, detected once from the uptimes in the value store"""
     value_store = get_value_store()
-    current_time = time.time()
-    
-    # Parse uptime values
-    system_uptime_str = instance_data['systemUptime']
-    mcu_uptime_str = instance_data['mcuUptime']
-    
-    system_uptime_minutes = parse_uptime_to_minutes(system_uptime_str)
-    mcu_uptime_minutes = parse_uptime_to_minutes(mcu_uptime_str)
-    
-    # Get previous uptime values from value store
-    system_uptime_key = f"system_uptime_{item}"
-    mcu_uptime_key = f"mcu_uptime_{item}"
-    system_restart_history_key = f"system_restart_history_{item}"
-    mcu_restart_history_key = f"mcu_restart_history_{item}"
+    current_time = int(time.time())
+    state = load_state(value_store, GeneralState, lambda vs: _migrate_state(vs, item))
     
-    previous_system_uptime = value_store.get(system_uptime_key)
-    previous_mcu_uptime = value_store.get(mcu_uptime_key)
-    
-    # Initialize restart history if not exists
-    if system_restart_history_key not in value_store:
-        value_store[system_restart_history_key] = []
-    if mcu_restart_history_key not in value_store:
-        value_store[mcu_restart_history_key] = []
-    
-    system_restart_history = value_store[system_restart_history_key]
-    mcu_restart_history = value_store[mcu_restart_history_key]
+    system_uptime = _to_int(instance_data.system_uptime)
+    mcu_uptime = _to_int(instance_data.mcu_uptime)
     
     # Detect restarts
     system_restart_detected, system_restart_time = detect_restart(
-        system_uptime_minutes, previous_system_uptime, current_time
+        system_uptime, state.system_uptime, current_time
     )
     mcu_restart_detected, mcu_restart_time = detect_restart(
-        mcu_uptime_minutes, previous_mcu_uptime, current_time
+        mcu_uptime, state.mcu_uptime, current_time
     )
     
-    # Record restarts if detected
+    # Record restarts if detected, the rings keep the last RESTART_HISTORY
+    system_restarts = state.system_restarts
     if system_restart_detected and system_restart_time:
-        system_restart_history.append({
-            'timestamp': system_restart_time,
-            'uptime_before': previous_system_uptime,
-            'uptime_after': system_uptime_minutes
-        })
-        # Keep only last 10 restarts to avoid memory issues
-        if len(system_restart_history) > 10:
-            system_restart_history = system_restart_history[-10:]
-        value_store[system_restart_history_key] = system_restart_history
-    
+        system_restarts = ring_append(system_restarts, RESTART_RECORD,
+                                      (system_restart_time, state.system_uptime, system_uptime),
+                                      RESTART_HISTORY)
+    mcu_restarts = state.mcu_restarts
     if mcu_restart_detected and mcu_restart_time:
-        mcu_restart_history.append({
-            'timestamp': mcu_restart_time,
-            'uptime_before': previous_mcu_uptime,
-            'uptime_after': mcu_uptime_minutes
-        })
-        # Keep only last 10 restarts to avoid memory issues
-        if len(mcu_restart_history) > 10:
-            mcu_restart_history = mcu_restart_history[-10:]
-        value_store[mcu_restart_history_key] = mcu_restart_history
+        mcu_restarts = ring_append(mcu_restarts, RESTART_RECORD,
+                                   (mcu_restart_time, state.mcu_uptime, mcu_uptime),
+                                   RESTART_HISTORY)
     
     # Store current uptime values for next check
-    value_store[system_uptime_key] = system_uptime_minutes
-    value_store[mcu_uptime_key] = mcu_uptime_minutes
+    store_state(value_store, state._replace(
+        system_uptime=state.system_uptime if system_uptime is None else system_uptime,
+        mcu_uptime=state.mcu_uptime if mcu_uptime is None else mcu_uptime,
+        system_restarts=system_restarts,
+        mcu_restarts=mcu_restarts,
+    ))
+    
+    restart_details = []
+    if system_restart_detected:
+        restart_details.append("System restart detected")
+    if mcu_restart_detected:
+        restart_details.append("MCU restart detected")
+    if not restart_details:
+        return []
+    return [Result(state=State.CRIT, summary='; '.join(restart_details))]
+
+
+def _check_cablefree_diamond_general(item, params, section):
+    instance_data = section.general[item]
     
     # Add uptime metrics for graphing
-    yield from check_levels(
-        system_uptime_minutes * 60,  # Convert to seconds for better time rendering
+    yield from check_value(
+        instance_data.system_uptime,
         levels_upper=None,  # No thresholds for uptime
         label='System Uptime',
-        metric_name=f'cablefree_diamond_general_{item}_system_uptime',
+        metric_name='cablefree_diamond_general_system_uptime',
         render_func=render.timespan  # Use CheckMK's built-in time rendering
     )
     
-    yield from check_levels(
-        mcu_uptime_minutes * 60,  # Convert to seconds for better time rendering
+    yield from check_value(
+        instance_data.mcu_uptime,
         levels_upper=None,  # No thresholds for uptime
         label='MCU Uptime',
-        metric_name=f'cablefree_diamond_general_{item}_mcu_uptime',
+        metric_name='cablefree_diamond_general_mcu_uptime',
         render_func=render.timespan  # Use CheckMK's built-in time rendering
     )
     
     # Build summary
-    generalStatusIndex = instance_data['generalStatusIndex']
-    if generalStatusIndex == '1':
+    if instance_data.is_remote:
         summary = 'Device is Remote'
     else:
         summary = 'Device is Local'
     
-    summary += f", Location is {instance_data['generalStatuslocation']}"
-    summary += f", IP is {instance_data['ipStatus']}"
-    
-    yield from check_levels(
-        int(instance_data['temperature']) / 10,
+    yield from check_value(
+        instance_data.temperature,
         levels_upper=params.get('temperature', None),
         label='Temperature',
-        metric_name=f'cablefree_diamond_general_{item}_temperature',
+        metric_name='cablefree_diamond_general_temperature',
         render_func=lambda v: f'{v}°C'
     )
-    yield from check_levels(
-        int(instance_data['tr1RSSI']),
+    yield from check_value(
+        instance_data.tr1_rssi,
         levels_upper=params.get('tr1RSSI', None),
         label='TR1 RSSI',
-        metric_name=f'cablefree_diamond_general_{item}_tr1RSSI',
+        metric_name='cablefree_diamond_general_tr1RSSI',
         render_func=lambda v: f'{v}mV'
     )
-    yield from check_levels(
-        int(instance_data['tr2RSSI']),
+    yield from check_value(
+        instance_data.tr2_rssi,
         levels_upper=params.get('tr2RSSI', None),
         label='TR2 RSSI',
-        metric_name=f'cablefree_diamond_general_{item}_tr2RSSI',
+        metric_name='cablefree_diamond_general_tr2RSSI',
         render_func=lambda v: f'{v}mV'
     )
     
-    if instance_data['xpicMode'] == '1':
-        summary += ', XPIC is enabled'
-    else:
-        summary += ', XPIC is disabled'
-    
-    summary += f", Site Name is {instance_data['siteName']}"
-    
-    if instance_data['systemAlarm'] == '1':
+    if instance_data.system_alarm:
         summary += ', System Alarm is active'
     else:
         summary += ', System Alarm is inactive'
     
-    # Check for restarts and set appropriate state
-    restart_details = []
-    if system_restart_detected:
-        restart_details.append("System restart detected")
-    if mcu_restart_detected:
-        restart_details.append("MCU restart detected")
-    
-    if restart_details:
-        # Add restart details to summary
-        summary += f" - {'; '.join(restart_details)}"
-        yield Result(state=State.CRIT, summary=summary)
-    else:
-        yield Result(state=State.OK, summary=summary)
+    yield Result(state=State.OK, summary=summary)
+
+
+def check_cablefree_diamond_general(item, params, section):
+    if item not in section.general:
+        return
+    # restarts bypass the hop dependency, see above
+    restarts = _check_restarts(item, section.general[item])
+    yield from hop_dependent(
+        _check_cablefree_diamond_general(item, params, section),
+        params,
+        section,
+    )
+    yield from restarts
 
 
 register.check_plugin(
     name='cablefree_diamond_general',
     service_name='Diamond General Status %s',  # %s will be replaced with the instance ID
+    sections=['cablefree_diamond_device'],
     discovery_function=discovery_cablefree_diamond_general,
-    check_function=check_cablefree_diamond_general,
+    check_function=instrument_check('cablefree_diamond_general', check_cablefree_diamond_general),
     check_ruleset_name='cablefree_diamond',
     check_default_parameters={},
 )
\ No newline at end of file
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# State of the radio hop of a CableFree Diamond as a whole.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+
+# One service per device for the hop, derived from the channel rows of the
+# cablefree_diamond_device section (see hop_channels): CRIT if no channel is
+# locked, WARN if some are not. When the hop goes down every channel, link
+# and general status service may alert as well. Those with the parameter
+# "Dependency on the hop state" set report their problems as OK while the
+# hop is down, so the outage alerts once, here. Restarts and the switch
+# ports are never suppressed.
+
+from cmk.base.plugins.agent_based.agent_based_api.v1 import (
+    Metric,
+    register,
+    Result,
+    Service,
+    State,
+)
+from .utils.cablefree_diamond import hop_channels
+from .utils.cablefree_diamond_profiling import instrument_check
+
+
+def discovery_cablefree_diamond_hop(section):
+    if hop_channels(section):
+        yield Service()
+
+
+def check_cablefree_diamond_hop(section):
+    channels = hop_channels(section)
+    if not channels:
+        return
+    locked = [index for index, state in channels.items() if state]
+    unlocked = [index for index, state in channels.items() if state is False]
+
+    if len(unlocked) == len(channels):
+        yield Result(state=State.CRIT, summary=f'Hop down, all {len(channels)} channels unlocked')
+    elif unlocked:
+        yield Result(
+            state=State.WARN,
+            summary=f'Hop degraded, channel{"s" if len(unlocked) > 1 else ""} '
+            f'{", ".join(unlocked)} unlocked',
+        )
+    else:
+        yield Result(state=State.OK, summary=f'Hop up, {len(locked)} of {len(channels)} channels locked')
+
+    unknown = len(channels) - len(locked) - len(unlocked)
+    if unknown:
+        yield Result(state=State.OK, notice=f'Lock state unknown for {unknown} channels')
+    if not section.links and any(row.is_remote is False for row in section.channels.values()):
+        yield Result(state=State.OK, notice='No channel rows of the remote unit, local ends only')
+
+    yield Metric('cablefree_diamond_hop_locked', len(locked), boundaries=(0, len(channels)))
+    yield Metric('cablefree_diamond_hop_unlocked', len(unlocked), boundaries=(0, len(channels)))
+
+
+register.check_plugin(
+    name='cablefree_diamond_hop',
+    service_name='Diamond Hop State',
+    sections=['cablefree_diamond_device'],
+    discovery_function=discovery_cablefree_diamond_hop,
+    check_function=instrument_check('cablefree_diamond_hop', check_cablefree_diamond_hop),
+)
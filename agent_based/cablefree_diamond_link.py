@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Both ends of a CableFree Diamond radio channel compared.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# The local unit reports the channel rows of the remote unit as well. The
+# cablefree_diamond_device section pairs them when it is parsed
+# (DiamondDevice.links), one service per local channel compares the two
+# directions of the hop:
+#
+#   local to remote: sent with the TX power and modulation of the local row,
+#                    received with the RSL, SNR and RX modulation of the
+#                    remote row
+#   remote to local: the other way round
+#
+# A healthy hop is roughly symmetric. A large RSL or SNR difference between
+# the directions points to a misaligned antenna, a faulty ODU or
+# interference at one end, which the per-channel thresholds do not catch.
+#
+# When the hop goes down, both ends lose their lock and the remote readings
+# go stale, so the link reports CRIT for every channel. With the parameter
+# "Dependency on the hop state" set, this is reported as OK while "Diamond
+# Hop State" is CRIT.
+
+from typing import Optional
+
+from cmk.base.plugins.agent_based.agent_based_api.v1 import (
+    check_levels,
+    Metric,
+    register,
+    Result,
+    Service,
+    State,
+)
+from .utils.cablefree_diamond import ChannelRow, hop_dependent, MODULATION_NAMES, render_modulation
+from .utils.cablefree_diamond_profiling import instrument_check
+
+# Levels 10 and 11 (ACM, ACMM) are modes, not constellations
+CONSTELLATIONS = [level for level, name in MODULATION_NAMES.items() if not name.startswith('ACM')]
+
+
+def _path_loss(sender: ChannelRow, receiver: ChannelRow) -> Optional[float]:
+    if sender.tx_power is None or receiver.rsl is None:
+        return None
+    return sender.tx_power - receiver.rsl
+
+
+def _check_direction(label, metric, sender, receiver):
+    loss = _path_loss(sender, receiver)
+    yield Result(
+        state=State.OK,
+        notice=f'{label}: RSL {receiver.rsl} dBm, SNR {receiver.snr} dB, '
+        f'path loss {"?" if loss is None else f"{loss:.1f}"} dB, '
+        f'modulation {render_modulation(sender.tx_modulation)}',
+    )
+    if loss is not None:
+        yield Metric(f'cablefree_diamond_link_path_loss_{metric}', loss)
+    if (sender.tx_modulation in CONSTELLATIONS and receiver.rx_modulation in CONSTELLATIONS
+            and sender.tx_modulation != receiver.rx_modulation):
+        yield Result(
+            state=State.WARN,
+            summary=f'{label}: sent as {render_modulation(sender.tx_modulation)}, '
+            f'received as {render_modulation(receiver.rx_modulation)}',
+        )
+
+
+def _check_asymmetry(name, label, unit, local_value, remote_value, levels):
+    if local_value is None or remote_value is None:
+        return
+    delta = local_value - remote_value
+    yield from check_levels(
+        abs(delta),
+        levels_upper=levels,
+        label=f'{label} asymmetry',
+        metric_name=f'cablefree_diamond_link_{name}_asymmetry',
+        render_func=lambda v: f'{v:.1f} {unit}',
+    )
+    if delta:
+        yield Result(
+            state=State.OK,
+            notice=f'{label} {abs(delta):.1f} {unit} weaker at the '
+            f'{"remote" if delta > 0 else "local"} unit',
+        )
+
+
+def discovery_cablefree_diamond_link(section):
+    for index in section.links:
+        yield Service(item=index)
+
+
+def _check_cablefree_diamond_link(item, params, section):
+    link = section.links.get(item)
+    if link is None:
+        return
+    local, remote = link
+    yield Result(state=State.OK, summary=f'Local channel {local.index}, remote channel {remote.index}')
+
+    unlocked = [name for name, row in (('local', local), ('remote', remote)) if row.modem_locked is False]
+    if unlocked:
+        units = 'unit' if len(unlocked) == 1 else 'units'
+        yield Result(state=State.CRIT,
+                     summary=f'Modem unlocked at the {" and ".join(unlocked)} {units} (LINK DOWN)')
+        return
+
+    muted = [name for name, row in (('local', local), ('remote', remote)) if row.tx_muted]
+    if len(muted) == 1:
+        yield Result(state=State.WARN, summary=f'TX muted at the {muted[0]} unit only')
+    elif muted:
+        yield Result(state=State.WARN, summary='TX muted at both units')
+
+    yield from _check_asymmetry('rsl', 'RSL', 'dB', local.rsl, remote.rsl, params.get('rsl_asymmetry'))
+    yield from _check_asymmetry('snr', 'SNR', 'dB', local.snr, remote.snr, params.get('snr_asymmetry'))
+    yield from _check_direction('Local to remote', 'tx', local, remote)
+    yield from _check_direction('Remote to local', 'rx', remote, local)
+
+
+def check_cablefree_diamond_link(item, params, section):
+    yield from hop_dependent(_check_cablefree_diamond_link(item, params, section), params, section)
+
+
+register.check_plugin(
+    name='cablefree_diamond_link',
+    service_name='Diamond Link %s',  # %s will be replaced with the local channel ID
+    sections=['cablefree_diamond_device'],
+    discovery_function=discovery_cablefree_diamond_link,
+    check_function=instrument_check('cablefree_diamond_link', check_cablefree_diamond_link),
+    check_ruleset_name='cablefree_diamond_link',
+    check_default_parameters={
+        'rsl_asymmetry': (6.0, 10.0),
+        'snr_asymmetry': (4.0, 8.0),
+    },
+)
@@ -27,108 +27,152 @@
 # .1.3.6.1.4.1.91111.4.80.11.1.2.1.5 --> portFlowctrlEnable / INTEGER { disabled(0), enabled(1) }
 # .1.3.6.1.4.1.91111.4.80.11.1.2.1.6 --> portFlowctrlRxCur / INTEGER { disabled(0), enabled(1) }
 # .1.3.6.1.4.1.91111.4.80.11.1.2.1.7 --> portFlowctrlTxCur / INTEGER { disabled(0), enabled(1) }
+#
+# The live columns are fetched by the cablefree_diamond_device section. The
+# configured speed and flow control come from the cablefree_diamond_config
+# section, which is fetched at a long interval. The configured speed is
+# reported to the HW/SW inventory by inventory_cablefree_diamond.py.
+#
+# The link state is dampened (see update_damped): a port going down is only
+# reported once it stayed down for the hold-down time, and a port that keeps
+# going up and down is reported as flapping instead of at every transition.
+#
+# The discovery rule "Cablefree Diamond port discovery" chooses between one
+# service per port (default), the single service "Diamond Ports" for all
+# ports of a device, or both. Diamond Ports alerts on a link down only for
+# ports expected up: those configured in the parameters, else those that
+# were up at discovery. Up/down counts and the up ports per speed class
+# are reported as metrics.
+#
+# The ports are not hop dependent. Their link state is that of the cabled
+# side of the unit, which does not follow the radio hop: a cable fault or a
+# switch going down must alert even while the hop is down.
+
+import time
 
 from cmk.base.plugins.agent_based.agent_based_api.v1 import (
+    get_value_store,
+    Metric,
     register,
-    SNMPTree,
-    exists,
+    render,
     Service,
     Result,
     State,
 )
-from cmk.base.plugins.agent_based.agent_based_api.v1.type_defs import StringTable
-
-
-# Mapping for port speed values
-PORT_SPEED_MAP = {
-    '0': 'Undefined',
-    '1': '10M',
-    '2': '100M',
-    '3': '1000M',
-    '4': '2500M',
-    '5': '5000M',
-    '6': '10G',
-}
+from .utils.cablefree_diamond import (
+    check_flapping,
+    damping_params,
+    is_flapping,
+    load_state,
+    port_speed_class,
+    PORT_SPEED_MAP,
+    PortConfig,
+    PortState,
+    PortSummaryState,
+    store_state,
+    update_damped,
+)
+from .utils.cablefree_diamond_profiling import instrument_check
+
 
 # Mapping for link status
 LINK_STATUS_MAP = {
-    '0': 'Down',
-    '1': 'Up',
+    False: 'Down',
+    True: 'Up',
 }
 
 # Mapping for flow control status
 FLOW_CTRL_MAP = {
-    '0': 'Disabled',
-    '1': 'Enabled',
+    False: 'Disabled',
+    True: 'Enabled',
 }
 
 
-def parse_cablefree_diamond_ports(string_table):
-    """Parse port configuration data from SNMP"""
-    parsed = {}
-    for row in string_table:
-        port_index = row[0]
-        parsed[port_index] = {
-            'swPortIndex': row[0],
-            'portLink': row[1],
-            'portSpeedCurrent': row[2],
-            'portSpeed': row[3],
-            'portFlowctrlEnable': row[4],
-            'portFlowctrlRxCur': row[5],
-            'portFlowctrlTxCur': row[6],
-        }
-    return parsed
-
-
-register.snmp_section(
-    name='cablefree_diamond_ports',
-    detect=exists(".1.3.6.1.4.1.91111.4.80.11.1.2.*"),  # Check if portConfigTable exists
-    fetch=SNMPTree(
-        base='.1.3.6.1.4.1.91111.4.80.11.1.2.1',
-        oids=[
-            '1',  # swPortIndex
-            '2',  # portLink
-            '3',  # portSpeedCurrent
-            '4',  # portSpeed
-            '5',  # portFlowctrlEnable
-            '6',  # portFlowctrlRxCur
-            '7',  # portFlowctrlTxCur
-        ],
-    ),
-    parse_function=parse_cablefree_diamond_ports,
-)
+# Speed classes counted by Diamond Ports: portSpeedCurrent normalised by
+# port_speed_class, else the configured portSpeed
+SPEED_CLASSES = [speed for speed in PORT_SPEED_MAP.values() if speed != 'Undefined']
 
+DISCOVERY_DEFAULTS = {'mode': 'per_port'}
 
-def discovery_cablefree_diamond_ports(section):
+
+def _sort_key(index):
+    return (0, int(index), '') if index.isdigit() else (1, 0, index)
+
+
+def _update_link(record, port_data, damping, now):
+    return update_damped(
+        record,
+        None if port_data.link_up is None else int(port_data.link_up),
+        now,
+        hold_down=damping['hold_down'],
+        window=damping['flap_window'] * 60,
+    )
+
+
+def _speed_class(port_data, config):
+    speed = port_speed_class(port_data.speed_current)
+    if speed is None and config is not None and config.speed in SPEED_CLASSES:
+        speed = config.speed
+    return speed
+
+
+def _render_pending(link, damping, now):
+    return (f"Link {LINK_STATUS_MAP[bool(link.pending)]} for {render.timespan(now - link.pending_since)}, "
+            f"held down for {render.timespan(damping['hold_down'])}")
+
+
+def discovery_cablefree_diamond_ports(params, section_cablefree_diamond_device, section_cablefree_diamond_config):
     """Discover all ports"""
-    for port_index in section:
+    if params['mode'] not in ('per_port', 'both'):
+        return
+    for port_index in section_cablefree_diamond_device.ports if section_cablefree_diamond_device else {}:
         yield Service(item=port_index)
 
 
-def check_cablefree_diamond_ports(item, section):
+def check_cablefree_diamond_ports(item, params, section_cablefree_diamond_device, section_cablefree_diamond_config):
     """Check port status and configuration"""
+    section = section_cablefree_diamond_device.ports if section_cablefree_diamond_device else {}
     if item not in section:
         return
     
     port_data = section[item]
+    port_config = None
+    if section_cablefree_diamond_config is not None:
+        port_config = section_cablefree_diamond_config.ports.get(item)
+    if port_config is None:
+        port_config = PortConfig(item, None, None)
     
     # Get port link status
-    link_status = LINK_STATUS_MAP.get(port_data['portLink'], 'Unknown')
-    port_speed = PORT_SPEED_MAP.get(port_data['portSpeed'], 'Unknown')
-    speed_current = port_data['portSpeedCurrent']
-    flow_ctrl_enable = FLOW_CTRL_MAP.get(port_data['portFlowctrlEnable'], 'Unknown')
-    flow_ctrl_rx = FLOW_CTRL_MAP.get(port_data['portFlowctrlRxCur'], 'Unknown')
-    flow_ctrl_tx = FLOW_CTRL_MAP.get(port_data['portFlowctrlTxCur'], 'Unknown')
+    speed_current = port_data.speed_current
+    flow_ctrl_enable = FLOW_CTRL_MAP.get(port_config.flowctrl_enable, 'Unknown')
+    flow_ctrl_rx = FLOW_CTRL_MAP.get(port_data.flowctrl_rx, 'Unknown')
+    flow_ctrl_tx = FLOW_CTRL_MAP.get(port_data.flowctrl_tx, 'Unknown')
     
-    # Determine state based on link status
-    if port_data['portLink'] == '1':
+    # Dampen the link state
+    value_store = get_value_store()
+    port_state = load_state(value_store, PortState)
+    now = int(time.time())
+    damping = damping_params(params)
+    link_damping, link = _update_link(port_state.link_damping, port_data, damping, now)
+    store_state(value_store, port_state._replace(link_damping=link_damping))
+    link_up = None if link.stable is None else bool(link.stable)
+    link_status = LINK_STATUS_MAP.get(link_up, 'Unknown')
+    
+    # Determine state based on the dampened link status
+    if is_flapping(link, damping):
+        state = State.OK
+        summary = f"Port {item}: Link flapping, currently {LINK_STATUS_MAP.get(port_data.link_up, 'Unknown')}"
+    elif link_up:
         state = State.OK
-        summary = f"Port {item}: Link {link_status}, Speed: {speed_current} ({port_speed})"
+        summary = f"Port {item}: Link {link_status}, Speed: {speed_current}"
     else:
         state = State.WARN
         summary = f"Port {item}: Link {link_status}"
     
     yield Result(state=state, summary=summary)
+    yield from check_flapping('Link', link, damping)
+    if link.pending is not None:
+        yield Result(state=State.OK, summary=_render_pending(link, damping, now))
     
     # Add flow control information
     flow_info = f"Flow Control: Enable={flow_ctrl_enable}, RX={flow_ctrl_rx}, TX={flow_ctrl_tx}"
@@ -138,7 +182,102 @@ def check_cablefree_diamond_ports(item, section):
 register.check_plugin(
     name='cablefree_diamond_ports',
     service_name='Diamond Port %s',  # %s will be replaced with the port index
+    sections=['cablefree_diamond_device', 'cablefree_diamond_config'],
     discovery_function=discovery_cablefree_diamond_ports,
-    check_function=check_cablefree_diamond_ports,
+    discovery_ruleset_name='cablefree_diamond_ports_discovery',
+    discovery_default_parameters=DISCOVERY_DEFAULTS,
+    check_function=instrument_check('cablefree_diamond_ports', check_cablefree_diamond_ports),
+    check_ruleset_name='cablefree_diamond_ports',
+    check_default_parameters={},
+)
+
+
+def discovery_cablefree_diamond_ports_summary(params, section_cablefree_diamond_device, section_cablefree_diamond_config):
+    """One service for all ports, remembering the ports up at discovery"""
+    if params['mode'] not in ('aggregated', 'both'):
+        return
+    ports = section_cablefree_diamond_device.ports if section_cablefree_diamond_device else {}
+    if ports:
+        yield Service(parameters={
+            'discovered_up': sorted((index for index, port in ports.items() if port.link_up), key=_sort_key),
+        })
+
+
+def _check_port(index, port_data, link, expected_up, damping, now):
+    """State and detail line of one port of Diamond Ports"""
+    link_up = None if link.stable is None else bool(link.stable)
+    text = f"Port {index}: Link {LINK_STATUS_MAP.get(link_up, 'Unknown')}"
+    if link_up:
+        text += f", Speed: {port_data.speed_current}"
+    state = State.OK
+    if is_flapping(link, damping):
+        text += f", flapping ({link.flaps} changes in {render.timespan(damping['flap_window'] * 60)})"
+        if expected_up:
+            state = State.CRIT if link.flaps >= damping['flap_levels'][1] else State.WARN
+    elif link_up is False and expected_up:
+        state = State.WARN
+    if link.pending is not None:
+        text += f", {_render_pending(link, damping, now)}"
+    if not expected_up:
+        text += ", not expected up"
+    return state, text
+
+
+def check_cablefree_diamond_ports_summary(params, section_cablefree_diamond_device, section_cablefree_diamond_config):
+    """All ports of a device in one pass"""
+    ports = section_cablefree_diamond_device.ports if section_cablefree_diamond_device else {}
+    if not ports:
+        return
+    configs = section_cablefree_diamond_config.ports if section_cablefree_diamond_config else {}
+    expected = set(params.get('expected_up', params.get('discovered_up', [])))
+
+    value_store = get_value_store()
+    summary_state = load_state(value_store, PortSummaryState)
+    records = dict(summary_state.links)
+    now = int(time.time())
+    damping = damping_params(params)
+
+    results, links = [], []
+    up, down, speeds = 0, 0, dict.fromkeys(SPEED_CLASSES, 0)
+    for index in sorted(ports, key=_sort_key):
+        port_data = ports[index]
+        record, link = _update_link(records.get(index, b''), port_data, damping, now)
+        links.append((index, record))
+        results.append(_check_port(index, port_data, link, index in expected, damping, now))
+        if link.stable == 1:
+            up += 1
+            speed = _speed_class(port_data, configs.get(index))
+            if speed is not None:
+                speeds[speed] += 1
+        elif link.stable == 0:
+            down += 1
+    store_state(value_store, summary_state._replace(links=tuple(links)))
+
+    yield Result(
+        state=State.OK,
+        summary=f"{len(ports)} ports: {up} up, {down} down, {len(expected)} expected up",
+    )
+    for state, text in results:
+        if state == State.OK:
+            yield Result(state=state, notice=text)
+        else:
+            yield Result(state=state, summary=text)
+
+    yield Metric('cablefree_diamond_ports_up', up, boundaries=(0, len(ports)))
+    yield Metric('cablefree_diamond_ports_down', down, boundaries=(0, len(ports)))
+    for speed, count in speeds.items():
+        yield Metric(f'cablefree_diamond_ports_speed_{speed.lower()}', count)
+
+
+register.check_plugin(
+    name='cablefree_diamond_ports_summary',
+    service_name='Diamond Ports',
+    sections=['cablefree_diamond_device', 'cablefree_diamond_config'],
+    discovery_function=discovery_cablefree_diamond_ports_summary,
+    discovery_ruleset_name='cablefree_diamond_ports_discovery',
+    discovery_default_parameters=DISCOVERY_DEFAULTS,
+    check_function=instrument_check('cablefree_diamond_ports_summary', check_cablefree_diamond_ports_summary),
+    check_ruleset_name='cablefree_diamond_ports',
+    check_default_parameters={},
 )
 
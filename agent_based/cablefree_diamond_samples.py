@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# High-resolution RSL/SNR samples of the CableFree Diamond.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# Written by "cablefree_diamond_sampler dump", one line per sample of the
+# last minutes. RSL and SNR are in tenths of dB, locked is empty if unknown.
+# The channel check aggregates the samples newer than the sequence number
+# it saw last, so the dump does not need to remember anything:
+#
+# <<<cablefree_diamond_samples:sep(9)>>>
+# seq   time        channel locked rsl  snr
+# 8190  1700000000  1       1      -452 371
+# 8191  1700000000  2       1      -467 355
+
+from cmk.base.plugins.agent_based.agent_based_api.v1 import register
+from .utils.cablefree_diamond import parse_samples
+from .utils.cablefree_diamond_profiling import instrument_parse
+
+
+register.agent_section(
+    name='cablefree_diamond_samples',
+    parse_function=instrument_parse('cablefree_diamond_samples', parse_samples),
+)
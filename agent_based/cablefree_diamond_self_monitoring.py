@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Self-monitoring of the CableFree Diamond plugins.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# Reports what the parse and check functions of this host cost since the
+# last check, see utils/cablefree_diamond_profiling.py. The device section
+# is only subscribed to discover the service on Diamonds.
+
+from cmk.base.plugins.agent_based.agent_based_api.v1 import (
+    Metric,
+    register,
+    render,
+    Result,
+    Service,
+    State,
+)
+from .utils.cablefree_diamond_profiling import dump_profile, ENABLED, take_stats, total
+
+
+def _ms(seconds):
+    return f'{seconds * 1000:.1f} ms'
+
+
+def discovery_cablefree_diamond_self_monitoring(section):
+    if section:
+        yield Service()
+
+
+def check_cablefree_diamond_self_monitoring(section):
+    if not ENABLED:
+        yield Result(state=State.OK, summary='Counting disabled, set CABLEFREE_DIAMOND_STATS=on to enable')
+        return
+
+    stats = take_stats()
+    parse = total([value for key, value in stats.items() if key.startswith('parse ')])
+    check = total([value for key, value in stats.items() if key.startswith('check ')])
+    overall = total([parse, check])
+
+    yield Result(
+        state=State.OK,
+        summary=f'Calls: {overall.calls}, parse: {_ms(parse.wall_time)}, '
+        f'check: {_ms(check.wall_time)}, CPU: {_ms(overall.cpu_time)}',
+    )
+    if overall.exceptions:
+        yield Result(state=State.WARN, summary=f'Exceptions: {overall.exceptions}')
+    yield Result(
+        state=State.OK,
+        notice=f'Rows parsed: {parse.rows}, value store: {render.bytes(check.value_store_bytes)}',
+    )
+    for key, value in sorted(stats.items(), key=lambda item: -item[1].wall_time):
+        yield Result(
+            state=State.OK,
+            notice=f'{key}: {value.calls} calls, {_ms(value.wall_time)} wall, '
+            f'{_ms(value.cpu_time)} CPU'
+            + (f', {value.rows} rows' if value.rows else '')
+            + (f', {value.exceptions} exceptions' if value.exceptions else ''),
+        )
+
+    yield Metric('cablefree_diamond_self_calls', overall.calls)
+    yield Metric('cablefree_diamond_self_parse_time', parse.wall_time)
+    yield Metric('cablefree_diamond_self_check_time', check.wall_time)
+    yield Metric('cablefree_diamond_self_cpu_time', overall.cpu_time)
+    yield Metric('cablefree_diamond_self_rows', parse.rows)
+    yield Metric('cablefree_diamond_self_value_store', check.value_store_bytes)
+    yield Metric('cablefree_diamond_self_exceptions', overall.exceptions)
+
+    path = dump_profile()
+    if path:
+        yield Result(state=State.OK, notice=f'cProfile statistics written to {path}')
+
+
+register.check_plugin(
+    name='cablefree_diamond_self_monitoring',
+    service_name='Diamond Plugin Self-Monitoring',
+    sections=['cablefree_diamond_device'],
+    discovery_function=discovery_cablefree_diamond_self_monitoring,
+    check_function=check_cablefree_diamond_self_monitoring,
+)
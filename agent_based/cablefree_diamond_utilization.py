@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Utilization of the CableFree Diamond air interface.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# Example excerpt from SNMP data (IF-MIB, built-in switch):
+# .1.3.6.1.2.1.31.1.1.1.1 --> ifName / DisplayString
+# .1.3.6.1.2.1.31.1.1.1.6 --> ifHCInOctets / Counter64
+# .1.3.6.1.2.1.31.1.1.1.10 --> ifHCOutOctets / Counter64
+#
+# All traffic received on the switch ports is sent over the air and vice
+# versa. The summed port throughput is compared with the air capacity: the
+# capacity of all locked local channels added up, so both polarizations of
+# an XPIC pair count. Unlocked channels carry nothing. The counters are
+# fetched by the cablefree_diamond_device section.
+#
+# The ifXTable may list internal interfaces besides the switch ports, whose
+# traffic would count twice. By default only the interfaces whose ifIndex
+# is a swPortIndex of the switch port table are summed.
+
+import time
+
+from cmk.base.plugins.agent_based.agent_based_api.v1 import (
+    check_levels,
+    get_value_store,
+    Metric,
+    register,
+    render,
+    Result,
+    Service,
+    State,
+)
+from .utils.cablefree_diamond import (
+    COUNTER_RECORD,
+    counter_delta,
+    load_state,
+    MAX_POLL_GAP,
+    store_state,
+    UtilizationState,
+)
+from .utils.cablefree_diamond_profiling import instrument_check
+
+
+def _air_capacity(channels):
+    """Summed capacity of the locked local channels in bit/s"""
+    capacity = 0
+    for channel in channels.values():
+        if channel.is_remote:
+            continue
+        if channel.modem_locked and channel.capacity:
+            capacity += channel.capacity * 1000
+    return capacity
+
+
+def _selected(section, params):
+    """Return the counted ports and whether the user ports were found"""
+    traffic = section.traffic
+    ports = params.get('ports')
+    if ports:
+        return {index: row for index, row in traffic.items() if index in ports or row.name in ports}, True
+    user_ports = {index: row for index, row in traffic.items() if index in section.ports}
+    if user_ports:
+        return user_ports, True
+    return traffic, False
+
+
+def _valid(index, port):
+    """Counters that fit COUNTER_RECORD"""
+    return index.isdigit() and int(index) < 1 << 32 and all(
+        value is not None and 0 <= value < 1 << 64 for value in (port.in_octets, port.out_octets))
+
+
+def _port_rates(ports, state, now):
+    """Return {port: (in, out) octets/s} since the last check"""
+    previous = {str(index): (in_octets, out_octets)
+                for index, in_octets, out_octets in COUNTER_RECORD.iter_unpack(state.counters)}
+    elapsed = now - state.time if state.time is not None else 0
+    if not 0 < elapsed <= MAX_POLL_GAP:
+        return {}
+    rates = {}
+    for index, port in ports.items():
+        if index not in previous or not _valid(index, port):
+            continue
+        deltas = (
+            counter_delta(previous[index][0], port.in_octets, elapsed),
+            counter_delta(previous[index][1], port.out_octets, elapsed),
+        )
+        if None not in deltas:
+            rates[index] = (deltas[0] / elapsed, deltas[1] / elapsed)
+    return rates
+
+
+def _pack_counters(traffic):
+    return b''.join(
+        COUNTER_RECORD.pack(int(index), port.in_octets, port.out_octets)
+        for index, port in sorted(traffic.items())
+        if _valid(index, port)
+    )
+
+
+def discovery_cablefree_diamond_utilization(section):
+    if section.traffic and section.channels:
+        yield Service()
+
+
+def check_cablefree_diamond_utilization(params, section):
+    traffic = section.traffic
+    if not traffic:
+        return
+    value_store = get_value_store()
+    state = load_state(value_store, UtilizationState)
+    now = int(time.time())
+    ports, matched = _selected(section, params)
+    rates = _port_rates(ports, state, now)
+    store_state(value_store, UtilizationState(time=now, counters=_pack_counters(traffic)))
+
+    if not rates:
+        yield Result(state=State.OK, summary='Waiting for the next counter values')
+        return
+    if not matched:
+        yield Result(
+            state=State.OK,
+            notice='No ifIndex matches a switch port, counting all interfaces. '
+            'Select the ports in the rule if this counts traffic twice.',
+        )
+
+    capacity = _air_capacity(section.channels)
+    if capacity:
+        yield Result(state=State.OK, summary=f'Air capacity: {render.networkbandwidth(capacity / 8)}')
+    else:
+        yield Result(state=State.OK, summary='Air capacity: none, no locked channel')
+    yield Metric('cablefree_diamond_air_capacity', capacity)
+
+    for position, (direction, label) in enumerate((('in', 'In'), ('out', 'Out'))):
+        bits = sum(rate[position] for rate in rates.values()) * 8
+        yield Metric(f'cablefree_diamond_traffic_{direction}', bits)
+        if not capacity:
+            yield Result(state=State.OK, summary=f'{label}: {render.networkbandwidth(bits / 8)}')
+            continue
+        yield from check_levels(
+            100.0 * bits / capacity,
+            levels_upper=params.get('levels'),
+            label=f'Utilization {label.lower()}',
+            metric_name=f'cablefree_diamond_utilization_{direction}',
+            render_func=render.percent,
+        )
+        headroom = params.get('headroom')
+        yield from check_levels(
+            capacity - bits,
+            levels_lower=(headroom[0] * 1000000, headroom[1] * 1000000) if headroom else None,
+            label=f'Headroom {label.lower()}',
+            metric_name=f'cablefree_diamond_headroom_{direction}',
+            render_func=lambda v: render.networkbandwidth(v / 8),
+            notice_only=True,
+        )
+
+    for index, (in_rate, out_rate) in sorted(rates.items(), key=lambda item: int(item[0])):
+        yield Result(
+            state=State.OK,
+            notice=f'Port {ports[index].name}: in {render.networkbandwidth(in_rate)}, '
+            f'out {render.networkbandwidth(out_rate)}',
+        )
+
+
+register.check_plugin(
+    name='cablefree_diamond_utilization',
+    service_name='Diamond Utilization',
+    sections=['cablefree_diamond_device'],
+    discovery_function=discovery_cablefree_diamond_utilization,
+    check_function=instrument_check('cablefree_diamond_utilization', check_cablefree_diamond_utilization),
+    check_ruleset_name='cablefree_diamond_utilization',
+    check_default_parameters={
+        'levels': (80.0, 95.0),
+    },
+)
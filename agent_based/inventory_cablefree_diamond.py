@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# HW/SW inventory of the static CableFree Diamond configuration.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# Site name, IP, location, XPIC mode, frequencies, TR spacing and side,
+# bandwidth and the configured port speed go to the inventory tree below
+# networking > cablefree_diamond, where Checkmk keeps their change history.
+# Frequencies stay in kHz, so fleet-wide queries like "all links on 18 GHz"
+# can filter on plain numbers. The location of a channel is taken from the
+# device section, which walks the location column of the shared table.
+#
+# networking.cablefree_diamond.units:    index, location, ip, site_name, xpic
+# networking.cablefree_diamond.channels: index, location, tx_frequency,
+#                                        rx_frequency, tr_spacing, tr_side, bandwidth
+# networking.cablefree_diamond.ports:    index, speed, flow_control
+
+from typing import Optional
+
+from cmk.base.plugins.agent_based.agent_based_api.v1 import (
+    register,
+    Attributes,
+    TableRow,
+)
+from .utils.cablefree_diamond import DiamondConfig, DiamondDevice
+
+
+PATH = ['networking', 'cablefree_diamond']
+
+
+def _enabled(enabled):
+    if enabled is None:
+        return None
+    return 'enabled' if enabled else 'disabled'
+
+
+def _location(device, index):
+    if device is None or index not in device.channels:
+        return None
+    return 'remote' if device.channels[index].is_remote else 'local'
+
+
+def inventory_cablefree_diamond(
+    section_cablefree_diamond_config: Optional[DiamondConfig],
+    section_cablefree_diamond_device: Optional[DiamondDevice],
+):
+    section = section_cablefree_diamond_config
+    if section is None:
+        return
+    local_sites = [unit.site_name for unit in section.general.values() if not unit.is_remote]
+    remote_sites = [unit.site_name for unit in section.general.values() if unit.is_remote]
+    yield Attributes(
+        path=PATH,
+        inventory_attributes={
+            'local_site': ', '.join(local_sites),
+            'remote_site': ', '.join(remote_sites),
+        },
+    )
+
+    for unit in section.general.values():
+        yield TableRow(
+            path=PATH + ['units'],
+            key_columns={'index': unit.index},
+            inventory_columns={
+                'location': unit.location,
+                'ip': unit.ip,
+                'site_name': unit.site_name,
+                'xpic': _enabled(unit.xpic_enabled),
+            },
+        )
+
+    for channel in section.channels.values():
+        yield TableRow(
+            path=PATH + ['channels'],
+            key_columns={'index': channel.index},
+            inventory_columns={
+                'location': _location(section_cablefree_diamond_device, channel.index),
+                'tx_frequency': channel.tx_frequency,
+                'rx_frequency': channel.rx_frequency,
+                'tr_spacing': channel.tr_spacing,
+                'tr_side': channel.tr_side,
+                'bandwidth': channel.bandwidth,
+            },
+        )
+
+    for port in section.ports.values():
+        yield TableRow(
+            path=PATH + ['ports'],
+            key_columns={'index': port.index},
+            inventory_columns={
+                'speed': port.speed,
+                'flow_control': _enabled(port.flowctrl_enable),
+            },
+        )
+
+
+register.inventory_plugin(
+    name='cablefree_diamond',
+    sections=['cablefree_diamond_config', 'cablefree_diamond_device'],
+    inventory_function=inventory_cablefree_diamond,
+)
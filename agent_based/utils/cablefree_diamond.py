@@ -0,0 +1,1006 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Shared section types and parse helpers for the CableFree Diamond plugins.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# The parse functions turn every SNMP row into an immutable NamedTuple whose
+# numeric fields are already converted and scaled (dB, °C, seconds, kHz).
+# Values the device reported but that cannot be converted are stored as None,
+# so check functions never have to call int() on raw strings again.
+
+import math
+import re
+import struct
+from typing import (
+    Any, Callable, Dict, List, Mapping, MutableMapping, NamedTuple, Optional, Sequence, Tuple, Type, TypeVar,
+)
+
+from ..agent_based_api.v1 import any_of, check_levels, contains, render, Result, startswith, State
+from ..agent_based_api.v1.type_defs import CheckResult, StringTable
+
+
+# Detection only looks at sysDescr and sysObjectID. Checkmk fetches both for
+# every SNMP host anyway, so non-Diamond devices cost no extra requests.
+DETECT_DIAMOND = any_of(
+    contains('.1.3.6.1.2.1.1.1.0', 'CableFree'),
+    startswith('.1.3.6.1.2.1.1.2.0', '.1.3.6.1.4.1.91111.'),
+)
+
+# ModulationType textual convention from RADIO-DUMONTSTATUS-MIB
+MODULATION_NAMES = {
+    0: 'QPSK',
+    1: 'QAM16',
+    2: 'QAM32',
+    3: 'QAM64',
+    4: 'QAM128',
+    5: 'QAM256',
+    6: 'QAM512',
+    7: 'QAM1024',
+    8: 'QAM2048',
+    9: 'QAM4096',
+    10: 'ACM',
+    11: 'ACMM',
+}
+
+# portSpeed from SNMP-PORTS-MIB
+PORT_SPEED_MAP = {
+    0: 'Undefined',
+    1: '10M',
+    2: '100M',
+    3: '1000M',
+    4: '2500M',
+    5: '5000M',
+    6: '10G',
+}
+
+TR_SIDE_MAP = {
+    0: 'low',
+    1: 'high',
+}
+
+
+# Live values, fetched every check cycle
+
+class GeneralRow(NamedTuple):
+    index: str
+    is_remote: bool
+    temperature: Optional[float]  # °C
+    tr1_rssi: Optional[int]  # mV
+    tr2_rssi: Optional[int]  # mV
+    system_uptime: Optional[float]  # seconds
+    mcu_uptime: Optional[float]  # seconds
+    system_alarm: Optional[bool]
+
+
+class ChannelRow(NamedTuple):
+    index: str
+    is_remote: bool
+    capacity: Optional[int]  # Kbps
+    rsl: Optional[float]  # dBm
+    snr: Optional[float]  # dB
+    tx_power: Optional[int]  # dBm
+    tx_modulation: Optional[int]  # ModulationType level
+    rx_modulation: Optional[int]  # ModulationType level
+    tx_muted: Optional[bool]
+    modem_locked: Optional[bool]
+
+
+class PortRow(NamedTuple):
+    index: str
+    link_up: Optional[bool]
+    speed_current: str
+    flowctrl_rx: Optional[bool]
+    flowctrl_tx: Optional[bool]
+
+
+# ifXTable (IF-MIB) of the built-in switch
+class TrafficRow(NamedTuple):
+    index: str
+    name: str
+    in_octets: Optional[int]
+    out_octets: Optional[int]
+
+
+GeneralSection = Dict[str, GeneralRow]
+ChannelSection = Dict[str, ChannelRow]
+PortSection = Dict[str, PortRow]
+TrafficSection = Dict[str, TrafficRow]
+
+
+# Both ends of one radio channel. The local unit transmits what the remote
+# unit receives and vice versa.
+
+class LinkPair(NamedTuple):
+    local: ChannelRow
+    remote: ChannelRow
+
+
+# All live tables of one device, fetched and parsed together by the
+# cablefree_diamond_device section, so every check sees the same snapshot
+
+class DiamondDevice(NamedTuple):
+    general: GeneralSection
+    channels: ChannelSection
+    ports: PortSection
+    traffic: TrafficSection
+    peers: Dict[str, str]  # channel index -> same channel at the other end of the hop
+    links: Dict[str, LinkPair]  # local channel index -> both ends
+    remote_host: Optional[str] = None  # piggyback host the remote rows are sent to
+
+
+def monitored_here(device: DiamondDevice, row: Any) -> bool:
+    """Rows of the remote unit are monitored on its piggyback host if it has one"""
+    return not (row.is_remote and device.remote_host)
+
+
+# The hop is down when no channel carries traffic. A channel counts as
+# locked if the modems at both ends are locked, or only the local one if
+# the remote rows are missing (e.g. on the piggyback host of the remote
+# unit). Dependent services report their problems as OK while it is down,
+# the "Diamond Hop State" service alerts once for the device.
+
+def _locked(*rows: ChannelRow) -> Optional[bool]:
+    states = [row.modem_locked for row in rows]
+    if False in states:
+        return False
+    return None if None in states else True
+
+
+def hop_channels(device: DiamondDevice) -> Dict[str, Optional[bool]]:
+    """Lock state of every channel of the hop"""
+    if device.links:
+        return {index: _locked(*pair) for index, pair in device.links.items()}
+    return {index: _locked(row) for index, row in device.channels.items()}
+
+
+def hop_down(device: Optional[DiamondDevice]) -> bool:
+    channels = hop_channels(device) if device else {}
+    return bool(channels) and all(locked is False for locked in channels.values())
+
+
+def hop_dependent(results: CheckResult, params: Mapping[str, Any],
+                  device: Optional[DiamondDevice]) -> CheckResult:
+    """Problem states turned into OK while the hop is down, if configured"""
+    if not (params.get('hop_dependent') and hop_down(device)):
+        yield from results
+        return
+    yield Result(state=State.OK, summary='Hop down, problems suppressed (see Diamond Hop State)')
+    for result in results:
+        if not isinstance(result, Result) or result.state == State.OK:
+            yield result
+        elif result.summary:
+            yield Result(
+                state=State.OK,
+                summary=f'{result.summary} ({result.state.name} suppressed)',
+                details=f'{result.details} ({result.state.name} suppressed)',
+            )
+        else:
+            yield Result(state=State.OK, notice=f'{result.details} ({result.state.name} suppressed)')
+
+
+# Records of the high-resolution sampler bin/cablefree_diamond_sampler. Every
+# dump prints the records of the last minutes without consuming them, each
+# channel check keeps the sequence number of the newest record it has seen.
+
+class SampleRecord(NamedTuple):
+    seq: int  # position in the sampler's ring, counts up
+    time: int
+    locked: Optional[bool]
+    rsl: Optional[float]  # dBm
+    snr: Optional[float]  # dB
+
+
+SampleSection = Dict[str, List[SampleRecord]]
+
+
+# Aggregate of the records taken since the previous check cycle
+
+class SampleAggregate(NamedTuple):
+    index: str
+    samples: int
+    seconds: int
+    rsl_min: Optional[float]  # dBm
+    rsl_avg: Optional[float]
+    rsl_max: Optional[float]
+    rsl_p5: Optional[float]
+    snr_min: Optional[float]  # dB
+    snr_avg: Optional[float]
+    snr_max: Optional[float]
+    snr_p5: Optional[float]
+    unlocked: int  # samples with the modem unlocked
+
+
+# Static configuration, fetched by the cablefree_diamond_config section at a
+# long interval and merged into the checks
+
+class GeneralConfig(NamedTuple):
+    index: str
+    is_remote: bool
+    location: str
+    ip: str
+    xpic_enabled: Optional[bool]
+    site_name: str
+
+
+class ChannelConfig(NamedTuple):
+    index: str
+    tx_frequency: Optional[int]  # kHz
+    rx_frequency: Optional[int]  # kHz
+    tr_spacing: Optional[int]  # kHz
+    tr_side: Optional[str]
+    bandwidth: Optional[int]  # kHz
+
+
+class PortConfig(NamedTuple):
+    index: str
+    speed: Optional[str]
+    flowctrl_enable: Optional[bool]
+
+
+class DiamondConfig(NamedTuple):
+    general: Dict[str, GeneralConfig]
+    channels: Dict[str, ChannelConfig]
+    ports: Dict[str, PortConfig]
+
+
+def to_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_scaled(value: str, divisor: int = 10) -> Optional[float]:
+    """Convert an Integer32 with DISPLAY-HINT "d-1" to its real value"""
+    raw = to_int(value)
+    return None if raw is None else raw / divisor
+
+
+def to_flag(value: str) -> Optional[bool]:
+    """Decode a { false(0), true(1) } style enum"""
+    return {'0': False, '1': True}.get(value.strip())
+
+
+def to_enum(value: str, mapping: Dict[int, str]) -> Optional[str]:
+    raw = to_int(value)
+    return None if raw is None else mapping.get(raw)
+
+
+# portSpeedCurrent is free text ("1000M", "1000 Mbps", "1G", "100M Full").
+# The leading number and unit give the speed class of PORT_SPEED_MAP.
+_PORT_SPEED = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([MG]?)', re.IGNORECASE)
+_PORT_SPEED_CLASSES = {10: '10M', 100: '100M', 1000: '1000M', 2500: '2500M', 5000: '5000M', 10000: '10G'}
+
+
+def port_speed_class(text: str) -> Optional[str]:
+    """Speed class of a portSpeedCurrent value, None if not recognised"""
+    match = _PORT_SPEED.match(text or '')
+    if match is None:
+        return None
+    mbits = float(match.group(1)) * (1000 if match.group(2).upper() == 'G' else 1)
+    return _PORT_SPEED_CLASSES.get(round(mbits))
+
+
+def parse_uptime(uptime_str: str) -> Optional[float]:
+    """
+    Parse uptime string and convert to seconds.
+    Expected format: "0d 00:24:25" (days, hours:minutes:seconds),
+    the days part and the seconds are optional.
+    """
+    try:
+        parts = uptime_str.split()
+        total = 0.0
+        if len(parts) >= 2:
+            if parts[0].endswith('d'):
+                total += int(parts[0][:-1]) * 86400
+            time_part = parts[1]
+        else:
+            time_part = parts[0]
+
+        time_components = [int(c) for c in time_part.split(':')]
+        if len(time_components) >= 3:
+            hours, minutes, seconds = time_components[:3]
+        elif len(time_components) == 2:
+            (hours, minutes), seconds = time_components, 0
+        else:
+            return None
+        return total + hours * 3600 + minutes * 60 + seconds
+    except (ValueError, AttributeError, IndexError):
+        return None
+
+
+def check_value(value, label: str, **kwargs) -> CheckResult:
+    """check_levels() for a parsed value that was marked invalid (None)"""
+    if value is None:
+        yield Result(state=State.UNKNOWN, summary=f'{label}: invalid value')
+        return
+    yield from check_levels(value, label=label, **kwargs)
+
+
+def render_modulation(level: Optional[int]) -> str:
+    if level is None:
+        return 'invalid'
+    return MODULATION_NAMES.get(level, f'Level {level}')
+
+
+def parse_general(string_table: StringTable) -> GeneralSection:
+    return {
+        row[0]: GeneralRow(
+            index=row[0],
+            is_remote=row[0] == '1',
+            temperature=to_scaled(row[1]),
+            tr1_rssi=to_int(row[2]),
+            tr2_rssi=to_int(row[3]),
+            system_uptime=parse_uptime(row[4]),
+            mcu_uptime=parse_uptime(row[5]),
+            system_alarm=to_flag(row[6]),
+        ) for row in string_table
+    }
+
+
+def parse_channel(string_table: StringTable) -> ChannelSection:
+    return {
+        row[0]: ChannelRow(
+            index=row[0],
+            is_remote=row[1].strip().lower() == 'remote',
+            capacity=to_int(row[2]),
+            rsl=to_scaled(row[3]),
+            snr=to_scaled(row[4]),
+            tx_power=to_int(row[5]),
+            tx_modulation=to_int(row[6]),
+            rx_modulation=to_int(row[7]),
+            tx_muted=to_flag(row[8]),
+            modem_locked=to_flag(row[9]),
+        ) for row in string_table
+    }
+
+
+def parse_ports(string_table: StringTable) -> PortSection:
+    return {
+        row[0]: PortRow(
+            index=row[0],
+            link_up=to_flag(row[1]),
+            speed_current=row[2],
+            flowctrl_rx=to_flag(row[3]),
+            flowctrl_tx=to_flag(row[4]),
+        ) for row in string_table
+    }
+
+
+def parse_traffic(string_table: StringTable) -> TrafficSection:
+    return {
+        row[0]: TrafficRow(
+            index=row[0],
+            name=row[1] or row[0],
+            in_octets=to_int(row[2]),
+            out_octets=to_int(row[3]),
+        ) for row in string_table
+    }
+
+
+def _by_index(indices: List[str]) -> List[str]:
+    return sorted(indices, key=lambda index: (len(index), index))
+
+
+def pair_channels(channels: ChannelSection) -> Dict[str, str]:
+    """The n-th local channel is received by the n-th remote channel"""
+    local = _by_index([index for index, row in channels.items() if not row.is_remote])
+    remote = _by_index([index for index, row in channels.items() if row.is_remote])
+    peers = dict(zip(local, remote))
+    peers.update(zip(remote, local))
+    return peers
+
+
+def parse_device(string_table: List[StringTable]) -> DiamondDevice:
+    general_table, channel_table, port_table, traffic_table = string_table
+    channels = parse_channel(channel_table)
+    peers = pair_channels(channels)
+    return DiamondDevice(
+        general=parse_general(general_table),
+        channels=channels,
+        ports=parse_ports(port_table),
+        traffic=parse_traffic(traffic_table),
+        peers=peers,
+        links={
+            index: LinkPair(local=row, remote=channels[peers[index]])
+            for index, row in channels.items() if not row.is_remote and index in peers
+        },
+    )
+
+
+# The special agent sends the live tables in one section, each line
+# prefixed with the table name like the config section. With the remote
+# piggyback option a last line "piggyback <host>" names the host that
+# receives the rows of the remote unit as well.
+DEVICE_AGENT_TABLES = ('general', 'channel', 'ports', 'traffic')
+
+
+def _split_agent_tables(string_table: StringTable, names: Tuple[str, ...]) -> List[StringTable]:
+    tables: Dict[str, StringTable] = {name: [] for name in names}
+    for row in string_table:
+        if row and row[0] in tables:
+            tables[row[0]].append(row[1:])
+    return [tables[name] for name in names]
+
+
+def parse_device_agent(string_table: StringTable) -> DiamondDevice:
+    *tables, piggyback = _split_agent_tables(string_table, DEVICE_AGENT_TABLES + ('piggyback',))
+    device = parse_device(tables)
+    if piggyback and piggyback[-1]:
+        device = device._replace(remote_host=piggyback[-1][0])
+    return device
+
+
+def parse_samples(string_table: StringTable) -> SampleSection:
+    section: SampleSection = {}
+    for row in string_table:
+        if len(row) < 6:
+            continue
+        seq, sample_time = to_int(row[0]), to_int(row[1])
+        if seq is None or sample_time is None:
+            continue
+        section.setdefault(row[2], []).append(SampleRecord(
+            seq=seq,
+            time=sample_time,
+            locked=to_flag(row[3]),
+            rsl=to_scaled(row[4]),
+            snr=to_scaled(row[5]),
+        ))
+    return section
+
+
+def new_samples(records: Sequence[SampleRecord], last_seq: Optional[int]) -> List[SampleRecord]:
+    """Records after last_seq, all of them if the sampler's ring was recreated"""
+    if last_seq is None or not records or max(r.seq for r in records) < last_seq:
+        return list(records)
+    return [r for r in records if r.seq > last_seq]
+
+
+def _stats(values: List[float]) -> Tuple[Optional[float], ...]:
+    """min, average, max and 5th percentile"""
+    if not values:
+        return (None, None, None, None)
+    ordered = sorted(values)
+    return (
+        ordered[0],
+        round(sum(ordered) / len(ordered), 1),
+        ordered[-1],
+        ordered[min(len(ordered) - 1, int(len(ordered) * 0.05))],
+    )
+
+
+def aggregate_samples(index: str, records: Sequence[SampleRecord]) -> Optional[SampleAggregate]:
+    if not records:
+        return None
+    times = [r.time for r in records]
+    return SampleAggregate(
+        index,
+        len(records),
+        max(times) - min(times),
+        *_stats([r.rsl for r in records if r.rsl is not None]),
+        *_stats([r.snr for r in records if r.snr is not None]),
+        sum(1 for r in records if r.locked is False),
+    )
+
+
+def parse_config(string_table: List[StringTable]) -> DiamondConfig:
+    general_table, channel_table, port_table = string_table
+    return DiamondConfig(
+        general={
+            row[0]: GeneralConfig(
+                index=row[0],
+                is_remote=row[0] == '1',
+                location=row[1],
+                ip=row[2],
+                xpic_enabled=to_flag(row[3]),
+                site_name=row[4],
+            ) for row in general_table
+        },
+        channels={
+            row[0]: ChannelConfig(
+                index=row[0],
+                tx_frequency=to_int(row[1]),
+                rx_frequency=to_int(row[2]),
+                tr_spacing=to_int(row[3]),
+                tr_side=to_enum(row[4], TR_SIDE_MAP),
+                bandwidth=to_int(row[5]),
+            ) for row in channel_table
+        },
+        ports={
+            row[0]: PortConfig(
+                index=row[0],
+                speed=to_enum(row[1], PORT_SPEED_MAP),
+                flowctrl_enable=to_flag(row[2]),
+            ) for row in port_table
+        },
+    )
+
+
+# The special agent sends the three config tables in one section, each line
+# prefixed with the table name
+CONFIG_AGENT_TABLES = ('general', 'channel', 'ports')
+
+
+def parse_config_agent(string_table: StringTable) -> DiamondConfig:
+    return parse_config(_split_agent_tables(string_table, CONFIG_AGENT_TABLES))
+
+
+# Persisted check state. Every service keeps one record under STATE_KEY in
+# its value store: a plain tuple whose first element is the record version.
+# Histories are fixed-size ring buffers of packed structs stored as bytes, so
+# the pickled size per service is bounded and does not depend on the item.
+
+STATE_KEY = 'state'
+
+# Restart records: timestamp, uptime before and after the restart (seconds)
+RESTART_RECORD = struct.Struct('<III')
+RESTART_HISTORY = 10
+
+
+class GeneralState(NamedTuple):
+    version: int = 1
+    system_uptime: Optional[int] = None  # seconds
+    mcu_uptime: Optional[int] = None  # seconds
+    system_restarts: bytes = b''  # ring of RESTART_RECORD
+    mcu_restarts: bytes = b''  # ring of RESTART_RECORD
+
+
+class ChannelState(NamedTuple):
+    version: int = 7
+    bandwidth: Optional[int] = None  # kHz
+    tx_modulation: Optional[int] = None
+    rx_modulation: Optional[int] = None
+    rsl_trend: bytes = b''  # TREND_RECORD
+    snr_trend: bytes = b''  # TREND_RECORD
+    rsl_baseline: bytes = b''  # QUANTILE_RECORD
+    snr_baseline: bytes = b''  # QUANTILE_RECORD
+    poll_time: Optional[int] = None  # time of the last check
+    locked: Optional[bool] = None
+    availability_hours: bytes = b''  # ring of AVAILABILITY_BUCKET
+    availability_days: bytes = b''  # ring of AVAILABILITY_BUCKET
+    tx_modulation_time: bytes = b''  # MODULATION_HISTOGRAM
+    rx_modulation_time: bytes = b''  # MODULATION_HISTOGRAM
+    bandwidth_damping: bytes = b''  # DAMPING_RECORD and ring of FLAP_RECORD
+    tx_modulation_damping: bytes = b''  # DAMPING_RECORD and ring of FLAP_RECORD
+    rx_modulation_damping: bytes = b''  # DAMPING_RECORD and ring of FLAP_RECORD
+    sample_seq: Optional[int] = None  # newest sampler record seen
+
+
+# Octet counters of one port: ifIndex, ifHCInOctets, ifHCOutOctets
+COUNTER_RECORD = struct.Struct('<IQQ')
+
+
+class UtilizationState(NamedTuple):
+    version: int = 1
+    time: Optional[int] = None  # time of the counters
+    counters: bytes = b''  # COUNTER_RECORD per port
+
+
+class PortState(NamedTuple):
+    version: int = 1
+    link_damping: bytes = b''  # DAMPING_RECORD and ring of FLAP_RECORD
+
+
+class PortSummaryState(NamedTuple):
+    version: int = 1
+    links: Tuple[Tuple[str, bytes], ...] = ()  # port index, link damping record
+
+
+StateT = TypeVar('StateT', GeneralState, ChannelState, UtilizationState, PortState, PortSummaryState)
+
+
+def ring_append(ring: bytes, record: struct.Struct, values: Tuple, capacity: int) -> bytes:
+    """Append a packed record, dropping the oldest beyond capacity"""
+    return (ring + record.pack(*values))[-record.size * capacity:]
+
+
+def ring_records(ring: bytes, record: struct.Struct) -> List[Tuple]:
+    return list(record.iter_unpack(ring))
+
+
+def load_state(
+    value_store: MutableMapping[str, Any],
+    state_type: Type[StateT],
+    migrate: Optional[Callable[[MutableMapping[str, Any]], StateT]] = None,
+) -> StateT:
+    """Read the state record of a service
+
+    Records of an older version are padded with the defaults of fields added
+    since. Without a record the old per-key layout is migrated, if given.
+    """
+    raw = value_store.get(STATE_KEY)
+    current = state_type._field_defaults['version']
+    if isinstance(raw, tuple) and raw and isinstance(raw[0], int) \
+            and raw[0] <= current and len(raw) <= len(state_type._fields):
+        return state_type(current, *raw[1:])
+    if migrate is not None:
+        return migrate(value_store)
+    return state_type()
+
+
+def store_state(value_store: MutableMapping[str, Any], state: NamedTuple) -> None:
+    # a plain tuple, the value store only persists literals
+    value_store[STATE_KEY] = tuple(state)
+
+
+# Streaming trend of a reading: exponentially weighted mean, variance and
+# slope of the mean. One update per check cycle, constant size per channel.
+# The weight of a sample depends on the time since the last one, so missed
+# cycles do not distort the averages.
+
+TREND_RECORD = struct.Struct('<Ifff')  # timestamp, mean, variance, slope
+
+
+class Trend(NamedTuple):
+    time: int
+    mean: float
+    variance: float
+    slope: float  # per hour
+
+
+def update_trend(record: bytes, now: int, value: float, period: float) -> Trend:
+    """Add a sample to a packed TREND_RECORD, period is the time constant in seconds"""
+    if len(record) != TREND_RECORD.size:
+        return Trend(now, value, 0.0, 0.0)
+    last = Trend(*TREND_RECORD.unpack(record))
+    elapsed = now - last.time
+    if elapsed <= 0:
+        return last
+    alpha = 1 - math.exp(-elapsed / period)
+    diff = value - last.mean
+    mean = last.mean + alpha * diff
+    variance = (1 - alpha) * (last.variance + alpha * diff * diff)
+    slope = last.slope + alpha * ((mean - last.mean) * 3600 / elapsed - last.slope)
+    return Trend(now, mean, variance, slope)
+
+
+def pack_trend(trend: Trend) -> bytes:
+    return TREND_RECORD.pack(*trend)
+
+
+def hours_to_level(trend: Trend, level: float) -> Optional[float]:
+    """Hours until the mean reaches a lower level at the current slope
+
+    None if the mean does not fall or is already at or below the level.
+    """
+    if trend.slope >= 0 or trend.mean <= level:
+        return None
+    return (trend.mean - level) / -trend.slope
+
+
+# Streaming percentile of a reading with the P-square algorithm (Jain and
+# Chlamtac, 1985): five markers approximate the distribution, no samples
+# are kept. The record holds the tracked quantile, the sample count, the
+# marker heights and the marker positions. Until five samples were seen the
+# heights hold the samples themselves.
+
+QUANTILE_RECORD = struct.Struct('<fI5f5I')
+
+
+def _quantile_increments(quantile: float) -> Tuple[float, ...]:
+    return (0.0, quantile / 2, quantile, (1 + quantile) / 2, 1.0)
+
+
+def update_quantile(record: bytes, value: float, quantile: float) -> bytes:
+    """Add a sample to a packed QUANTILE_RECORD tracking quantile (0..1)"""
+    if len(record) == QUANTILE_RECORD.size:
+        unpacked = QUANTILE_RECORD.unpack(record)
+    else:
+        unpacked = ()
+    # a different quantile starts a new estimate
+    if not unpacked or abs(unpacked[0] - quantile) > 1e-6:
+        unpacked = (quantile, 0) + (0.0,) * 5 + (0,) * 5
+    count = unpacked[1]
+    heights = list(unpacked[2:7])
+    positions = list(unpacked[7:12])
+
+    if count < 5:
+        heights[count] = value
+        count += 1
+        if count == 5:
+            heights.sort()
+            positions = [1, 2, 3, 4, 5]
+        return QUANTILE_RECORD.pack(quantile, count, *heights, *positions)
+
+    if value < heights[0]:
+        heights[0] = value
+        cell = 0
+    elif value >= heights[4]:
+        heights[4] = value
+        cell = 3
+    else:
+        cell = max(i for i in range(4) if heights[i] <= value)
+    for i in range(cell + 1, 5):
+        positions[i] += 1
+    count += 1
+
+    increments = _quantile_increments(quantile)
+    for i in (1, 2, 3):
+        desired = 1 + (count - 1) * increments[i]
+        delta = desired - positions[i]
+        if (delta >= 1 and positions[i + 1] - positions[i] > 1) or \
+                (delta <= -1 and positions[i - 1] - positions[i] < -1):
+            step = 1 if delta > 0 else -1
+            height = heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+                (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i]) /
+                (positions[i + 1] - positions[i]) +
+                (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1]) /
+                (positions[i] - positions[i - 1]))
+            if not heights[i - 1] < height < heights[i + 1]:
+                height = heights[i] + step * (heights[i + step] - heights[i]) / (
+                    positions[i + step] - positions[i])
+            heights[i] = height
+            positions[i] += step
+
+    return QUANTILE_RECORD.pack(quantile, count, *heights, *positions)
+
+
+def quantile_estimate(record: bytes) -> Tuple[int, Optional[float]]:
+    """Return (samples, estimate), the estimate is None before five samples"""
+    if len(record) != QUANTILE_RECORD.size:
+        return 0, None
+    unpacked = QUANTILE_RECORD.unpack(record)
+    count = unpacked[1]
+    return count, unpacked[4] if count >= 5 else None
+
+
+# Availability of a channel, accumulated from the modem lock state at every
+# check cycle. The MIB has no error counters, so in the sense of ITU-T G.826
+# a second counts as unavailable while the modem is unlocked. The time
+# between two polls with a different lock state is split in half. Seconds
+# and outages (locked -> unlocked) are added to hourly and daily buckets,
+# kept in fixed-size rings, so every figure costs O(1) per check.
+
+AVAILABILITY_BUCKET = struct.Struct('<IIIH')  # period, observed s, unlocked s, outages
+AVAILABILITY_HOURS = 24
+AVAILABILITY_DAYS = 30
+# polls further apart are not counted, the state in between is unknown
+MAX_POLL_GAP = 3600
+
+
+class Availability(NamedTuple):
+    observed: int  # seconds
+    unlocked: int  # seconds
+    outages: int
+
+    @property
+    def percent(self) -> Optional[float]:
+        if not self.observed:
+            return None
+        return 100.0 * (self.observed - self.unlocked) / self.observed
+
+
+def _add_to_buckets(ring: bytes, length: int, capacity: int,
+                    start: int, end: int, unlocked: bool, outages: int) -> bytes:
+    buckets = {b[0]: list(b[1:]) for b in AVAILABILITY_BUCKET.iter_unpack(ring)}
+    period = start // length
+    while True:
+        bucket = buckets.setdefault(period, [0, 0, 0])
+        upto = min(end, (period + 1) * length)
+        bucket[0] += upto - start
+        if unlocked:
+            bucket[1] += upto - start
+        bucket[2] = min(bucket[2] + outages, 0xffff)
+        outages = 0
+        if upto >= end:
+            break
+        start, period = upto, period + 1
+    newest = max(buckets)
+    return b''.join(AVAILABILITY_BUCKET.pack(p, *buckets[p])
+                    for p in sorted(buckets) if p > newest - capacity)
+
+
+def update_availability(
+    hours: bytes,
+    days: bytes,
+    last_time: Optional[int],
+    last_locked: Optional[bool],
+    now: int,
+    locked: Optional[bool],
+    utc_offset: int = 0,
+) -> Tuple[bytes, bytes]:
+    """Account the time since the last poll, return the new hour and day rings
+
+    Times are shifted by utc_offset, so days start at local midnight.
+    """
+    if last_time is None or last_locked is None or locked is None:
+        return hours, days
+    elapsed = now - last_time
+    if elapsed <= 0 or elapsed > MAX_POLL_GAP:
+        return hours, days
+    start, end = last_time + utc_offset, now + utc_offset
+    middle = start + elapsed // 2
+    segments = (
+        (start, middle, not last_locked, 0),
+        (middle, end, not locked, int(last_locked and not locked)),
+    )
+    for seg_start, seg_end, unlocked, outages in segments:
+        if seg_end > seg_start:
+            hours = _add_to_buckets(hours, 3600, AVAILABILITY_HOURS, seg_start, seg_end, unlocked, outages)
+            days = _add_to_buckets(days, 86400, AVAILABILITY_DAYS, seg_start, seg_end, unlocked, outages)
+    return hours, days
+
+
+def availability_since(ring: bytes, first_period: int) -> Availability:
+    """Sum up the buckets of ring from first_period on"""
+    observed = unlocked = outages = 0
+    for period, b_observed, b_unlocked, b_outages in AVAILABILITY_BUCKET.iter_unpack(ring):
+        if period >= first_period:
+            observed += b_observed
+            unlocked += b_unlocked
+            outages += b_outages
+    return Availability(observed, unlocked, outages)
+
+
+# Time spent at each modulation level, one bin per level of
+# MODULATION_NAMES. The time since the last check is added to the level seen
+# at the last check. Older time fades out exponentially with the given
+# period, so the shares describe the recent past, not the whole service life.
+
+MODULATION_HISTOGRAM = struct.Struct('<%df' % len(MODULATION_NAMES))
+
+
+def update_histogram(record: bytes, level: Optional[int], elapsed: int, period: float) -> bytes:
+    """Add elapsed seconds at level to a packed MODULATION_HISTOGRAM"""
+    if len(record) == MODULATION_HISTOGRAM.size:
+        bins = list(MODULATION_HISTOGRAM.unpack(record))
+    else:
+        bins = [0.0] * len(MODULATION_NAMES)
+    if level is None or not 0 <= level < len(bins) or not 0 < elapsed <= MAX_POLL_GAP:
+        return MODULATION_HISTOGRAM.pack(*bins)
+    decay = math.exp(-elapsed / period)
+    bins = [seconds * decay for seconds in bins]
+    bins[level] += elapsed
+    return MODULATION_HISTOGRAM.pack(*bins)
+
+
+def histogram_shares(record: bytes) -> Optional[List[float]]:
+    """Share of time per level in percent, None if no time was recorded"""
+    if len(record) != MODULATION_HISTOGRAM.size:
+        return None
+    bins = MODULATION_HISTOGRAM.unpack(record)
+    total = sum(bins)
+    if total <= 0:
+        return None
+    return [100.0 * seconds / total for seconds in bins]
+
+
+# Octet counters. ifHCInOctets/ifHCOutOctets are 64 bit and never wrap in
+# practice, so a counter that went backwards was reset (reboot, counter
+# clear) and the sample is skipped. Some agents fill them from 32 bit
+# counters though: a decrease from within WRAP_MARGIN below 2**32 to within
+# WRAP_MARGIN above zero is taken as such a wrap, unless it implies a rate
+# above MAX_OCTET_RATE.
+
+MAX_OCTET_RATE = 10 ** 10 / 8  # 10 Gbit/s, the fastest port
+WRAP_MARGIN = 1 << 28
+
+
+def counter_delta(previous: int, current: int, elapsed: float) -> Optional[int]:
+    """Octets counted in elapsed seconds, None after a counter reset"""
+    if current >= previous:
+        return current - previous
+    if not (1 << 32) - WRAP_MARGIN <= previous < 1 << 32 or current >= WRAP_MARGIN:
+        return None
+    delta = current + (1 << 32) - previous
+    if elapsed <= 0 or delta / elapsed > MAX_OCTET_RATE:
+        return None
+    return delta
+
+
+# Dampened reading. A changed value is only taken over once it held for the
+# hold-down time, changes smaller than the minimum step are ignored. Every
+# raw change is timestamped, so a reading that keeps changing is reported
+# as flapping once instead of alerting on every transition. Changes are
+# seen at check cycles, faster flaps are not counted.
+
+DAMPING_RECORD = struct.Struct('<iiiI')  # stable, pending, last value, pending since
+FLAP_RECORD = struct.Struct('<I')  # time of a raw change
+FLAP_HISTORY = 32
+NO_VALUE = -2 ** 31
+
+# Hold-down in seconds, flap window in minutes, flap levels in changes
+DAMPING_DEFAULTS = {
+    'hold_down': 0,
+    'flap_window': 60,
+    'flap_levels': (4, 10),
+}
+
+
+class Damped(NamedTuple):
+    stable: Optional[int]
+    previous: Optional[int]  # stable value before this check
+    pending: Optional[int]  # changed value still in hold-down
+    pending_since: Optional[int]
+    flaps: int  # raw changes within the flap window
+
+
+def _from_record(value: int) -> Optional[int]:
+    return None if value == NO_VALUE else value
+
+
+def _to_record(value: Optional[int]) -> int:
+    return NO_VALUE if value is None else value
+
+
+def update_damped(
+    record: bytes,
+    value: Optional[int],
+    now: int,
+    hold_down: int = 0,
+    min_step: int = 1,
+    window: int = 3600,
+    initial: Optional[int] = None,
+) -> Tuple[bytes, Damped]:
+    """Feed one reading into a packed damping record
+
+    Without a record, initial (or else the reading itself) is taken as the
+    stable value, so enabling the dampening raises no alert.
+    """
+    if len(record) >= DAMPING_RECORD.size:
+        stable, pending, last, since = (
+            _from_record(v) for v in DAMPING_RECORD.unpack_from(record))
+        flaps = [t for t, in ring_records(record[DAMPING_RECORD.size:], FLAP_RECORD)]
+    else:
+        stable = last = value if initial is None else initial
+        pending, since, flaps = None, None, []
+    previous = stable
+
+    if value is not None:
+        if last is not None and abs(value - last) >= min_step:
+            flaps.append(now)
+        last = value
+        if stable is None or abs(value - stable) < min_step:
+            stable = value if stable is None else stable
+            pending = None
+        else:
+            if pending is None or abs(value - pending) >= min_step:
+                pending, since = value, now
+            if now - since >= hold_down:
+                stable, pending = value, None
+    if pending is None:
+        since = None
+
+    flaps = [t for t in flaps if now - t < window][-FLAP_HISTORY:]
+    record = DAMPING_RECORD.pack(
+        _to_record(stable), _to_record(pending), _to_record(last), since or 0,
+    ) + b''.join(FLAP_RECORD.pack(t) for t in flaps)
+    return record, Damped(stable, previous, pending, since, len(flaps))
+
+
+def damping_params(params: Mapping[str, Any]) -> Dict[str, Any]:
+    damping = dict(DAMPING_DEFAULTS)
+    damping.update(params.get('dampening') or {})
+    return damping
+
+
+def is_flapping(damped: Damped, damping: Mapping[str, Any]) -> bool:
+    levels = damping['flap_levels']
+    return bool(levels) and damped.flaps >= levels[0]
+
+
+def check_flapping(label: str, damped: Damped, damping: Mapping[str, Any]) -> CheckResult:
+    """Flap count of a dampened reading, shown in the details while quiet"""
+    yield from check_levels(
+        damped.flaps,
+        levels_upper=damping['flap_levels'],
+        label=f'{label} changes in {render.timespan(damping["flap_window"] * 60)}',
+        render_func=lambda v: f'{v:.0f}',
+        notice_only=not is_flapping(damped, damping),
+    )
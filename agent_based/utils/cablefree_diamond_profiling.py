@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Self-monitoring of the CableFree Diamond plugins.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# The parse and check functions are registered through instrument_parse()
+# and instrument_check(). The wrappers count calls, wall and CPU time, parsed
+# rows, value store size (summed over the services) and exceptions per host
+# and function in the memory of the Checkmk helper process. The service
+# "Diamond Plugin Self-Monitoring" takes the counters of its host at every
+# check, so each call is reported exactly once, at most one check cycle
+# late. Counters of a helper that is restarted in between are lost.
+#
+# The counting is off by default, the functions are then registered
+# unwrapped. Set CABLEFREE_DIAMOND_STATS=on in the site environment to
+# enable it. The value store size is only measured while counting, it
+# renders the whole store of the service. With
+# CABLEFREE_DIAMOND_PROFILE=/path/prefix every wrapped call also runs under
+# cProfile; the statistics are written to /path/prefix.<pid> by the
+# self-monitoring check and at process exit, for "python3 -m pstats".
+
+import atexit
+import cProfile
+import functools
+import os
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from ..agent_based_api.v1 import get_value_store, host_name
+
+ENABLED = os.environ.get('CABLEFREE_DIAMOND_STATS', 'off').lower() in ('on', '1', 'yes')
+PROFILE_PREFIX = os.environ.get('CABLEFREE_DIAMOND_PROFILE')
+
+
+class FunctionStats(NamedTuple):
+    calls: int = 0
+    wall_time: float = 0.0  # seconds
+    cpu_time: float = 0.0  # seconds
+    rows: int = 0
+    value_store_bytes: int = 0  # summed over the check calls
+    exceptions: int = 0
+
+
+# host -> 'parse <section>' / 'check <plugin>' -> FunctionStats
+_STATS: Dict[str, Dict[str, FunctionStats]] = {}
+
+_PROFILER: Optional[cProfile.Profile] = cProfile.Profile() if PROFILE_PREFIX else None
+_PROFILE_DEPTH = [0]
+
+
+def _host() -> str:
+    try:
+        return host_name()
+    except Exception:  # pylint: disable=broad-except
+        # outside of a host context, e.g. parsing for the discovery of a cluster
+        return ''
+
+
+def _rows(string_table: Any) -> int:
+    if string_table and isinstance(string_table[0], list) and string_table[0] \
+            and isinstance(string_table[0][0], list):
+        return sum(len(table) for table in string_table)  # one table per SNMPTree
+    return len(string_table or ())
+
+
+def _value_store_bytes() -> int:
+    try:
+        store = get_value_store()
+        return sum(len(repr(key)) + len(repr(value)) for key, value in store.items())
+    except Exception:  # pylint: disable=broad-except
+        return 0
+
+
+def _record(key: str, start: float, start_cpu: float, rows: int = 0,
+            store_bytes: int = 0, failed: bool = False) -> None:
+    host_stats = _STATS.setdefault(_host(), {})
+    old = host_stats.get(key, FunctionStats())
+    host_stats[key] = FunctionStats(
+        calls=old.calls + 1,
+        wall_time=old.wall_time + time.perf_counter() - start,
+        cpu_time=old.cpu_time + time.process_time() - start_cpu,
+        rows=old.rows + rows,
+        value_store_bytes=old.value_store_bytes + store_bytes,
+        exceptions=old.exceptions + failed,
+    )
+
+
+def _profile_start() -> None:
+    if _PROFILER is not None:
+        if not _PROFILE_DEPTH[0]:
+            _PROFILER.enable()
+        _PROFILE_DEPTH[0] += 1
+
+
+def _profile_stop() -> None:
+    if _PROFILER is not None:
+        _PROFILE_DEPTH[0] -= 1
+        if not _PROFILE_DEPTH[0]:
+            _PROFILER.disable()
+
+
+def dump_profile() -> Optional[str]:
+    """Write the collected cProfile statistics, return the file name"""
+    if _PROFILER is None:
+        return None
+    path = f'{PROFILE_PREFIX}.{os.getpid()}'
+    try:
+        _PROFILER.dump_stats(path)
+    except OSError:
+        return None
+    return path
+
+
+if _PROFILER is not None:
+    atexit.register(dump_profile)
+
+
+def instrument_parse(name: str, parse_function: Callable) -> Callable:
+    """Wrap a parse function, the signature stays visible to Checkmk"""
+    if not ENABLED and _PROFILER is None:
+        return parse_function
+    key = f'parse {name}'
+
+    @functools.wraps(parse_function)
+    def wrapper(string_table):
+        start, start_cpu = time.perf_counter(), time.process_time()
+        _profile_start()
+        try:
+            parsed = parse_function(string_table)
+        except Exception:
+            _profile_stop()
+            if ENABLED:
+                _record(key, start, start_cpu, failed=True)
+            raise
+        _profile_stop()
+        if ENABLED:
+            _record(key, start, start_cpu, rows=_rows(string_table))
+        return parsed
+
+    return wrapper
+
+
+def instrument_check(name: str, check_function: Callable) -> Callable:
+    """Wrap a check function, the signature stays visible to Checkmk"""
+    if not ENABLED and _PROFILER is None:
+        return check_function
+    key = f'check {name}'
+
+    @functools.wraps(check_function)
+    def wrapper(*args, **kwargs):
+        start, start_cpu = time.perf_counter(), time.process_time()
+        _profile_start()
+        try:
+            # run to the end, so the time of the caller is not counted
+            results = list(check_function(*args, **kwargs))
+        except Exception:
+            _profile_stop()
+            if ENABLED:
+                _record(key, start, start_cpu, failed=True)
+            raise
+        _profile_stop()
+        if ENABLED:
+            _record(key, start, start_cpu, store_bytes=_value_store_bytes())
+        yield from results
+
+    return wrapper
+
+
+def take_stats(host: Optional[str] = None) -> Dict[str, FunctionStats]:
+    """Return and reset the counters of a host"""
+    return _STATS.pop(_host() if host is None else host, {})
+
+
+def total(stats: List[FunctionStats]) -> FunctionStats:
+    return FunctionStats(*(sum(values) for values in zip(FunctionStats(), *stats)))
@@ -0,0 +1,102 @@
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Event Console rule pack for the CableFree Diamond traps.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# Traps of RADIO-DUMONTSTATUS-MIB (radiolStatusNotifications). Every rule
+# matches the translated name as well as the numeric OID, so the pack works
+# with and without the MIB uploaded to the Event Console. The application of
+# the event is rewritten to the service it concerns: lock changes to Diamond
+# Hop State, alarms and reboots to the unit (Diamond General Status <n>).
+# When a hop goes down every channel sends its own lock trap. They are
+# counted into one event per host, so the outage raises one alert per
+# device; the trap of any channel regaining its lock closes it, the hop
+# service then shows the channels still unlocked. The action
+# cablefree_diamond_trap_bridge has to be created as "Execute Shell Script"
+# with the script cablefree_diamond_trap_bridge; it forwards alarms and
+# reboots as a passive result to the General Status service, and lock
+# changes to the Diamond Hop State service.
+
+mkp_rule_packs['cablefree_diamond'] = {
+    'id': 'cablefree_diamond',
+    'title': 'CableFree Diamond traps',
+    'disabled': False,
+    'rules': [
+        {
+            'id': 'cablefree_diamond_lock_lost',
+            'description': 'Diamond hop: channel lost modem lock',
+            'comment': 'Cancelled by the modemLockStatusChange trap reporting the lock regained.',
+            'disabled': False,
+            'state': 2,
+            'sl': {'value': 0, 'precedence': 'message'},
+            'match_application': r'modemLockStatusChange$|1\.3\.6\.1\.4\.1\.91111\.4\.80\.1\.2\.0\.1$',
+            'match': r'(?:modemLockStatus|1\.3\.6\.1\.4\.1\.91111\.4\.80\.1\.1\.2\.1\.15)\.(\d+): (?:unlocked|0)\b',
+            'match_ok': r'(?:modemLockStatus|1\.3\.6\.1\.4\.1\.91111\.4\.80\.1\.1\.2\.1\.15)\.(\d+): (?:locked|1)\b',
+            'set_application': 'Diamond Hop State',
+            'count': {
+                'count': 1,
+                'period': 86400,
+                'algorithm': 'interval',
+                'count_ack': False,
+                'separate_host': True,
+                'separate_application': True,
+                'separate_match_groups': False,
+            },
+            'actions': ['cablefree_diamond_trap_bridge'],
+            'cancel_actions': ['cablefree_diamond_trap_bridge'],
+            'cancel_action_phases': 'always',
+            'actions_in_downtime': True,
+            'autodelete': False,
+            'drop': False,
+        },
+        {
+            'id': 'cablefree_diamond_system_alarm',
+            'description': 'Diamond system alarm raised',
+            'comment': 'Cancelled by the systemAlarmChange trap reporting the alarm cleared.',
+            'disabled': False,
+            'state': 1,
+            'sl': {'value': 0, 'precedence': 'message'},
+            'match_application': r'systemAlarmChange$|1\.3\.6\.1\.4\.1\.91111\.4\.80\.1\.2\.0\.2$',
+            'match': r'(?:systemAlarm|1\.3\.6\.1\.4\.1\.91111\.4\.80\.1\.1\.1\.1\.11)\.(\d+): (?:alarm|1)\b',
+            'match_ok': r'(?:systemAlarm|1\.3\.6\.1\.4\.1\.91111\.4\.80\.1\.1\.1\.1\.11)\.(\d+): (?:normal|0)\b',
+            'set_application': r'Diamond General Status \1',
+            'actions': ['cablefree_diamond_trap_bridge'],
+            'cancel_actions': ['cablefree_diamond_trap_bridge'],
+            'cancel_action_phases': 'always',
+            'actions_in_downtime': True,
+            'autodelete': False,
+            'drop': False,
+        },
+        {
+            'id': 'cablefree_diamond_reboot',
+            'description': 'Diamond unit rebooted',
+            'comment': 'Kept open for one hour.',
+            'disabled': False,
+            'state': 2,
+            'sl': {'value': 0, 'precedence': 'message'},
+            'match_application': r'systemReboot$|1\.3\.6\.1\.4\.1\.91111\.4\.80\.1\.2\.0\.3$',
+            'match': r'(?:generalStatusIndex|1\.3\.6\.1\.4\.1\.91111\.4\.80\.1\.1\.1\.1\.1)\.(\d+):',
+            'set_application': r'Diamond General Status \1',
+            'livetime': (3600, ['open']),
+            'actions': ['cablefree_diamond_trap_bridge'],
+            'actions_in_downtime': True,
+            'autodelete': False,
+            'drop': False,
+        },
+    ],
+}
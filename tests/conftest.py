@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Fixtures of the CableFree Diamond tests.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+The plugins are loaded through tools/agent_based_stub.py, so the tests run
+without a Checkmk site. Run them from the repository root with pytest.
+"""
+
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import time
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO, 'tools'))
+
+import agent_based_stub as api  # noqa: E402  pylint: disable=wrong-import-position
+import synthetic  # noqa: E402  pylint: disable=wrong-import-position
+
+api.install()
+PLUGINS = api.load_plugins()
+
+NOW = 1_700_000_000
+
+
+def load_script(relative_path):
+    """Import a script without .py extension (special agent, bin/)"""
+    path = os.path.join(REPO, relative_path)
+    name = os.path.basename(path).replace('-', '_')
+    loader = importlib.machinery.SourceFileLoader(name, path)
+    spec = importlib.util.spec_from_loader(name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def parse_walk(walk):
+    """Parse a walk with every SNMP section that detects it"""
+    parsed = {}
+    for section in api.REGISTRY['snmp_section'].values():
+        table = synthetic.string_tables(walk, section['fetch'])
+        parsed[api.parsed_section_name(section)] = section['parse_function'](table)
+    return parsed
+
+
+@pytest.fixture(autouse=True)
+def _value_stores():
+    api.reset_value_stores()
+    yield
+    api.reset_value_stores()
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Simulated time.time() of the check functions"""
+    simulated = Clock(NOW)
+    monkeypatch.setattr(time, 'time', simulated)
+    return simulated
+
+
+@pytest.fixture
+def run_check():
+    """Check one service with its own value store"""
+    def run(plugin, item, parsed, params=None):
+        with api.value_store_for('test-host', plugin, item):
+            return api.run_check(api.REGISTRY['check_plugin'][plugin], item, parsed, params)
+    return run
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Tests of the check and inventory plugins.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+
+import os
+
+import pytest
+
+import agent_based_stub as api
+import replay_walks
+import synthetic
+from cmk.base.plugins.agent_based.utils import cablefree_diamond as utils
+from cmk.base.plugins.agent_based.utils import cablefree_diamond_profiling as profiling
+
+from .conftest import NOW, PLUGINS, REPO, parse_walk
+
+WALKS = os.path.join(REPO, 'tests', 'walks')
+
+
+def _results(results):
+    return [r for r in results if isinstance(r, api.Result)]
+
+
+def _metrics(results):
+    return {m.name: m.value for m in results if isinstance(m, api.Metric)}
+
+
+def _text(results):
+    return '\n'.join(r.details for r in _results(results))
+
+
+@pytest.fixture(name='normal')
+def _normal():
+    return parse_walk(synthetic.device_walk(channels=4, ports=4))
+
+
+@pytest.fixture(name='link_down')
+def _link_down():
+    return parse_walk(synthetic.device_walk(channels=4, ports=4, scenario='link-down'))
+
+
+def test_discovery(normal):
+    plugins = api.REGISTRY['check_plugin']
+    items = {
+        name: [s.item for s in api.run_discovery(plugin, normal)]
+        for name, plugin in plugins.items()
+    }
+    assert items['cablefree_diamond_channel'] == ['1', '2', '3', '4']
+    assert items['cablefree_diamond_general'] == ['1', '2']
+    assert items['cablefree_diamond_link'] == ['1', '2']
+    assert items['cablefree_diamond_ports'] == ['1', '2', '3', '4']
+    assert items['cablefree_diamond_ports_summary'] == []
+    for name in ('cablefree_diamond_hop', 'cablefree_diamond_channel_summary',
+                 'cablefree_diamond_utilization', 'cablefree_diamond_self_monitoring'):
+        assert items[name] == [None]
+
+
+def test_general_detects_a_restart(normal, run_check, clock):
+    results = run_check('cablefree_diamond_general', '2', normal)
+    assert api.service_state(results) == api.State.OK
+    assert 'cablefree_diamond_general_temperature' in _metrics(results)
+    clock.advance(60)
+    rebooted = parse_walk(synthetic.device_walk(channels=4, ports=4, scenario='reboot'))
+    results = run_check('cablefree_diamond_general', '2', rebooted)
+    assert api.service_state(results) == api.State.CRIT
+    assert 'System restart detected' in _text(results)
+
+
+def test_channel_ok_and_unlocked(normal, link_down, run_check, clock):
+    results = run_check('cablefree_diamond_channel', '1', normal)
+    assert api.service_state(results) == api.State.OK
+    metrics = _metrics(results)
+    assert metrics['cablefree_diamond_channel_band_width'] == 56000
+    assert 'cablefree_diamond_channel_rsl' in metrics
+    clock.advance(60)
+    results = run_check('cablefree_diamond_channel', '1', link_down)
+    assert api.service_state(results) == api.State.CRIT
+    assert 'LINK DOWN' in _text(results)
+
+
+def test_channel_without_config_section(normal, run_check):
+    device = {'cablefree_diamond_device': normal['cablefree_diamond_device']}
+    results = run_check('cablefree_diamond_channel', '1', device)
+    assert api.service_state(results) == api.State.OK
+    assert 'Channel 1 is local' in _text(results)
+    assert 'Bandwidth: invalid value' not in _text(results)
+    assert 'cablefree_diamond_channel_band_width' not in _metrics(results)
+
+
+def test_channel_warns_on_a_modulation_drop(normal, run_check, clock):
+    run_check('cablefree_diamond_channel', '1', normal)
+    clock.advance(60)
+    fading = parse_walk(synthetic.device_walk(channels=4, ports=4, scenario='fading'))
+    results = run_check('cablefree_diamond_channel', '1', fading)
+    assert api.service_state(results) == api.State.WARN
+    assert 'TX Modulation decreased from QAM1024 to QAM64' in _text(results)
+
+
+@pytest.mark.parametrize('mean, slope, state, text', [
+    (-60.0, -2.0, api.State.WARN, 'RSL projected to reach -70dBm in'),
+    (-60.0, 2.0, api.State.OK, None),
+    (-75.0, -2.0, api.State.OK, 'RSL mean already below -70dBm'),
+])
+def test_channel_trend_projection(mean, slope, state, text):
+    channel = PLUGINS['cablefree_diamond_channel']
+    trends = {'rsl': utils.Trend(0, mean, 0.0, slope)}
+    results = _results(channel._check_trends({'rsl': (-65, -70), 'trend_horizon': 24}, trends))
+    assert api.service_state(results) == state
+    assert 'in 0 seconds' not in _text(results)
+    if text:
+        assert text in _text(results)
+
+
+def _samples(seqs, locked=True):
+    rows = [[str(seq), str(NOW + seq), '1', '1' if locked else '0', '-452', '371'] for seq in seqs]
+    return utils.parse_samples(rows)
+
+
+def test_channel_aggregates_only_new_samples(normal, run_check):
+    sections = dict(normal, cablefree_diamond_samples=_samples(range(0, 30)))
+    results = run_check('cablefree_diamond_channel', '1', sections)
+    assert 'Sampler: 30 samples' in _text(results)
+    # the next dump repeats most of the window
+    sections['cablefree_diamond_samples'] = _samples(range(10, 40), locked=False)
+    results = run_check('cablefree_diamond_channel', '1', sections, {'sample_unlocks': (5, 20)})
+    assert 'Sampler: 10 samples' in _text(results)
+    assert _metrics(results)['cablefree_diamond_channel_unlocked_samples'] == 10
+    assert api.service_state(results) == api.State.WARN
+    # nothing new, no sampler results
+    results = run_check('cablefree_diamond_channel', '1', sections)
+    assert 'Sampler' not in _text(results)
+
+
+def test_channel_baseline_learns_from_normal_readings_only(normal, link_down, run_check, clock):
+    params = {'baseline': {'learning': 5}}
+    fading = parse_walk(synthetic.device_walk(channels=4, ports=4, scenario='fading'))
+    for walk in [normal] * 5 + [link_down] * 10 + [normal]:
+        results = run_check('cablefree_diamond_channel', '1', walk, params)
+        clock.advance(60)
+    assert 'RSL baseline: 5th percentile -42.4dBm' in _text(results)
+    for _cycle in range(20):
+        results = run_check('cablefree_diamond_channel', '1', fading, params)
+        clock.advance(60)
+    assert api.service_state(results) == api.State.WARN
+    assert 'RSL -67.4dBm is 25.0dB below its learned 5th percentile -42.4dBm' in _text(results)
+
+
+def test_channel_summary_lists_all_channels(normal, run_check):
+    results = run_check('cablefree_diamond_channel_summary', None, normal)
+    assert results[0].summary == '4 channel(s)'
+    assert len(results[0].details.splitlines()) == 2 + 2 + 4
+
+
+def test_link_compares_both_ends(normal, link_down, run_check):
+    results = run_check('cablefree_diamond_link', '1', normal)
+    assert results[0].summary == 'Local channel 1, remote channel 3'
+    assert {'cablefree_diamond_link_rsl_asymmetry', 'cablefree_diamond_link_path_loss_tx'} <= set(_metrics(results))
+    results = run_check('cablefree_diamond_link', '1', link_down)
+    assert api.service_state(results) == api.State.CRIT
+
+
+def test_hop_state(normal, link_down, run_check):
+    results = run_check('cablefree_diamond_hop', None, normal)
+    assert api.service_state(results) == api.State.OK
+    assert _metrics(results) == {'cablefree_diamond_hop_locked': 2, 'cablefree_diamond_hop_unlocked': 0}
+    results = run_check('cablefree_diamond_hop', None, link_down)
+    assert api.service_state(results) == api.State.CRIT
+
+
+@pytest.mark.parametrize('plugin, item', [
+    ('cablefree_diamond_channel', '1'),
+    ('cablefree_diamond_link', '1'),
+])
+def test_hop_dependent_services_are_suppressed(link_down, run_check, plugin, item):
+    results = run_check(plugin, item, link_down, {'hop_dependent': True})
+    assert api.service_state(results) == api.State.OK
+    assert 'CRIT suppressed' in _text(results)
+    results = run_check(plugin, item, link_down)
+    assert api.service_state(results) == api.State.CRIT
+
+
+def test_hop_dependency_is_opt_in():
+    for name in ('cablefree_diamond_channel', 'cablefree_diamond_general', 'cablefree_diamond_link',
+                 'cablefree_diamond_ports', 'cablefree_diamond_ports_summary'):
+        assert 'hop_dependent' not in api.REGISTRY['check_plugin'][name]['check_default_parameters']
+
+
+def test_ports_are_not_hop_dependent(link_down, run_check):
+    results = run_check('cablefree_diamond_ports', '4', link_down, {'hop_dependent': True})
+    assert api.service_state(results) == api.State.WARN
+
+
+def test_restart_is_not_suppressed_while_the_hop_is_down(normal, link_down, run_check, clock):
+    params = {'hop_dependent': True}
+    run_check('cablefree_diamond_general', '2', normal, params)
+    clock.advance(60)
+    rebooted = parse_walk(synthetic.device_walk(channels=4, ports=4, scenario='reboot'))
+    down = link_down['cablefree_diamond_device']._replace(general=rebooted['cablefree_diamond_device'].general)
+    results = run_check('cablefree_diamond_general', '2', {**link_down, 'cablefree_diamond_device': down}, params)
+    assert api.service_state(results) == api.State.CRIT
+    assert 'Hop down, problems suppressed' in _text(results)
+    assert 'System restart detected' in _text(results)
+
+
+def test_port_link_down_and_hold_down(normal, run_check, clock):
+    assert api.service_state(run_check('cablefree_diamond_ports', '1', normal)) == api.State.OK
+    assert api.service_state(run_check('cablefree_diamond_ports', '4', normal)) == api.State.WARN
+    params = {'dampening': {'hold_down': 120, 'flap_window': 60, 'flap_levels': (4, 10)}}
+    run_check('cablefree_diamond_ports', '1', normal, params)
+    clock.advance(60)
+    down = normal['cablefree_diamond_device']._replace(ports={
+        index: port._replace(link_up=False) for index, port in normal['cablefree_diamond_device'].ports.items()
+    })
+    results = run_check('cablefree_diamond_ports', '1', {**normal, 'cablefree_diamond_device': down}, params)
+    assert api.service_state(results) == api.State.OK
+    assert 'held down' in _text(results)
+    clock.advance(120)
+    results = run_check('cablefree_diamond_ports', '1', {**normal, 'cablefree_diamond_device': down}, params)
+    assert api.service_state(results) == api.State.WARN
+
+
+def test_ports_summary_alerts_for_expected_ports_only(normal, run_check):
+    plugin = api.REGISTRY['check_plugin']['cablefree_diamond_ports_summary']
+    services = api.run_discovery(plugin, normal, {'mode': 'aggregated'})
+    assert services[0].parameters == {'discovered_up': ['1', '2']}
+    results = run_check('cablefree_diamond_ports_summary', None, normal, services[0].parameters)
+    assert api.service_state(results) == api.State.OK
+    metrics = _metrics(results)
+    assert (metrics['cablefree_diamond_ports_up'], metrics['cablefree_diamond_ports_down']) == (2, 2)
+    assert metrics['cablefree_diamond_ports_speed_1000m'] == 2
+    results = run_check('cablefree_diamond_ports_summary', None, normal, {'expected_up': ['1', '3']})
+    assert api.service_state(results) == api.State.WARN
+    assert [r.summary for r in _results(results) if r.state != api.State.OK] == ['Port 3: Link Down']
+
+
+def test_ports_summary_speed_classes_from_a_walk(run_check):
+    parsed = parse_walk(replay_walks.read_walk(os.path.join(WALKS, 'port-speeds.walk')))
+    results = run_check('cablefree_diamond_ports_summary', None, parsed, {'expected_up': []})
+    metrics = _metrics(results)
+    assert metrics['cablefree_diamond_ports_up'] == 7
+    assert {speed: metrics[f'cablefree_diamond_ports_speed_{speed}']
+            for speed in ('10m', '100m', '1000m', '2500m', '5000m', '10g')} == {
+        '10m': 1,
+        '100m': 2,  # port 6 reports "auto", counted by its configured speed
+        '1000m': 2,
+        '2500m': 1,
+        '5000m': 0,
+        '10g': 1,
+    }
+
+
+def test_utilization_against_air_capacity(run_check, clock):
+    first = parse_walk(synthetic.device_walk(channels=4, ports=4, uptime=1000))
+    assert run_check('cablefree_diamond_utilization', None, first)[0].summary == \
+        'Waiting for the next counter values'
+    clock.advance(60)
+    second = parse_walk(synthetic.device_walk(channels=4, ports=4, uptime=1060))
+    results = run_check('cablefree_diamond_utilization', None, second)
+    metrics = _metrics(results)
+    # two up ports with 40 Mbit/s in, two locked local channels of 460 Mbit/s
+    assert metrics['cablefree_diamond_air_capacity'] == 920e6
+    assert metrics['cablefree_diamond_traffic_in'] == pytest.approx(80e6)
+    assert metrics['cablefree_diamond_utilization_in'] == pytest.approx(100 * 80 / 920)
+    assert api.service_state(results) == api.State.OK
+
+
+def _with_interface(parsed, index, name, in_octets):
+    device = parsed['cablefree_diamond_device']
+    traffic = dict(device.traffic, **{index: utils.TrafficRow(index, name, in_octets, 0)})
+    return dict(parsed, cablefree_diamond_device=device._replace(traffic=traffic))
+
+
+def test_utilization_counts_the_switch_ports_only(run_check, clock):
+    # an internal interface that sees the same traffic again
+    first = _with_interface(parse_walk(synthetic.device_walk(channels=4, ports=4, uptime=1000)),
+                            '100', 'cpu', 10 ** 9)
+    run_check('cablefree_diamond_utilization', None, first)
+    clock.advance(60)
+    second = _with_interface(parse_walk(synthetic.device_walk(channels=4, ports=4, uptime=1060)),
+                             '100', 'cpu', 10 ** 9 + 60 * 2 * 10 ** 7)
+    results = run_check('cablefree_diamond_utilization', None, second)
+    assert _metrics(results)['cablefree_diamond_traffic_in'] == pytest.approx(80e6)
+    clock.advance(60)
+    third = _with_interface(parse_walk(synthetic.device_walk(channels=4, ports=4, uptime=1120)),
+                            '100', 'cpu', 10 ** 9 + 120 * 2 * 10 ** 7)
+    results = run_check('cablefree_diamond_utilization', None, third, {'ports': ['cpu']})
+    assert _metrics(results)['cablefree_diamond_traffic_in'] == pytest.approx(160e6)
+
+
+def test_utilization_skips_unusable_counters(run_check, clock):
+    first = _with_interface(parse_walk(synthetic.device_walk(channels=4, ports=4, uptime=1000)),
+                            '5', 'port5', -1)
+    run_check('cablefree_diamond_utilization', None, first)
+    clock.advance(60)
+    second = _with_interface(parse_walk(synthetic.device_walk(channels=4, ports=4, uptime=1060)),
+                             '5', 'port5', 1 << 64)
+    results = run_check('cablefree_diamond_utilization', None, second)
+    assert _metrics(results)['cablefree_diamond_traffic_in'] == pytest.approx(80e6)
+
+
+def test_self_monitoring_is_off_by_default(normal, run_check):
+    assert not profiling.ENABLED
+    check = api.REGISTRY['check_plugin']['cablefree_diamond_hop']['check_function']
+    assert not hasattr(check, '__wrapped__')
+    results = run_check('cablefree_diamond_self_monitoring', None, normal)
+    assert results[0].summary.startswith('Counting disabled')
+
+
+def test_self_monitoring_reports_the_calls(normal, run_check, monkeypatch):
+    monkeypatch.setattr(profiling, 'ENABLED', True)
+    monkeypatch.setattr(PLUGINS['cablefree_diamond_self_monitoring'], 'ENABLED', True)
+    hop = PLUGINS['cablefree_diamond_hop']
+    check = profiling.instrument_check('cablefree_diamond_hop', hop.check_cablefree_diamond_hop)
+    with api.value_store_for('test-host', 'cablefree_diamond_hop', None):
+        list(check(section=normal['cablefree_diamond_device']))
+    results = run_check('cablefree_diamond_self_monitoring', None, normal)
+    assert results[0].summary.startswith('Calls: 1, ')
+    assert _metrics(results)['cablefree_diamond_self_calls'] == 1
+
+
+def test_inventory(normal):
+    plugin = api.REGISTRY['inventory_plugin']['cablefree_diamond']
+    entries = api.run_inventory(plugin, normal)
+    attributes = [e for e in entries if isinstance(e, api.Attributes)][0]
+    assert attributes.inventory_attributes == {'local_site': 'SITE-A', 'remote_site': 'SITE-B'}
+    channels = [e for e in entries if isinstance(e, api.TableRow) and e.path[-1] == 'channels']
+    assert channels[0].inventory_columns['bandwidth'] == 56000
+    assert channels[0].inventory_columns['location'] == 'local'
+
+
+def test_inventory_sites_follow_the_unit_index():
+    config = utils.parse_config([
+        [['1', 'Far End', '10.0.0.2', '1', 'SITE-B'], ['2', 'Near End', '10.0.0.1', '1', 'SITE-A']],
+        [],
+        [],
+    ])
+    entries = api.run_inventory(api.REGISTRY['inventory_plugin']['cablefree_diamond'],
+                                {'cablefree_diamond_config': config})
+    assert entries[0].inventory_attributes == {'local_site': 'SITE-A', 'remote_site': 'SITE-B'}
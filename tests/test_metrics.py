@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Tests of the metric definitions in web/plugins/metrics.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+
+import builtins
+import os
+import types
+
+import pytest
+
+import agent_based_stub as api
+import synthetic
+
+from .conftest import REPO, parse_walk
+
+
+@pytest.fixture(name='metrics', scope='module')
+def _metrics():
+    """Execute the metrics plugin against minimal cmk.gui stand-ins"""
+    namespace = types.SimpleNamespace(metric_info={}, graph_info={}, check_metrics={},
+                                      perfometer_info=[], MB=1024 * 1024)
+    i18n = types.SimpleNamespace(_=lambda text: text)
+    path = os.path.join(REPO, 'web', 'plugins', 'metrics', 'cablefree_diamond.py')
+    with open(path, encoding='utf-8') as source:
+        code = compile(source.read(), path, 'exec')
+    scope = {'__name__': 'cablefree_diamond_metrics'}
+    modules = {'cmk.gui.i18n': i18n, 'cmk.gui.plugins.metrics': namespace}
+
+    def fake_import(name, *args, **kwargs):
+        return modules[name] if name in modules else builtins.__import__(name, *args, **kwargs)
+
+    scope['__builtins__'] = dict(vars(builtins), __import__=fake_import)
+    exec(code, scope)  # pylint: disable=exec-used
+    return namespace
+
+
+def _emitted():
+    """Metric names of every check plugin on a healthy synthetic device"""
+    parsed = parse_walk(synthetic.device_walk(channels=4, ports=4))
+    names = {}
+    for name, plugin in api.REGISTRY['check_plugin'].items():
+        emitted = names.setdefault(name, set())
+        for service in api.run_discovery(plugin, parsed):
+            with api.value_store_for('test-host', name, service.item):
+                results = api.run_check(plugin, service.item, parsed, service.parameters)
+            emitted.update(m.name for m in results if isinstance(m, api.Metric))
+    return names
+
+
+def test_translations_point_to_defined_metrics(metrics):
+    for translations in metrics.check_metrics.values():
+        for translation in translations.values():
+            assert translation['name'] in metrics.metric_info
+
+
+def test_translations_only_cover_emitted_metrics(metrics):
+    emitted = _emitted()
+    for check, translations in metrics.check_metrics.items():
+        plugin = check[len('check_mk-'):]
+        for source, translation in translations.items():
+            assert translation['name'] in emitted[plugin], (check, source)
+
+
+def test_graphs_use_defined_metrics(metrics):
+    for graph in metrics.graph_info.values():
+        for metric, _style in graph['metrics']:
+            assert metric.split(',')[0] in metrics.metric_info
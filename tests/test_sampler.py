@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Tests of the sampler bin/cablefree_diamond_sampler.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+
+import pytest
+
+from .conftest import NOW, load_script
+
+
+@pytest.fixture(name='sampler', scope='module')
+def _sampler():
+    return load_script('bin/cablefree_diamond_sampler')
+
+
+def test_ring_keeps_the_newest_slots(sampler, tmp_path):
+    path = str(tmp_path / 'radio.ring')
+    ring = sampler.Ring(path, slots=4)
+    ring.append([sampler.Sample(NOW + i, 1, 1, -450 - i, 370) for i in range(6)])
+    ring.close()
+    ring = sampler.Ring(path)
+    # the oldest slot is the next one to be overwritten and is not read
+    assert [(seq, s.time - NOW) for seq, s in ring.records(0)] == [(3, 3), (4, 4), (5, 5)]
+    ring.close()
+
+
+def test_ring_reads_do_not_consume(sampler, tmp_path):
+    ring = sampler.Ring(str(tmp_path / 'radio.ring'), slots=16)
+    ring.append([sampler.Sample(NOW + i, 1, 1, -450, 370) for i in range(10)])
+    assert [seq for seq, _s in ring.records(NOW + 7)] == [7, 8, 9]
+    assert [seq for seq, _s in ring.records(NOW + 7)] == [7, 8, 9]
+    ring.close()
+
+
+def test_ring_drops_the_records_the_writer_overtook(sampler, tmp_path, monkeypatch):
+    path = str(tmp_path / 'radio.ring')
+    writer = sampler.Ring(path, slots=4)
+    writer.append([sampler.Sample(NOW + i, 1, 1, -450, 370) for i in range(4)])
+    reader = sampler.Ring(path)
+    counter = reader._counter  # pylint: disable=protected-access
+    reads = []
+
+    def racing_counter(offset):
+        # the writer stores two more records while the reader copies
+        if reads:
+            writer.append([sampler.Sample(NOW + i, 1, 1, -450, 370) for i in range(4, 6)])
+        reads.append(offset)
+        return counter(offset)
+
+    monkeypatch.setattr(reader, '_counter', racing_counter)
+    assert [(seq, s.time - NOW) for seq, s in reader.records(0)] == [(3, 3)]
+    reader.close()
+    writer.close()
+
+
+def test_ring_rejects_foreign_files(sampler, tmp_path):
+    path = tmp_path / 'radio.ring'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        sampler.Ring(str(path))
+
+
+def test_dump_prints_the_window(sampler, tmp_path, capsys, monkeypatch):
+    ring = sampler.Ring(sampler.ring_path(str(tmp_path), '10.0.0.1'), slots=16)
+    ring.append([sampler.Sample(NOW, 2, -1, sampler.MISSING, 355), sampler.Sample(NOW + 300, 1, 0, -452, 371)])
+    ring.close()
+    monkeypatch.setattr(sampler.time, 'time', lambda: NOW + 310)
+    assert sampler.main(['--dir', str(tmp_path), 'dump', '--window', '60', '10.0.0.1']) == 0
+    assert capsys.readouterr().out == f'<<<cablefree_diamond_samples:sep(9)>>>\n1\t{NOW + 300}\t1\t0\t-452\t371\n'
+    assert sampler.render_record(0, sampler.Sample(NOW, 2, -1, sampler.MISSING, 355)) == f'0\t{NOW}\t2\t\t\t355'
+
+
+@pytest.mark.parametrize('oid, index', [
+    ('1.3.6.1.4.1.91111.4.80.1.1.2.1.1.7', 7),
+    ('1.3.6.1.4.1.91111.4.80.1.1.2.1.1.255', 255),
+    ('1.3.6.1.4.1.91111.4.80.1.1.2.1.1.256', None),
+    ('1.3.6.1.4.1.91111.4.80.1.1.2.1.1.1.2', None),
+    ('1.3.6.1.4.1.91111.4.80.1.1.2.1.1.', None),
+])
+def test_channel_index_skips_unusable_suffixes(sampler, oid, index):
+    assert sampler.channel_index(oid, f'{sampler.CHANNEL_ENTRY}.{sampler.COLUMN_INDEX}.') == index
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Tests of the SNMP sections.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+
+import agent_based_stub as api
+
+CHANNEL_TABLE = '.1.3.6.1.4.1.91111.4.80.1.1.2.1'
+
+
+def _trees(base):
+    for name, section in api.REGISTRY['snmp_section'].items():
+        for tree in section['fetch']:
+            if tree.base == base:
+                yield name, tree
+
+
+def _columns(tree):
+    return [oid for oid in tree.oids if isinstance(oid, str)]
+
+
+def test_channel_table_is_walked_once_per_cycle():
+    trees = list(_trees(CHANNEL_TABLE))
+    # the live columns in the device section, the static ones in the config
+    # section, which is fetched at a long interval
+    assert sorted(name for name, _tree in trees) == ['cablefree_diamond_config', 'cablefree_diamond_device']
+
+
+def test_no_column_is_fetched_by_two_sections():
+    walked = {}
+    for name, section in api.REGISTRY['snmp_section'].items():
+        for tree in section['fetch']:
+            for column in _columns(tree):
+                oid = f'{tree.base}.{column}'
+                assert oid not in walked, f'{oid} is fetched by {walked.get(oid)} and {name}'
+                walked[oid] = name
+
+
+def test_no_base_oid_is_fetched_twice_by_one_section():
+    for section in api.REGISTRY['snmp_section'].values():
+        bases = [tree.base for tree in section['fetch']]
+        assert len(bases) == len(set(bases))
+
+
+def test_check_plugins_subscribe_to_the_shared_sections():
+    sections = {api.parsed_section_name(s) for s in api.REGISTRY['snmp_section'].values()}
+    sections |= {api.parsed_section_name(s) for s in api.REGISTRY['agent_section'].values()}
+    for plugin in api.REGISTRY['check_plugin'].values():
+        assert set(api.plugin_sections(plugin)) <= sections
+
+
+def test_agent_sections_parse_to_the_snmp_sections():
+    agent = {s['name']: api.parsed_section_name(s) for s in api.REGISTRY['agent_section'].values()}
+    assert agent['cablefree_diamond_device_agent'] == 'cablefree_diamond_device'
+    assert agent['cablefree_diamond_config_agent'] == 'cablefree_diamond_config'
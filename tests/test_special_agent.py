@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Tests of the special agent agent_cablefree_diamond.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+
+import argparse
+import asyncio
+import types
+
+import pytest
+
+import agent_based_stub as api
+import synthetic
+
+from .conftest import load_script
+
+
+class EndOfMibView:
+    def prettyPrint(self):  # pylint: disable=invalid-name
+        return ''
+
+
+class Value:
+    def __init__(self, text):
+        self._text = text
+
+    def prettyPrint(self):  # pylint: disable=invalid-name
+        return self._text
+
+
+class FakeAgent:
+    """GETBULK (non-repeaters 0) over a walk, counting the requests"""
+    def __init__(self, walk):
+        self.oids = [oid for oid, _value in synthetic.sorted_walk(walk)]
+        self.walk = walk
+        self.requests = 0
+
+    def _next(self, oid):
+        key = synthetic.oid_key(oid)
+        for candidate in self.oids:
+            if synthetic.oid_key(candidate) > key:
+                return candidate
+        return None
+
+    async def bulk(self, _engine, _auth, _transport, _context, _non_repeaters, repetitions, *oids, **_kwargs):
+        self.requests += 1
+        cursors = list(oids)
+        var_binds = []
+        for _ in range(repetitions):
+            for position, oid in enumerate(cursors):
+                following = self._next(oid) if oid is not None else None
+                if following is None:
+                    var_binds.append((oid or '', EndOfMibView()))
+                    cursors[position] = None
+                else:
+                    var_binds.append((following, Value(self.walk[following][1])))
+                    cursors[position] = following
+        return None, 0, 0, var_binds
+
+
+@pytest.fixture(name='agent')
+def _agent(monkeypatch):
+    module = load_script('agents/special/agent_cablefree_diamond')
+    monkeypatch.setattr(module, 'hlapi', types.SimpleNamespace(
+        CommunityData=lambda *args, **kwargs: None,
+        ContextData=lambda: None,
+        ObjectType=lambda identity: identity,
+        ObjectIdentity=lambda oid: oid,
+        UdpTransportTarget=lambda *args, **kwargs: None,
+    ))
+    return module
+
+
+def _poller(agent, walk, **options):
+    fake = FakeAgent(walk)
+    poller = agent.Poller.__new__(agent.Poller)
+    poller._args = argparse.Namespace(**{  # pylint: disable=protected-access
+        'community': 'public', 'port': 161, 'timeout': 1, 'retries': 0, 'max_repetitions': 4,
+        'config_interval': 0, 'remote_piggyback': None, **options,
+    })
+    poller._engine = None  # pylint: disable=protected-access
+    poller._bulk = fake.bulk  # pylint: disable=protected-access
+    return poller, fake
+
+
+def test_walk_table_reads_all_columns_in_lock_step(agent):
+    walk = synthetic.device_walk(channels=4, ports=4)
+    poller, fake = _poller(agent, walk)
+    table = agent.DEVICE_TABLES[1]
+    rows, requests, _varbinds = asyncio.run(poller.walk_table(None, table))
+    assert rows == synthetic.string_tables(walk, api.REGISTRY['snmp_section']['cablefree_diamond_device']
+                                           ['fetch'][1])
+    # 4 rows and the end of the columns with 4 repetitions per request
+    assert requests == fake.requests == 2
+
+
+def test_walk_table_prepends_the_index_of_oid_end_tables(agent):
+    walk = synthetic.device_walk(channels=2, ports=3)
+    poller, _fake = _poller(agent, walk)
+    rows, _requests, _varbinds = asyncio.run(poller.walk_table(None, agent.DEVICE_TABLES[3]))
+    assert [row[:2] for row in rows] == [['1', 'port1'], ['2', 'port2'], ['3', 'port3']]
+
+
+def _sections(lines):
+    """Split agent output into {(piggyback host, section): rows}"""
+    sections, host, name = {}, '', None
+    for line in lines:
+        if line.startswith('<<<<'):
+            host = line.strip('<>')
+        elif line.startswith('<<<'):
+            name = line.strip('<>').split(':')[0]
+            sections.setdefault((host, name), [])
+        else:
+            sections[(host, name)].append(line.split('\t'))
+    return sections
+
+
+def test_poll_sends_the_remote_unit_as_piggyback_data(agent):
+    walk = synthetic.device_walk(channels=4, ports=2)
+    poller, _fake = _poller(agent, walk, remote_piggyback='site')
+    lines, _stats = asyncio.run(poller.poll(agent.Target('radio', '10.0.0.1')))
+    sections = _sections(lines)
+    parse = api.REGISTRY['agent_section']['cablefree_diamond_device_agent']['parse_function']
+    local = parse(sections[('', 'cablefree_diamond_device_agent')])
+    remote = parse(sections[('SITE-B', 'cablefree_diamond_device_agent')])
+    assert local.remote_host == 'SITE-B'
+    assert sorted(local.channels) == ['1', '2', '3', '4']
+    assert sorted(remote.channels) == ['3', '4'] and sorted(remote.general) == ['1']
+    parse = api.REGISTRY['agent_section']['cablefree_diamond_config_agent']['parse_function']
+    assert sorted(parse(sections[('SITE-B', 'cablefree_diamond_config_agent')]).channels) == ['3', '4']
+
+
+def test_remote_host_name():
+    agent = load_script('agents/special/agent_cablefree_diamond')
+    config = ['general\t1\tremote\t10.0.0.2\t1\tSite B/North', 'general\t2\tlocal\t10.0.0.1\t1\tSITE-A']
+    assert agent.remote_host_name(config, 'site') == 'Site_B_North'
+    assert agent.remote_host_name(config, 'ip') == '10.0.0.2'
+    assert agent.remote_host_name(config, None) == ''
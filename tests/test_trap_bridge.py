@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Tests of the trap bridge bin/cablefree_diamond_trap_bridge.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+
+import os
+import re
+
+import pytest
+
+from .conftest import REPO, load_script
+
+
+@pytest.fixture(name='bridge', scope='module')
+def _bridge():
+    return load_script('bin/cablefree_diamond_trap_bridge')
+
+
+def test_lost_lock_goes_to_the_hop_state(bridge):
+    result = bridge.translate('modemLockStatusChange', 'channelStatusIndex.2: 2, modemLockStatus.2: unlocked')
+    assert result == bridge.CheckResult('Diamond Hop State', bridge.WARN,
+                                        'Channel 2 lost its modem lock, reported by trap')
+    lines = bridge.command('radio-a', result).splitlines()
+    assert lines[0].endswith('PROCESS_SERVICE_CHECK_RESULT;radio-a;Diamond Hop State;1;'
+                             'Channel 2 lost its modem lock, reported by trap')
+    assert '] SCHEDULE_FORCED_SVC_CHECK;radio-a;Check_MK;' in lines[1]
+
+
+def test_regained_lock_only_reschedules(bridge):
+    # the rule pack rewrote the application, the trap is recognised by its variables
+    result = bridge.translate('Diamond Hop State', '1.3.6.1.4.1.91111.4.80.1.1.2.1.15.2: 0', 'closed')
+    assert result.state is None
+    lines = bridge.command('radio-a', result).splitlines()
+    assert len(lines) == 1 and 'SCHEDULE_FORCED_SVC_CHECK;radio-a;Check_MK;' in lines[0]
+
+
+def test_unit_traps_go_to_the_general_status(bridge):
+    result = bridge.translate('systemAlarmChange', 'systemAlarm.1: alarm')
+    assert (result.service, result.state) == ('Diamond General Status 1', bridge.WARN)
+    assert 'SCHEDULE_FORCED_SVC_CHECK' not in bridge.command('radio-a', result)
+    assert bridge.translate('coldStart', '') is None
+
+
+def test_lock_traps_of_all_channels_make_one_event():
+    namespace = {'mkp_rule_packs': {}}
+    with open(os.path.join(REPO, 'ec_rule_packs', 'cablefree_diamond.mk'), encoding='utf-8') as rule_pack:
+        exec(rule_pack.read(), namespace)  # pylint: disable=exec-used
+    rules = {r['id']: r for r in namespace['mkp_rule_packs']['cablefree_diamond']['rules']}
+    rule = rules['cablefree_diamond_lock_lost']
+    for index in ('1', '2'):
+        match = re.search(rule['match'], f'modemLockStatus.{index}: unlocked')
+        assert match.expand(rule['set_application']) == 'Diamond Hop State'
+    assert rule['count']['separate_host'] and not rule['count']['separate_match_groups']
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Tests of the helpers in agent_based/utils/cablefree_diamond.py.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import random
+import struct
+
+import pytest
+
+import synthetic
+from cmk.base.plugins.agent_based.utils import cablefree_diamond as utils
+
+from .conftest import NOW, parse_walk
+
+
+@pytest.mark.parametrize('text, seconds', [
+    ('0d 00:24:25', 1465.0),
+    ('3d 01:00:00', 3 * 86400 + 3600.0),
+    ('12:30', 45000.0),
+    ('garbage', None),
+    ('', None),
+])
+def test_parse_uptime(text, seconds):
+    assert utils.parse_uptime(text) == seconds
+
+
+def test_converters_mark_garbage_as_none():
+    assert utils.to_scaled('-453') == -45.3
+    assert utils.to_scaled('n/a') is None
+    assert utils.to_flag(' 1') is True
+    assert utils.to_flag('2') is None
+    assert utils.to_enum('3', utils.PORT_SPEED_MAP) == '1000M'
+
+
+@pytest.mark.parametrize('text, speed', [
+    ('1000M', '1000M'),
+    ('1000 Mbps', '1000M'),
+    ('1G', '1000M'),
+    ('1 Gbit/s', '1000M'),
+    ('100M Full', '100M'),
+    ('2.5G', '2500M'),
+    ('10Gbps', '10G'),
+    ('10000M', '10G'),
+    ('auto', None),
+    ('', None),
+    ('40G', None),
+])
+def test_port_speed_class(text, speed):
+    assert utils.port_speed_class(text) == speed
+
+
+def test_parse_device_pairs_local_and_remote_channels():
+    device = parse_walk(synthetic.device_walk(channels=4))['cablefree_diamond_device']
+    assert sorted(device.channels) == ['1', '2', '3', '4']
+    assert device.peers == {'1': '3', '3': '1', '2': '4', '4': '2'}
+    assert {index: (pair.local.index, pair.remote.index) for index, pair in device.links.items()} == {
+        '1': ('1', '3'),
+        '2': ('2', '4'),
+    }
+    assert device.general['1'].is_remote and not device.general['2'].is_remote
+
+
+def test_parse_device_agent_reads_the_piggyback_line():
+    device = utils.parse_device_agent([
+        ['channel', '1', 'local', '460000', '-450', '370', '18', '7', '7', '0', '1'],
+        ['channel', '2', 'remote', '460000', '-460', '360', '18', '7', '7', '0', '1'],
+        ['piggyback', 'site-b'],
+    ])
+    assert device.remote_host == 'site-b'
+    assert not utils.monitored_here(device, device.channels['2'])
+    assert utils.monitored_here(device, device.channels['1'])
+
+
+def test_ring_append_keeps_the_newest_records():
+    record = struct.Struct('<I')
+    ring = b''
+    for value in range(15):
+        ring = utils.ring_append(ring, record, (value,), 10)
+    assert [r[0] for r in utils.ring_records(ring, record)] == list(range(5, 15))
+
+
+def test_load_state_pads_older_versions():
+    store = {utils.STATE_KEY: (4, 56000, 7, 6)}
+    state = utils.load_state(store, utils.ChannelState)
+    assert state.version == utils.ChannelState().version
+    assert (state.bandwidth, state.tx_modulation, state.rx_modulation) == (56000, 7, 6)
+    assert state.bandwidth_damping == b''
+
+
+def test_load_state_migrates_without_record():
+    state = utils.load_state({}, utils.ChannelState, lambda store: utils.ChannelState(bandwidth=1))
+    assert state.bandwidth == 1
+    assert utils.load_state({}, utils.GeneralState) == utils.GeneralState()
+
+
+def test_trend_follows_a_steady_decline():
+    record = b''
+    for minute in range(600):
+        trend = utils.update_trend(record, NOW + minute * 60, -40.0 - minute / 60, 3600)
+        record = utils.pack_trend(trend)
+    # one dB per hour down, the mean lags behind by about one time constant
+    assert trend.slope == pytest.approx(-1.0, abs=0.05)
+    assert trend.mean == pytest.approx(-40.0 - 599 / 60 + 1.0, abs=0.1)
+    assert utils.hours_to_level(trend, trend.mean - 5) == pytest.approx(5.0, rel=0.05)
+
+
+def test_projection_needs_a_fall_towards_the_level():
+    assert utils.hours_to_level(utils.Trend(NOW, -60.0, 0.0, -1.0), -70.0) == 10.0
+    assert utils.hours_to_level(utils.Trend(NOW, -60.0, 0.0, 1.0), -70.0) is None
+    # already crossed
+    assert utils.hours_to_level(utils.Trend(NOW, -75.0, 0.0, -1.0), -70.0) is None
+
+
+def test_trend_ignores_samples_without_elapsed_time():
+    trend = utils.update_trend(b'', NOW, -40.0, 3600)
+    assert utils.update_trend(utils.pack_trend(trend), NOW, -80.0, 3600).mean == -40.0
+
+
+def test_quantile_estimate_tracks_the_percentile():
+    rnd = random.Random(1)
+    values = [rnd.gauss(-45.0, 2.0) for _ in range(5000)]
+    record = b''
+    for value in values:
+        record = utils.update_quantile(record, value, 0.05)
+    count, estimate = utils.quantile_estimate(record)
+    assert count == 5000
+    assert estimate == pytest.approx(sorted(values)[250], abs=0.3)
+
+
+def test_quantile_needs_five_samples():
+    record = b''
+    for value in range(4):
+        record = utils.update_quantile(record, value, 0.05)
+    assert utils.quantile_estimate(record) == (4, None)
+
+
+def test_availability_splits_a_state_change():
+    hours, days = utils.update_availability(b'', b'', NOW, True, NOW + 600, False)
+    figures = utils.availability_since(hours, 0)
+    assert (figures.observed, figures.unlocked, figures.outages) == (600, 300, 1)
+    assert utils.availability_since(days, 0) == figures
+    assert figures.percent == 50.0
+
+
+def test_availability_skips_long_gaps():
+    hours, days = utils.update_availability(b'', b'', NOW, True, NOW + utils.MAX_POLL_GAP + 1, True)
+    assert (hours, days) == (b'', b'')
+
+
+def test_availability_rings_are_bounded():
+    hours = days = b''
+    for step in range(24 * 40):
+        hours, days = utils.update_availability(hours, days, NOW + step * 3600, True,
+                                                NOW + (step + 1) * 3600, True)
+    assert len(hours) <= utils.AVAILABILITY_BUCKET.size * utils.AVAILABILITY_HOURS
+    assert len(days) <= utils.AVAILABILITY_BUCKET.size * utils.AVAILABILITY_DAYS
+
+
+def test_histogram_shares():
+    record = utils.update_histogram(b'', 7, 300, 30 * 86400)
+    record = utils.update_histogram(record, 3, 100, 30 * 86400)
+    shares = utils.histogram_shares(record)
+    assert shares[7] == pytest.approx(75.0, abs=0.01)
+    assert shares[3] == pytest.approx(25.0, abs=0.01)
+    assert utils.histogram_shares(b'') is None
+
+
+def test_damping_holds_down_a_change():
+    record, damped = utils.update_damped(b'', 7, NOW, hold_down=120)
+    record, damped = utils.update_damped(record, 5, NOW + 60, hold_down=120)
+    assert (damped.stable, damped.pending, damped.pending_since) == (7, 5, NOW + 60)
+    record, damped = utils.update_damped(record, 5, NOW + 180, hold_down=120)
+    assert (damped.previous, damped.stable, damped.pending) == (7, 5, None)
+
+
+def test_damping_ignores_small_steps_and_returns():
+    record, damped = utils.update_damped(b'', 56000, NOW, min_step=1000)
+    record, damped = utils.update_damped(record, 55500, NOW + 60, min_step=1000)
+    assert damped.stable == 56000 and damped.flaps == 0
+    record, damped = utils.update_damped(b'', 1, NOW, hold_down=300)
+    record, damped = utils.update_damped(record, 0, NOW + 60, hold_down=300)
+    record, damped = utils.update_damped(record, 1, NOW + 120, hold_down=300)
+    assert (damped.stable, damped.pending, damped.flaps) == (1, None, 2)
+
+
+def test_damping_counts_flaps_within_the_window():
+    record = b''
+    for step in range(10):
+        record, damped = utils.update_damped(record, step % 2, NOW + step * 600, window=3600)
+    # changes at 600 s steps, only those of the last hour count
+    assert damped.flaps == 6
+    assert utils.is_flapping(damped, {'flap_levels': (4, 10)})
+    assert not utils.is_flapping(damped, {'flap_levels': None})
+
+
+def test_damping_seeds_from_the_previous_reading():
+    _record, damped = utils.update_damped(b'', 5, NOW, initial=7)
+    assert (damped.previous, damped.stable) == (7, 5)
+
+
+def test_counter_delta_counts_forward():
+    assert utils.counter_delta(1000, 61000, 60) == 60000
+
+
+def test_counter_delta_wraps_only_just_below_32_bit():
+    assert utils.counter_delta((1 << 32) - 1000, 5000, 60) == 6000
+    # a too fast wrap is a reset too
+    assert utils.counter_delta((1 << 32) - 1000, utils.WRAP_MARGIN - 1, 0.01) is None
+
+
+@pytest.mark.parametrize('previous, current', [
+    (3_000_000_000, 1_000_000),  # far below 2**32
+    ((1 << 32) - 1000, 3_000_000_000),  # not near zero after the wrap
+    (1 << 40, 5),  # 64 bit
+])
+def test_counter_delta_treats_other_decreases_as_reset(previous, current):
+    assert utils.counter_delta(previous, current, 60) is None
+
+
+def test_parse_samples_groups_by_channel():
+    section = utils.parse_samples([
+        ['7', str(NOW), '1', '1', '-452', '371'],
+        ['8', str(NOW), '2', '', '', '355'],
+        ['x', str(NOW), '1', '1', '-452', '371'],
+        ['9', str(NOW)],
+    ])
+    assert section == {
+        '1': [utils.SampleRecord(7, NOW, True, -45.2, 37.1)],
+        '2': [utils.SampleRecord(8, NOW, None, None, 35.5)],
+    }
+
+
+def test_new_samples_after_the_last_seen():
+    records = [utils.SampleRecord(seq, NOW + seq, True, -45.0, 37.0) for seq in range(10, 20)]
+    assert [r.seq for r in utils.new_samples(records, 16)] == [17, 18, 19]
+    assert utils.new_samples(records, 19) == []
+    assert len(utils.new_samples(records, None)) == 10
+    # the ring was recreated, its sequence starts over
+    assert len(utils.new_samples(records, 5000)) == 10
+
+
+def test_aggregate_samples():
+    records = [utils.SampleRecord(i, NOW + i, i != 3, -45.0 - i / 10, None) for i in range(20)]
+    aggregate = utils.aggregate_samples('1', records)
+    assert (aggregate.samples, aggregate.seconds, aggregate.unlocked) == (20, 19, 1)
+    assert (aggregate.rsl_min, aggregate.rsl_avg, aggregate.rsl_max, aggregate.rsl_p5) == \
+        (pytest.approx(-46.9), -46.0, -45.0, pytest.approx(-46.8))
+    assert aggregate.snr_min is None
+    assert utils.aggregate_samples('1', []) is None
+
+
+def _device(locks, remote_locks=None):
+    channels = {
+        str(i): utils.ChannelRow(str(i), False, 460000, -45.0, 37.0, 18, 7, 7, False, locked)
+        for i, locked in enumerate(locks, 1)
+    }
+    links = {}
+    for i, locked in enumerate(remote_locks or [], 1):
+        index = str(len(locks) + i)
+        channels[index] = utils.ChannelRow(index, True, 460000, -45.0, 37.0, 18, 7, 7, False, locked)
+        links[str(i)] = utils.LinkPair(channels[str(i)], channels[index])
+    return utils.DiamondDevice({}, channels, {}, {}, {}, links)
+
+
+def test_hop_is_down_only_without_any_locked_channel():
+    assert not utils.hop_down(_device([True, False]))
+    assert utils.hop_down(_device([False, False]))
+    assert not utils.hop_down(_device([None, False]))
+    # a channel needs both ends locked
+    assert utils.hop_down(_device([True, True], remote_locks=[False, False]))
+    assert not utils.hop_down(None)
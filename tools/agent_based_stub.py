@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Minimal stand-in for the Checkmk agent based API (v1).
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Load the plugins from ``agent_based/`` without a Checkmk site.
+
+``install()`` puts fake ``cmk.base.plugins.agent_based.agent_based_api.v1``
+modules into ``sys.modules`` and maps ``cmk.base.plugins.agent_based`` onto
+the ``agent_based`` directory of this repository, so the plugins (and their
+``.utils`` imports) load unchanged.  Only the parts of the API used by the
+plugins are provided; the behaviour follows Checkmk closely enough for
+benchmarking and replaying, it is not meant to validate plugins.
+
+Every ``register.*`` call is recorded in ``REGISTRY``.  ``get_value_store()``
+returns the store selected with ``value_store_for()``.
+"""
+
+import enum
+import importlib
+import math
+import os
+import re
+import sys
+import time
+import types
+from contextlib import contextmanager
+from typing import Any, Dict, List, MutableMapping, NamedTuple, Optional, Tuple
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN_DIR = os.path.join(REPO, 'agent_based')
+API_MODULE = 'cmk.base.plugins.agent_based.agent_based_api.v1'
+
+REGISTRY: Dict[str, Dict[str, Dict[str, Any]]] = {
+    'snmp_section': {},
+    'agent_section': {},
+    'check_plugin': {},
+    'inventory_plugin': {},
+}
+
+
+# ---------------------------------------------------------------------------
+# API objects
+# ---------------------------------------------------------------------------
+
+class State(enum.IntEnum):
+    OK = 0
+    WARN = 1
+    CRIT = 2
+    UNKNOWN = 3
+
+    @classmethod
+    def worst(cls, *states):
+        if cls.CRIT in states:
+            return cls.CRIT
+        return max(states)
+
+    @classmethod
+    def best(cls, *states):
+        return min(states)
+
+
+class _ResultTuple(NamedTuple):
+    state: State
+    summary: str
+    details: str
+
+
+class Result(_ResultTuple):
+    __slots__ = ()
+
+    def __new__(cls, *, state, summary=None, notice=None, details=None):
+        if (summary is None) == (notice is None):
+            raise TypeError('Result needs exactly one of summary or notice')
+        text = summary if summary is not None else notice
+        return super().__new__(cls, State(state), summary or '', details or text)
+
+
+_METRIC_NAME = re.compile(r'^[a-zA-Z0-9_.]+$')
+
+
+class _MetricTuple(NamedTuple):
+    name: str
+    value: float
+    levels: Optional[Tuple[Optional[float], Optional[float]]]
+    boundaries: Optional[Tuple[Optional[float], Optional[float]]]
+
+
+class Metric(_MetricTuple):
+    __slots__ = ()
+
+    def __new__(cls, name, value, *, levels=None, boundaries=None):
+        if not _METRIC_NAME.match(name):
+            raise TypeError(f'invalid metric name: {name!r}')
+        if not math.isfinite(float(value)):
+            raise TypeError(f'invalid metric value: {value!r}')
+        return super().__new__(cls, name, float(value), levels, boundaries)
+
+
+class Service(NamedTuple):
+    item: Optional[str] = None
+    parameters: Optional[Dict[str, Any]] = None
+    labels: Optional[List[Any]] = None
+
+
+class HostLabel(NamedTuple):
+    name: str
+    value: str
+
+
+class Attributes(NamedTuple):
+    path: List[str]
+    inventory_attributes: Dict[str, Any] = {}
+    status_attributes: Dict[str, Any] = {}
+
+
+class TableRow(NamedTuple):
+    path: List[str]
+    key_columns: Dict[str, Any]
+    inventory_columns: Dict[str, Any] = {}
+    status_columns: Dict[str, Any] = {}
+
+
+class IgnoreResults(NamedTuple):
+    value: str = ''
+
+
+class IgnoreResultsError(RuntimeError):
+    pass
+
+
+class GetRateError(ValueError):
+    pass
+
+
+class SNMPTree(NamedTuple):
+    base: str
+    oids: List[Any]
+
+
+class OIDEnd:
+    def __repr__(self):
+        return 'OIDEnd()'
+
+
+class OIDBytes(str):
+    pass
+
+
+class OIDCached(str):
+    pass
+
+
+# detect specs are kept as plain nested tuples
+def _spec(name):
+    def spec(*args):
+        return (name,) + args
+    spec.__name__ = name
+    return spec
+
+
+class render:  # pylint: disable=invalid-name
+    @staticmethod
+    def timespan(seconds):
+        seconds = int(seconds)
+        days, rest = divmod(seconds, 86400)
+        hours, rest = divmod(rest, 3600)
+        minutes, secs = divmod(rest, 60)
+        if days:
+            return f'{days} days {hours} hours'
+        if hours:
+            return f'{hours} hours {minutes} minutes'
+        if minutes:
+            return f'{minutes} minutes {secs} seconds'
+        return f'{secs} seconds'
+
+    @staticmethod
+    def percent(value):
+        return f'{value:.2f}%'
+
+    @staticmethod
+    def bytes(value):
+        return _scaled(value, 1024, ['B', 'KiB', 'MiB', 'GiB', 'TiB'])
+
+    @staticmethod
+    def disksize(value):
+        return _scaled(value, 1000, ['B', 'kB', 'MB', 'GB', 'TB'])
+
+    @staticmethod
+    def networkbandwidth(octets_per_sec):
+        return _scaled(octets_per_sec * 8, 1000, ['Bit/s', 'kBit/s', 'MBit/s', 'GBit/s'])
+
+    @staticmethod
+    def iobandwidth(bytes_per_sec):
+        return _scaled(bytes_per_sec, 1000, ['B/s', 'kB/s', 'MB/s', 'GB/s'])
+
+    @staticmethod
+    def frequency(hertz):
+        return _scaled(hertz, 1000, ['Hz', 'kHz', 'MHz', 'GHz'])
+
+    @staticmethod
+    def date(epoch):
+        return time.strftime('%Y-%m-%d', time.localtime(epoch))
+
+    @staticmethod
+    def datetime(epoch):
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(epoch))
+
+
+def _scaled(value, base, units):
+    for unit in units[:-1]:
+        if abs(value) < base:
+            return f'{value:.2f} {unit}'
+        value /= base
+    return f'{value:.2f} {units[-1]}'
+
+
+def _default_render(value):
+    return f'{value:.2f}' if isinstance(value, float) else str(value)
+
+
+def check_levels(value, *, levels_upper=None, levels_lower=None, metric_name=None,
+                 render_func=None, label=None, boundaries=None, notice_only=False):
+    render_func = render_func or _default_render
+    text = render_func(value)
+    if label:
+        text = f'{label}: {text}'
+
+    state = State.OK
+    if levels_upper is not None:
+        warn, crit = levels_upper
+        if value >= crit:
+            state = State.CRIT
+        elif value >= warn:
+            state = State.WARN
+        if state is not State.OK:
+            text += f' (warn/crit at {render_func(warn)}/{render_func(crit)})'
+    if state is State.OK and levels_lower is not None:
+        warn, crit = levels_lower
+        if value < crit:
+            state = State.CRIT
+        elif value < warn:
+            state = State.WARN
+        if state is not State.OK:
+            text += f' (warn/crit below {render_func(warn)}/{render_func(crit)})'
+
+    if notice_only:
+        yield Result(state=state, notice=text)
+    else:
+        yield Result(state=state, summary=text)
+    if metric_name:
+        yield Metric(metric_name, value, levels=levels_upper, boundaries=boundaries)
+
+
+def get_rate(value_store, key, time, value, *, raise_overflow=False):  # pylint: disable=redefined-outer-name
+    last = value_store.get(key)
+    value_store[key] = (time, value)
+    if last is None or last[0] >= time:
+        raise GetRateError(f'Initialized: {key!r}')
+    rate = (value - last[1]) / (time - last[0])
+    if raise_overflow and rate < 0:
+        raise GetRateError(f'Value overflow: {key!r}')
+    return rate
+
+
+def get_average(value_store, key, time, value, backlog_minutes):  # pylint: disable=redefined-outer-name
+    last = value_store.get(key)
+    if last is None:
+        value_store[key] = (time, time, value)
+        return value
+    first_time, last_time, average = last
+    weight = 0.5 ** ((time - last_time) / (backlog_minutes * 60.0))
+    average = average * weight + value * (1 - weight)
+    value_store[key] = (first_time, time, average)
+    return average
+
+
+# ---------------------------------------------------------------------------
+# value store and host context
+# ---------------------------------------------------------------------------
+
+_VALUE_STORES: Dict[Tuple[str, str, Optional[str]], MutableMapping[str, Any]] = {}
+_CURRENT: Dict[str, Any] = {'host': 'localhost', 'store': {}}
+
+
+def get_value_store() -> MutableMapping[str, Any]:
+    return _CURRENT['store']
+
+
+def host_name() -> str:
+    return _CURRENT['host']
+
+
+@contextmanager
+def value_store_for(host: str, plugin: str, item: Optional[str],
+                    stores: Optional[Dict] = None):
+    """Select the value store of one service while checking it"""
+    stores = _VALUE_STORES if stores is None else stores
+    previous = dict(_CURRENT)
+    _CURRENT['host'] = host
+    _CURRENT['store'] = stores.setdefault((host, plugin, item), {})
+    try:
+        yield _CURRENT['store']
+    finally:
+        _CURRENT.update(previous)
+
+
+def reset_value_stores() -> None:
+    _VALUE_STORES.clear()
+
+
+# ---------------------------------------------------------------------------
+# module installation and plugin loading
+# ---------------------------------------------------------------------------
+
+class _Register:
+    @staticmethod
+    def _record(kind, kwargs):
+        REGISTRY[kind][kwargs['name']] = kwargs
+
+    def snmp_section(self, **kwargs):
+        self._record('snmp_section', kwargs)
+
+    def agent_section(self, **kwargs):
+        self._record('agent_section', kwargs)
+
+    def check_plugin(self, **kwargs):
+        self._record('check_plugin', kwargs)
+
+    def inventory_plugin(self, **kwargs):
+        self._record('inventory_plugin', kwargs)
+
+
+def _module(name: str, path: Optional[List[str]] = None) -> types.ModuleType:
+    module = types.ModuleType(name)
+    if path is not None:
+        module.__path__ = path
+    sys.modules[name] = module
+    return module
+
+
+def install() -> None:
+    """Register the stand-in modules (idempotent)"""
+    if API_MODULE in sys.modules:
+        return
+    for name in ('cmk', 'cmk.base', 'cmk.base.plugins'):
+        _module(name, [])
+    _module('cmk.base.plugins.agent_based', [PLUGIN_DIR])
+    _module('cmk.base.plugins.agent_based.agent_based_api', [])
+
+    v1 = _module(API_MODULE, [])
+    for obj in (State, Result, Metric, Service, HostLabel, Attributes, TableRow,
+                IgnoreResults, IgnoreResultsError, GetRateError, SNMPTree, OIDEnd,
+                OIDBytes, OIDCached, render, check_levels, get_rate, get_average,
+                get_value_store, host_name):
+        setattr(v1, obj.__name__, obj)
+    for name in ('all_of', 'any_of', 'contains', 'endswith', 'equals', 'exists', 'matches',
+                 'not_contains', 'not_endswith', 'not_equals', 'not_exists', 'not_matches',
+                 'not_startswith', 'startswith'):
+        setattr(v1, name, _spec(name))
+    v1.register = _Register()
+
+    type_defs = _module(API_MODULE + '.type_defs')
+    type_defs.StringTable = List[List[str]]
+    type_defs.StringByteTable = List[List[Any]]
+    for name in ('CheckResult', 'DiscoveryResult', 'InventoryResult', 'HostLabelGenerator'):
+        setattr(type_defs, name, Any)
+    v1.type_defs = type_defs
+
+
+def load_plugins() -> Dict[str, types.ModuleType]:
+    """Import every plugin module in agent_based/ and return them by name"""
+    install()
+    modules = {}
+    for filename in sorted(os.listdir(PLUGIN_DIR)):
+        if filename.endswith('.py'):
+            name = filename[:-3]
+            modules[name] = importlib.import_module(f'cmk.base.plugins.agent_based.{name}')
+    return modules
+
+
+# ---------------------------------------------------------------------------
+# calling conventions of the Checkmk backend
+# ---------------------------------------------------------------------------
+
+def parsed_section_name(section: Dict[str, Any]) -> str:
+    return section.get('parsed_section_name') or section['name']
+
+
+def plugin_sections(plugin: Dict[str, Any]) -> List[str]:
+    return list(plugin.get('sections') or [plugin['name']])
+
+
+def _section_kwargs(plugin: Dict[str, Any], parsed: Dict[str, Any]) -> Dict[str, Any]:
+    names = plugin_sections(plugin)
+    if len(names) == 1:
+        return {'section': parsed.get(names[0])}
+    return {f'section_{name}': parsed.get(name) for name in names}
+
+
+def has_sections(plugin: Dict[str, Any], parsed: Dict[str, Any]) -> bool:
+    return any(parsed.get(name) is not None for name in plugin_sections(plugin))
+
+
+def run_discovery(plugin: Dict[str, Any], parsed: Dict[str, Any],
+                  params: Optional[Dict[str, Any]] = None) -> List[Any]:
+    kwargs = _section_kwargs(plugin, parsed)
+    if 'discovery_ruleset_name' in plugin:
+        kwargs['params'] = params if params is not None else plugin.get(
+            'discovery_default_parameters', {})
+    return list(plugin['discovery_function'](**kwargs))
+
+
+def run_check(plugin: Dict[str, Any], item: Optional[str], parsed: Dict[str, Any],
+              params: Optional[Dict[str, Any]] = None) -> List[Any]:
+    kwargs = _section_kwargs(plugin, parsed)
+    if item is not None:
+        kwargs['item'] = item
+    if 'check_default_parameters' in plugin:
+        merged = dict(plugin['check_default_parameters'])
+        merged.update(params or {})
+        kwargs['params'] = merged
+    try:
+        return list(plugin['check_function'](**kwargs))
+    except IgnoreResultsError as exc:
+        return [IgnoreResults(str(exc))]
+
+
+def run_inventory(plugin: Dict[str, Any], parsed: Dict[str, Any]) -> List[Any]:
+    kwargs = _section_kwargs(plugin, parsed)
+    if 'inventory_default_parameters' in plugin:
+        kwargs['params'] = plugin['inventory_default_parameters']
+    return list(plugin['inventory_function'](**kwargs))
+
+
+def service_state(results: List[Any]) -> State:
+    states = [r.state for r in results if isinstance(r, Result)]
+    return State.worst(*states) if states else State.UNKNOWN
+
+
+def item_of(service: Any) -> Optional[str]:
+    return getattr(service, 'item', None)
+
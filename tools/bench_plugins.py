@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Offline benchmark of the CableFree Diamond plugins.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Measure parse, discovery and check cost of every plugin in agent_based/.
+
+Synthetic string tables are generated for each combination of channel and
+port count and fed through the SNMP section parse functions, the discovery
+and check functions of every check plugin, and the table renderer of the
+channel summary.  For each stage the wall time per call and the peak
+allocation of one call (tracemalloc) are reported, followed by the cost of a
+simulated poll cycle over ``--hosts`` devices.
+
+No Checkmk site is needed, see agent_based_stub.py.
+
+    python3 tools/bench_plugins.py --channels 1,8,64 --ports 1,10,48
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+import agent_based_stub as api
+import synthetic
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> Tuple[float, int]:
+    """Return (seconds per call, peak bytes of one call)"""
+    func()  # warm up, initialises value stores and caches
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    func()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def _parse_all(walk: synthetic.Walk) -> Dict[str, Callable[[], Any]]:
+    """Return one parse callable per snmp section, bound to its string table"""
+    parsers = {}
+    for name, section in api.REGISTRY['snmp_section'].items():
+        table = synthetic.string_tables(walk, section['fetch'])
+        parse = section['parse_function']
+        parsers[name] = (lambda parse=parse, table=table: parse(table))
+    return parsers
+
+
+def parse_sections(walk: synthetic.Walk) -> Dict[str, Any]:
+    return {
+        api.parsed_section_name(api.REGISTRY['snmp_section'][name]): parse()
+        for name, parse in _parse_all(walk).items()
+    }
+
+
+def _services(parsed: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    services = []
+    for name, plugin in api.REGISTRY['check_plugin'].items():
+        if not api.has_sections(plugin, parsed):
+            continue
+        for service in api.run_discovery(plugin, parsed):
+            services.append((name, api.item_of(service)))
+    return services
+
+
+def _check_host(host: str, parsed: Dict[str, Any], services: List[Tuple[str, Any]]) -> None:
+    for name, item in services:
+        plugin = api.REGISTRY['check_plugin'][name]
+        with api.value_store_for(host, name, item):
+            api.run_check(plugin, item, parsed)
+
+
+def _row(label: str, seconds: float, peak: int) -> str:
+    return f'  {label:<56} {seconds * 1e6:>12.1f} us {peak / 1024:>10.1f} KiB'
+
+
+def bench_device(channels: int, ports: int, repeat: int, hosts: int,
+                 modules: Dict[str, Any]) -> List[str]:
+    walk = synthetic.device_walk(channels=channels, ports=ports)
+    lines = [f'channels={channels} ports={ports}']
+
+    for name, parse in _parse_all(walk).items():
+        lines.append(_row(f'parse {name}', *_measure(parse, repeat)))
+
+    parsed = parse_sections(walk)
+    for name, plugin in api.REGISTRY['check_plugin'].items():
+        if not api.has_sections(plugin, parsed):
+            continue
+        lines.append(_row(f'discover {name}',
+                          *_measure(lambda: api.run_discovery(plugin, parsed), repeat)))
+        items = [api.item_of(s) for s in api.run_discovery(plugin, parsed)]
+
+        def check_all(plugin=plugin, name=name, items=items):
+            for item in items:
+                with api.value_store_for('bench', name, item):
+                    api.run_check(plugin, item, parsed)
+
+        seconds, peak = _measure(check_all, repeat)
+        per_item = seconds / max(1, len(items))
+        lines.append(_row(f'check {name} ({len(items)} services)', seconds, peak))
+        lines.append(_row(f'  per service', per_item, peak // max(1, len(items))))
+
+    summary = modules.get('cablefree_diamond_channel_summary')
+    if summary is not None:
+        device = parsed.get('cablefree_diamond_device')
+        section = device.channels if device else None
+        config = parsed.get('cablefree_diamond_config')
+        if section:
+            lines.append(_row('_build_table',
+                              *_measure(lambda: summary._build_table(section, config), repeat)))
+
+    # one poll cycle over many hosts: parse every section and run every check
+    services = _services(parsed)
+    parsers = _parse_all(walk)
+
+    def cycle():
+        for host_no in range(hosts):
+            host_parsed = {
+                api.parsed_section_name(api.REGISTRY['snmp_section'][name]): parse()
+                for name, parse in parsers.items()
+            }
+            _check_host(f'host{host_no}', host_parsed, services)
+
+    api.reset_value_stores()
+    cycle()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    cycle()
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    tracemalloc.start()
+    cycle()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    lines.append(f'  {hosts}-host cycle ({len(services)} services/host): '
+                 f'wall {wall:.3f} s, cpu {cpu:.3f} s, peak {peak / 1024:.1f} KiB')
+    api.reset_value_stores()
+    return lines
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(part) for part in text.split(',') if part]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--channels', type=_int_list, default=[1, 2, 8, 16, 64],
+                        help='comma separated channel counts (default: %(default)s)')
+    parser.add_argument('--ports', type=_int_list, default=[1, 10, 24, 48],
+                        help='comma separated port counts (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=200,
+                        help='calls per measurement (default: %(default)s)')
+    parser.add_argument('--hosts', type=int, default=1000,
+                        help='hosts per simulated poll cycle (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    modules = api.load_plugins()
+    print(f'{"stage":<58} {"time/call":>15} {"peak alloc":>14}')
+    for channels in args.channels:
+        for ports in args.ports:
+            print('\n'.join(bench_device(channels, ports, args.repeat, args.hosts, modules)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
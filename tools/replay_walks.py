@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Replay recorded SNMP walks of a CableFree Diamond through the plugins.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Run parse, discovery and check of the plugins on recorded walks.
+
+Every file is one snapshot of a device, either the output of
+``snmpwalk -v2c -c public -On <host> .1`` or an snmpsim ``.snmprec`` file.
+The string table of every SNMPTree declared in agent_based/ is rebuilt from
+it, the sections whose detect spec matches are parsed, the services are
+discovered on the first snapshot and checked on every snapshot.
+
+Snapshots are replayed in the given order on a simulated clock, ``--interval``
+seconds apart, so rates, trends and accumulators evolve as on a site.  The
+value stores are kept in ``--state`` between runs; delete it to start over.
+
+    snmpwalk -v2c -c public -On radio-a .1 > radio-a.walk
+    python3 tools/replay_walks.py radio-a.walk
+
+    python3 tools/snmprec_gen.py --out day --series 1440 --scenario fading
+    python3 tools/replay_walks.py --interval 60 --changes day/
+
+``--params`` points to a file with a Python dict of check parameters per
+plugin, e.g. ``{'cablefree_diamond_channel': {'rsl': (-60, -70)}}``.  Parse,
+discovery and check times are reported per plugin at the end.
+"""
+
+import argparse
+import ast
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import agent_based_stub as api
+import synthetic
+
+WALK_SUFFIXES = ('.walk', '.snmpwalk', '.snmprec', '.txt')
+
+_WALK_LINE = re.compile(r'^\.?(\d+(?:\.\d+)+)\s*=\s*(?:([\w-]+):\s*)?(.*)$')
+
+
+def _walk_value(kind: Optional[str], value: str) -> str:
+    """Render a value of snmpwalk the way Checkmk hands it to the parse functions"""
+    value = value.strip()
+    if kind in (None, 'STRING') and len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    if kind == 'Timeticks':
+        match = re.match(r'\((\d+)\)', value)
+        return match.group(1) if match else value
+    if kind in ('INTEGER', 'Gauge32', 'Counter32', 'Counter64', 'Unsigned32'):
+        # named enums (without -Oe) look like "locked(1)"
+        match = re.search(r'(-?\d+)\)?$', value)
+        return match.group(1) if match else value
+    return value
+
+
+def read_walk(path: str) -> synthetic.Walk:
+    """Read an snmpwalk -On output or an .snmprec file"""
+    walk: synthetic.Walk = {}
+    with open(path, encoding='utf-8', errors='replace') as source:
+        lines = source.read().splitlines()
+
+    if path.endswith('.snmprec'):
+        for line in lines:
+            oid, tag, value = line.split('|', 2)
+            if tag.endswith('x'):  # hex encoded
+                value = bytes.fromhex(value).decode('latin-1')
+            walk[oid.lstrip('.')] = (int(re.sub(r'\D', '', tag) or 0), value)
+        return walk
+
+    last = None
+    for line in lines:
+        match = _WALK_LINE.match(line)
+        if match is None:
+            # continuation of a multi-line string
+            if last is not None:
+                tag, value = walk[last]
+                walk[last] = (tag, f'{value}\n{line}')
+            continue
+        oid, kind, value = match.groups()
+        if kind is None and value.startswith('No more variables'):
+            continue
+        walk[oid] = (0, _walk_value(kind, value))
+        last = oid
+    return walk
+
+
+def expand(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.endswith(WALK_SUFFIXES))
+        else:
+            files.append(path)
+    return files
+
+
+def detect(spec: Any, walk: synthetic.Walk) -> bool:
+    """Evaluate a detect spec recorded by agent_based_stub"""
+    name, args = spec[0], spec[1:]
+    if name == 'all_of':
+        return all(detect(sub, walk) for sub in args)
+    if name == 'any_of':
+        return any(detect(sub, walk) for sub in args)
+    negate = name.startswith('not_')
+    name = name[4:] if negate else name
+    oid = args[0].lstrip('.')
+    value = walk.get(oid, (0, None))[1]
+    if name == 'exists':
+        result = value is not None
+    elif value is None:
+        result = False
+    else:
+        expected = args[1]
+        result = {
+            'contains': lambda: expected.lower() in value.lower(),
+            'startswith': lambda: value.lower().startswith(expected.lower()),
+            'endswith': lambda: value.lower().endswith(expected.lower()),
+            'equals': lambda: value == expected,
+            'matches': lambda: re.match(expected, value) is not None,
+        }[name]()
+    return result != negate
+
+
+@contextmanager
+def simulated_clock(now: float) -> Iterator[None]:
+    """Let time.time() return now; timings use time.perf_counter()"""
+    real = time.time
+    time.time = lambda: now
+    try:
+        yield
+    finally:
+        time.time = real
+
+
+class Timings:
+    def __init__(self) -> None:
+        self.total: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.calls: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    @contextmanager
+    def measure(self, stage: str, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.total[stage, name] += time.perf_counter() - start
+            self.calls[stage, name] += 1
+
+    def report(self) -> List[str]:
+        lines = [f'{"stage":<10} {"plugin":<42} {"calls":>7} {"total":>10} {"per call":>10}']
+        for key in sorted(self.total):
+            total, calls = self.total[key], self.calls[key]
+            lines.append(f'{key[0]:<10} {key[1]:<42} {calls:>7} {total * 1e3:>8.1f}ms '
+                         f'{total / calls * 1e6:>8.1f}us')
+        return lines
+
+
+def load_stores(path: Optional[str]) -> Dict[Tuple[str, str, Optional[str]], Dict[str, Any]]:
+    """Value stores hold literals only, like the ones of Checkmk"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as source:
+        return ast.literal_eval(source.read())
+
+
+def save_stores(path: Optional[str], stores: Dict) -> None:
+    if not path:
+        return
+    with open(path + '.new', 'w', encoding='utf-8') as target:
+        target.write(repr(stores))
+    os.replace(path + '.new', path)
+
+
+def parse_snapshot(walk: synthetic.Walk, timings: Timings) -> Dict[str, Any]:
+    parsed = {}
+    for name, section in api.REGISTRY['snmp_section'].items():
+        if not detect(section['detect'], walk):
+            continue
+        with timings.measure('tables', name):
+            table = synthetic.string_tables(walk, section['fetch'])
+        with timings.measure('parse', name):
+            parsed[api.parsed_section_name(section)] = section['parse_function'](table)
+    return parsed
+
+
+def discover(parsed: Dict[str, Any], timings: Timings) -> List[Tuple[str, Optional[str]]]:
+    services = []
+    for name, plugin in sorted(api.REGISTRY['check_plugin'].items()):
+        if not api.has_sections(plugin, parsed):
+            continue
+        with timings.measure('discovery', name):
+            found = api.run_discovery(plugin, parsed)
+        services.extend((name, api.item_of(service)) for service in found)
+    return services
+
+
+def service_name(plugin: str, item: Optional[str]) -> str:
+    template = api.REGISTRY['check_plugin'][plugin]['service_name']
+    return template % item if item is not None else template
+
+
+def _print_results(stamp: str, name: str, results: List[Any], verbose: bool) -> None:
+    state = api.service_state(results)
+    summary = ', '.join(r.summary for r in results if isinstance(r, api.Result) and r.summary)
+    print(f'{stamp} {state.name:<7} {name}: {summary}')
+    if verbose:
+        for result in results:
+            if isinstance(result, api.Result) and not result.summary:
+                print(f'{"":20}   {result.state.name:<7} {result.details}')
+            elif isinstance(result, api.Metric):
+                print(f'{"":20}   metric  {result.name}={result.value:g}')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__.split('\n\n', 1)[1])
+    parser.add_argument('walks', nargs='+', help='walk files or directories, replayed in order')
+    parser.add_argument('--host', default='replay', help='host name (default: %(default)s)')
+    parser.add_argument('--interval', type=int, default=60,
+                        help='simulated seconds between snapshots (default: %(default)s)')
+    parser.add_argument('--start', type=float,
+                        help='simulated time of the first snapshot (default: now minus the series)')
+    parser.add_argument('--state', default='replay-state.mk',
+                        help='value store file, empty to keep none (default: %(default)s)')
+    parser.add_argument('--params', help='file with a dict of check parameters per plugin')
+    parser.add_argument('--changes', action='store_true',
+                        help='only print services whose state changed, then the last snapshot')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print details and metrics')
+    args = parser.parse_args(argv)
+
+    api.load_plugins()
+    files = expand(args.walks)
+    if not files:
+        sys.stderr.write('no walk files given\n')
+        return 2
+    params: Dict[str, Dict[str, Any]] = {}
+    if args.params:
+        with open(args.params, encoding='utf-8') as source:
+            params = ast.literal_eval(source.read())
+    stores = load_stores(args.state)
+    start = args.start if args.start is not None else time.time() - len(files) * args.interval
+    timings = Timings()
+    services: Optional[List[Tuple[str, Optional[str]]]] = None
+    last_states: Dict[str, api.State] = {}
+    wall = time.perf_counter()
+
+    for step, path in enumerate(files):
+        now = start + step * args.interval
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+        with timings.measure('read', 'walk'):
+            walk = read_walk(path)
+        with simulated_clock(now):
+            # parse in the host context like Checkmk, the value store is unused
+            with api.value_store_for(args.host, '', None, {}):
+                parsed = parse_snapshot(walk, timings)
+            if services is None:
+                services = discover(parsed, timings)
+                if not services:
+                    sys.stderr.write(f'{path}: no services discovered, not a Diamond?\n')
+                    return 1
+            last = step == len(files) - 1
+            for plugin_name, item in services:
+                plugin = api.REGISTRY['check_plugin'][plugin_name]
+                with api.value_store_for(args.host, plugin_name, item, stores), \
+                        timings.measure('check', plugin_name):
+                    results = api.run_check(plugin, item, parsed, params.get(plugin_name))
+                name = service_name(plugin_name, item)
+                state = api.service_state(results)
+                changed = last_states.get(name) not in (None, state)
+                last_states[name] = state
+                if not args.changes or changed or last:
+                    _print_results(stamp, name, results, args.verbose)
+
+    wall = time.perf_counter() - wall
+    save_stores(args.state, stores)
+    print()
+    print('\n'.join(timings.report()))
+    print(f'{len(files)} snapshots, {len(services or [])} services, {wall:.2f}s wall, '
+          f'{wall / len(files) * 1e3:.1f}ms per snapshot')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
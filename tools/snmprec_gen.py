@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Generate snmpsim data files for a simulated CableFree Diamond.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Write ``.snmprec`` files that snmpsim serves like a real Diamond.
+
+The table columns are read from the MIBs shipped in the repository
+(RADIO-DUMONTSTATUS-MIB, SNMP-PORTS-MIB); every generated value is checked
+against the column OID and syntax found there.  snmpsim uses the file name
+as SNMP community, so ``diamond-8ch.snmprec`` answers to ``-c diamond-8ch``.
+
+    python3 tools/snmprec_gen.py --out lab --name diamond --channels 8 \\
+        --ports 10 --scenario fading --report
+
+``--series N`` writes N consecutive snapshots (``<name>-0001.snmprec`` ...)
+with advancing uptimes for replaying a time series.  ``--report`` prints the
+estimated fetch cost of every SNMPTree declared by the plugins.
+"""
+
+import argparse
+import math
+import os
+import re
+import sys
+from typing import Dict, List, Tuple
+
+import synthetic
+
+MIB_FILES = ('RADIO-DUMONTSTATUS-MIB.my', 'SNMP-PORTS-MIB.my')
+
+_OBJECT_TYPE = re.compile(
+    r'(\w+)\s+OBJECT-TYPE\s+SYNTAX\s+(.+?)\s+MAX-ACCESS.*?::=\s*\{\s*(\w+)\s+(\d+)\s*\}',
+    re.S,
+)
+
+# Checkmk's default "Bulk walk: Number of OIDs per bulk"
+MAX_REPETITIONS = 10
+
+
+def _tag(syntax: str) -> int:
+    # all other columns are INTEGER enums, Integer32 or TCs based on it
+    if syntax.startswith('OCTET STRING'):
+        return synthetic.OCTET_STRING
+    return synthetic.INTEGER
+
+
+def mib_columns(repo: str) -> Dict[str, List[Tuple[int, str, int]]]:
+    """Return {entry name: [(column number, column name, tag)]} from the MIBs"""
+    entries: Dict[str, List[Tuple[int, str, int]]] = {}
+    for filename in MIB_FILES:
+        with open(os.path.join(repo, filename), encoding='utf-8', errors='replace') as mib:
+            text = mib.read()
+        for name, syntax, parent, number in _OBJECT_TYPE.findall(text):
+            if parent.endswith('Entry'):
+                entries.setdefault(parent, []).append((int(number), name, _tag(syntax.strip())))
+    return entries
+
+
+ENTRY_OIDS = {
+    'generalStatusEntry': synthetic.GENERAL_ENTRY,
+    'channelStatusEntry': synthetic.CHANNEL_ENTRY,
+    'portConfigEntry': synthetic.PORT_ENTRY,
+}
+
+
+def validate(walk: synthetic.Walk, columns: Dict[str, List[Tuple[int, str, int]]]) -> None:
+    """Raise ValueError if the walk does not match the MIB tables"""
+    for entry, base in ENTRY_OIDS.items():
+        known = {number: (name, tag) for number, name, tag in columns.get(entry, [])}
+        if not known:
+            raise ValueError(f'{entry} not found in {", ".join(MIB_FILES)}')
+        for oid, (tag, _value) in walk.items():
+            if not oid.startswith(base + '.'):
+                continue
+            column = int(oid[len(base) + 1:].split('.')[0])
+            if column not in known:
+                raise ValueError(f'{oid}: column {column} is not defined in {entry}')
+            if known[column][1] != tag:
+                raise ValueError(f'{oid}: {known[column][0]} has tag {known[column][1]}, got {tag}')
+
+
+def snmprec(walk: synthetic.Walk) -> str:
+    return ''.join(f'{oid}|{tag}|{value}\n' for oid, (tag, value) in synthetic.sorted_walk(walk))
+
+
+def _ber_length(oid: str) -> int:
+    length = 0
+    parts = synthetic.oid_key(oid)
+    for sub in (parts[0] * 40 + parts[1],) + parts[2:]:
+        length += max(1, math.ceil(sub.bit_length() / 7))
+    return length + 2
+
+
+def fetch_cost(walk: synthetic.Walk, fetch) -> Tuple[int, int, int]:
+    """Estimate (varbinds, GETBULK round trips, response bytes) for a fetch spec
+
+    Checkmk walks every column separately with GETBULK, each walk ends with
+    the first OID outside the column, so a column of R rows needs
+    ceil((R + 1) / MAX_REPETITIONS) round trips.
+    """
+    trees = fetch if isinstance(fetch, (list, tuple)) and not hasattr(fetch, 'base') else [fetch]
+    varbinds = round_trips = size = 0
+    for tree in trees:
+        base = tree.base.strip('.')
+        for column in tree.oids:
+            if not isinstance(column, str):
+                continue
+            prefix = f'{base}.{column.strip(".")}.'
+            values = [(oid, value) for oid, (_tag, value) in walk.items() if oid.startswith(prefix)]
+            pdus = math.ceil((len(values) + 1) / MAX_REPETITIONS)
+            varbinds += len(values)
+            round_trips += pdus
+            # fixed message/PDU header per response plus every varbind
+            size += pdus * 40 + sum(_ber_length(oid) + len(value) + 6 for oid, value in values)
+    return varbinds, round_trips, size
+
+
+def report(walk: synthetic.Walk) -> List[str]:
+    import agent_based_stub as api  # pylint: disable=import-outside-toplevel
+    api.load_plugins()
+    lines = [f'{"section":<40} {"varbinds":>9} {"GETBULKs":>9} {"bytes":>9}']
+    totals = [0, 0, 0]
+    for name, section in sorted(api.REGISTRY['snmp_section'].items()):
+        cost = fetch_cost(walk, section['fetch'])
+        totals = [t + c for t, c in zip(totals, cost)]
+        lines.append(f'{name:<40} {cost[0]:>9} {cost[1]:>9} {cost[2]:>9}')
+    lines.append(f'{"total":<40} {totals[0]:>9} {totals[1]:>9} {totals[2]:>9}')
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--out', default='snmpsim-data', help='output directory (default: %(default)s)')
+    parser.add_argument('--name', default='diamond', help='file name / community (default: %(default)s)')
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--ports', type=int, default=4)
+    parser.add_argument('--scenario', choices=synthetic.SCENARIOS, default='normal')
+    parser.add_argument('--site', default='SITE-A')
+    parser.add_argument('--remote-site', default='SITE-B')
+    parser.add_argument('--series', type=int, default=0,
+                        help='write N snapshots instead of a single file')
+    parser.add_argument('--interval', type=int, default=60,
+                        help='seconds between snapshots of a series (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', action='store_true',
+                        help='print the estimated fetch cost per SNMP section')
+    args = parser.parse_args(argv)
+
+    columns = mib_columns(synthetic.REPO_DIR)
+    os.makedirs(args.out, exist_ok=True)
+    snapshots = range(args.series) if args.series else [None]
+    walk: synthetic.Walk = {}
+    for step in snapshots:
+        walk = synthetic.device_walk(
+            channels=args.channels,
+            ports=args.ports,
+            uptime=864000 + (step or 0) * args.interval,
+            seed=args.seed + (step or 0),
+            site=args.site,
+            remote_site=args.remote_site,
+            scenario=args.scenario,
+        )
+        validate(walk, columns)
+        name = args.name if step is None else f'{args.name}-{step + 1:04d}'
+        path = os.path.join(args.out, f'{name}.snmprec')
+        with open(path, 'w', encoding='utf-8') as out:
+            out.write(snmprec(walk))
+        print(path)
+
+    if args.report:
+        print('\n'.join(report(walk)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Serve generated .snmprec files with snmpsim on localhost.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Start an snmpsim command responder for the files written by snmprec_gen.py.
+
+Every ``<community>.snmprec`` in the data directory becomes a simulated
+Diamond reachable with SNMPv2c community ``<community>``:
+
+    python3 tools/snmprec_gen.py --out lab --name diamond-8ch --channels 8
+    python3 tools/snmpsim_serve.py --data-dir lab --port 1161
+    snmpbulkwalk -v2c -c diamond-8ch -Cr10 -On -d 127.0.0.1:1161 \\
+        .1.3.6.1.4.1.91111.4.80.1.1.2.1
+
+The ``-d`` dump of net-snmp shows every PDU with its size, which gives the
+real fetch cost of a table for a given max-repetitions value.  Point a
+Checkmk test site (SNMP host 127.0.0.1, port 1161) or the special agent
+at the same endpoint for end-to-end load tests.
+
+Requires snmpsim (``pip install snmpsim``).
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+# snmpsim >= 1.0 renamed snmpsimd.py
+RESPONDERS = ('snmpsim-command-responder', 'snmpsimd.py')
+
+
+def find_responder():
+    for name in RESPONDERS:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--data-dir', default='snmpsim-data',
+                        help='directory with .snmprec files (default: %(default)s)')
+    parser.add_argument('--address', default='127.0.0.1', help='listen address (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=1161, help='UDP port (default: %(default)s)')
+    parser.add_argument('--log-level', default='error', help='snmpsim log level (default: %(default)s)')
+    args, extra = parser.parse_known_args(argv)
+
+    responder = find_responder()
+    if responder is None:
+        sys.stderr.write('snmpsim is not installed, run: pip install snmpsim\n')
+        return 2
+
+    data_dir = os.path.abspath(args.data_dir)
+    communities = sorted(f[:-len('.snmprec')] for f in os.listdir(data_dir) if f.endswith('.snmprec'))
+    if not communities:
+        sys.stderr.write(f'no .snmprec files in {data_dir}, see tools/snmprec_gen.py\n')
+        return 2
+
+    endpoint = f'{args.address}:{args.port}'
+    sys.stderr.write(f'serving {len(communities)} device(s) on udp://{endpoint}: '
+                     f'{", ".join(communities)}\n')
+    command = [
+        responder,
+        f'--data-dir={data_dir}',
+        f'--agent-udpv4-endpoint={endpoint}',
+        f'--log-level={args.log_level}',
+    ] + extra
+    try:
+        return subprocess.call(command)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Synthetic SNMP data of a CableFree Diamond.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Generate the SNMP view of a Diamond as a flat ``{oid: (tag, value)}`` walk.
+
+The walk follows the tables of RADIO-DUMONTSTATUS-MIB and SNMP-PORTS-MIB.
+``tag`` is the ASN.1 type tag as used by snmpsim ``.snmprec`` files
+(2 Integer32, 4 OCTET STRING, 6 OBJECT IDENTIFIER, 67 TimeTicks).
+
+``string_tables()`` cuts a walk into the ``string_table`` Checkmk would hand
+to a parse function for a given ``SNMPTree`` (or list of trees), so the
+tools always follow the fetch definitions declared by the plugins.
+"""
+
+import os
+import random
+from typing import Dict, Iterable, List, Tuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INTEGER = 2
+OCTET_STRING = 4
+OBJECT_IDENTIFIER = 6
+TIMETICKS = 67
+COUNTER64 = 70
+
+Walk = Dict[str, Tuple[int, str]]
+
+SYS_DESCR = '1.3.6.1.2.1.1.1.0'
+SYS_OBJECT_ID = '1.3.6.1.2.1.1.2.0'
+SYS_UPTIME = '1.3.6.1.2.1.1.3.0'
+SYS_NAME = '1.3.6.1.2.1.1.5.0'
+
+GENERAL_ENTRY = '1.3.6.1.4.1.91111.4.80.1.1.1.1'
+CHANNEL_ENTRY = '1.3.6.1.4.1.91111.4.80.1.1.2.1'
+PORT_ENTRY = '1.3.6.1.4.1.91111.4.80.11.1.2.1'
+IFX_ENTRY = '1.3.6.1.2.1.31.1.1.1'
+
+DIAMOND_OBJECT_ID = '.1.3.6.1.4.1.91111.4.80'
+DIAMOND_DESCR = 'CableFree GigaBit Ethernet Switch'
+
+# normal: healthy hop, link-down: all modems unlocked, fading: deep rain
+# fade with downshifted modulation, reboot: both units just restarted
+SCENARIOS = ('normal', 'link-down', 'fading', 'reboot')
+
+
+def _uptime(seconds: int) -> str:
+    days, rest = divmod(seconds, 86400)
+    hours, rest = divmod(rest, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f'{days}d {hours:02d}:{minutes:02d}:{secs:02d}'
+
+
+def channel_locations(channels: int) -> List[str]:
+    """First half of the channel rows is the local, second the remote unit"""
+    local = (channels + 1) // 2
+    return ['local' if i < local else 'remote' for i in range(channels)]
+
+
+def device_walk(channels: int = 2, ports: int = 4, uptime: int = 864000,
+                seed: int = 0, site: str = 'SITE-A', remote_site: str = 'SITE-B',
+                scenario: str = 'normal') -> Walk:
+    if scenario not in SCENARIOS:
+        raise ValueError(f'unknown scenario: {scenario}')
+    rnd = random.Random(seed)
+    if scenario == 'reboot':
+        uptime = min(uptime, 90)
+    locked = scenario != 'link-down'
+    fade = 250 if scenario == 'fading' else 0
+    walk: Walk = {
+        SYS_DESCR: (OCTET_STRING, DIAMOND_DESCR),
+        SYS_OBJECT_ID: (OBJECT_IDENTIFIER, DIAMOND_OBJECT_ID.lstrip('.')),
+        SYS_UPTIME: (TIMETICKS, str(uptime * 100)),
+        SYS_NAME: (OCTET_STRING, site.lower()),
+    }
+
+    # generalStatusTable: index 1 is the remote unit, index 2 the local one
+    for index, location, ip, name in ((1, 'remote', '10.0.0.2', remote_site),
+                                      (2, 'local', '10.0.0.1', site)):
+        columns = [
+            (INTEGER, str(index)),
+            (OCTET_STRING, location),
+            (OCTET_STRING, ip),
+            (INTEGER, str(rnd.randint(300, 550))),
+            (INTEGER, str(rnd.randint(900, 1500))),
+            (INTEGER, str(rnd.randint(900, 1500))),
+            (INTEGER, '1' if channels > 1 else '0'),
+            (OCTET_STRING, name),
+            (OCTET_STRING, _uptime(uptime)),
+            (OCTET_STRING, _uptime(max(0, uptime - 30))),
+            (INTEGER, '0' if locked else '1'),
+        ]
+        for column, value in enumerate(columns, 1):
+            walk[f'{GENERAL_ENTRY}.{column}.{index}'] = value
+
+    # both ends of a channel see about the same RSL and SNR (in 0.1 dB)
+    locations = channel_locations(channels)
+    hops = [(rnd.randint(-550, -350), rnd.randint(280, 380)) for _ in range(locations.count('local'))]
+    for index, location in enumerate(locations, 1):
+        rsl, snr = hops[locations[:index - 1].count(location)]
+        side = rnd.randint(0, 1)
+        tx_freq = 17700000 + 7000 * index
+        modulation = 7 if not fade else 3
+        columns = [
+            (INTEGER, str(index)),
+            (OCTET_STRING, location),
+            (INTEGER, str(tx_freq)),
+            (INTEGER, str(tx_freq + (1010000 if side == 0 else -1010000))),
+            (INTEGER, '1010000'),
+            (INTEGER, str(side)),
+            (INTEGER, '56000'),
+            (INTEGER, str(460000 if not fade else 230000) if locked else '0'),
+            (INTEGER, str(rsl + rnd.randint(-20, 20) - fade) if locked else '-999'),
+            (INTEGER, str(snr + rnd.randint(-10, 10) - fade // 2) if locked else '0'),
+            (INTEGER, str(rnd.randint(15, 22))),
+            (INTEGER, str(modulation) if locked else '0'),
+            (INTEGER, str(modulation) if locked else '0'),
+            (INTEGER, '0'),
+            (INTEGER, '1' if locked else '0'),
+        ]
+        for column, value in enumerate(columns, 1):
+            walk[f'{CHANNEL_ENTRY}.{column}.{index}'] = value
+
+    for index in range(1, ports + 1):
+        up = index <= max(1, ports // 2)
+        columns = [
+            (INTEGER, str(index)),
+            (INTEGER, '1' if up else '0'),
+            (OCTET_STRING, '1000M' if up else ''),
+            (INTEGER, '3'),
+            (INTEGER, '1'),
+            (INTEGER, '1' if up else '0'),
+            (INTEGER, '1' if up else '0'),
+        ]
+        for column, value in enumerate(columns, 1):
+            walk[f'{PORT_ENTRY}.{column}.{index}'] = value
+        # ifXTable: up ports carry 40 Mbit/s in and 20 Mbit/s out since boot
+        walk[f'{IFX_ENTRY}.1.{index}'] = (OCTET_STRING, f'port{index}')
+        walk[f'{IFX_ENTRY}.6.{index}'] = (COUNTER64, str(uptime * 5000000 if up else 0))
+        walk[f'{IFX_ENTRY}.10.{index}'] = (COUNTER64, str(uptime * 2500000 if up else 0))
+
+    return walk
+
+
+def oid_key(oid: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in oid.strip('.').split('.') if part)
+
+
+def _table(walk: Walk, tree) -> List[List[str]]:
+    base = tree.base.strip('.')
+    rows: Dict[Tuple[int, ...], Dict[int, str]] = {}
+    columns = list(tree.oids)
+    for col_no, column in enumerate(columns):
+        if not isinstance(column, str):  # OIDEnd
+            continue
+        prefix = f'{base}.{column.strip(".")}.'
+        for oid, (_tag, value) in walk.items():
+            if oid.startswith(prefix):
+                rows.setdefault(oid_key(oid[len(prefix):]), {})[col_no] = value
+    table = []
+    for index in sorted(rows):
+        row = []
+        for col_no, column in enumerate(columns):
+            if isinstance(column, str):
+                row.append(rows[index].get(col_no, ''))
+            else:
+                row.append(str(index[-1]))
+        table.append(row)
+    return table
+
+
+def string_tables(walk: Walk, fetch) -> object:
+    """Return the string_table (or list of them) for an SNMPTree fetch spec"""
+    if isinstance(fetch, (list, tuple)) and not hasattr(fetch, 'base'):
+        return [_table(walk, tree) for tree in fetch]
+    return _table(walk, fetch)
+
+
+def sorted_walk(walk: Walk) -> Iterable[Tuple[str, Tuple[int, str]]]:
+    return sorted(walk.items(), key=lambda kv: oid_key(kv[0]))
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Send and receive CableFree Diamond traps over loopback.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Exercise the trap path without a radio.
+
+``send`` emits the notifications of RADIO-DUMONTSTATUS-MIB as SNMPv2c traps,
+e.g. towards the Event Console of a test site (port 162 needs root, the
+Event Console can listen on any port):
+
+    python3 tools/trap_harness.py send --port 162 lock-lost --index 2
+
+``loopback`` sends every scenario to itself on 127.0.0.1, formats the
+received trap like the Event Console does without MIB translation, and
+runs it through the rule pack ec_rule_packs/cablefree_diamond.mk and
+bin/cablefree_diamond_trap_bridge.  It fails if a trap does not end up on
+the expected service with the expected state:
+
+    python3 tools/trap_harness.py loopback
+
+Requires pysnmp >= 6 (``pip install pysnmp``).
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import socket
+import sys
+from importlib.machinery import SourceFileLoader
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from pyasn1.codec.ber import decoder
+from pysnmp.hlapi.v3arch.asyncio import (
+    CommunityData,
+    ContextData,
+    Integer32,
+    NotificationType,
+    ObjectIdentity,
+    ObjectType,
+    OctetString,
+    SnmpEngine,
+    UdpTransportTarget,
+    send_notification,
+)
+from pysnmp.proto import api
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BRIDGE = os.path.join(ROOT, 'bin', 'cablefree_diamond_trap_bridge')
+RULE_PACK = os.path.join(ROOT, 'ec_rule_packs', 'cablefree_diamond.mk')
+
+bridge = SourceFileLoader('cablefree_diamond_trap_bridge', BRIDGE).load_module()
+
+SNMP_TRAP_OID = '1.3.6.1.6.3.1.1.4.1.0'
+SYS_UPTIME = '1.3.6.1.2.1.1.3.0'
+
+
+class Scenario(NamedTuple):
+    trap: str
+    varbinds: List[Tuple[str, object]]
+    application: str  # rewritten by the rule pack
+    service: str  # of the passive result
+    state: Optional[int]
+
+
+def scenarios(index: int, location: str) -> Dict[str, Scenario]:
+    # varbinds carry the instance of the row, e.g. modemLockStatus.<channel>
+    col = {name: f'{oid}.{index}' for name, oid in bridge.COLUMNS.items()}
+    return {
+        'lock-lost': Scenario('modemLockStatusChange', [
+            (col['channelStatusIndex'], Integer32(index)),
+            (f'{bridge.CHANNEL_ENTRY}.2.{index}', OctetString(location)),
+            (col['modemLockStatus'], Integer32(0)),
+        ], bridge.HOP_SERVICE, bridge.HOP_SERVICE, bridge.WARN),
+        'lock-regained': Scenario('modemLockStatusChange', [
+            (col['channelStatusIndex'], Integer32(index)),
+            (f'{bridge.CHANNEL_ENTRY}.2.{index}', OctetString(location)),
+            (col['modemLockStatus'], Integer32(1)),
+        ], bridge.HOP_SERVICE, bridge.HOP_SERVICE, None),
+        'alarm-raised': Scenario('systemAlarmChange', [
+            (col['generalStatusIndex'], Integer32(index)),
+            (f'{bridge.GENERAL_ENTRY}.2.{index}', OctetString(location)),
+            (col['systemAlarm'], Integer32(1)),
+        ], f'Diamond General Status {index}', f'Diamond General Status {index}', bridge.WARN),
+        'alarm-cleared': Scenario('systemAlarmChange', [
+            (col['generalStatusIndex'], Integer32(index)),
+            (f'{bridge.GENERAL_ENTRY}.2.{index}', OctetString(location)),
+            (col['systemAlarm'], Integer32(0)),
+        ], f'Diamond General Status {index}', f'Diamond General Status {index}', bridge.OK),
+        'reboot': Scenario('systemReboot', [
+            (col['generalStatusIndex'], Integer32(index)),
+            (f'{bridge.GENERAL_ENTRY}.2.{index}', OctetString(location)),
+            (col['systemUptime'], OctetString('0 days 00:00:42')),
+        ], f'Diamond General Status {index}', f'Diamond General Status {index}', bridge.CRIT),
+    }
+
+
+async def send(scenario: Scenario, address: str, port: int, community: str) -> None:
+    engine = SnmpEngine()
+    error_indication, _status, _index, _varbinds = await send_notification(
+        engine,
+        CommunityData(community),
+        await UdpTransportTarget.create((address, port)),
+        ContextData(),
+        'trap',
+        NotificationType(ObjectIdentity(bridge.TRAPS[scenario.trap])).add_varbinds(
+            *(ObjectType(ObjectIdentity(oid), value) for oid, value in scenario.varbinds)
+        ),
+    )
+    engine.close_dispatcher()
+    if error_indication:
+        raise RuntimeError(str(error_indication))
+
+
+def decode(datagram: bytes) -> Tuple[str, str]:
+    """Return (application, text) like the Event Console without MIB translation"""
+    module = api.PROTOCOL_MODULES[int(api.decodeMessageVersion(datagram))]
+    message, _rest = decoder.decode(datagram, asn1Spec=module.Message())
+    pdu = module.apiMessage.get_pdu(message)
+    application = ''
+    variables = []
+    for oid, value in module.apiTrapPDU.get_varbinds(pdu):
+        oid = str(oid)
+        if oid == SNMP_TRAP_OID:
+            application = str(value.prettyPrint())
+        elif oid != SYS_UPTIME:
+            variables.append(f'{oid}: {value.prettyPrint()}')
+    return application, ', '.join(variables)
+
+
+def load_rules() -> List[dict]:
+    namespace: Dict[str, dict] = {'mkp_rule_packs': {}}
+    with open(RULE_PACK) as rule_pack:
+        exec(rule_pack.read(), namespace)  # pylint: disable=exec-used
+    return namespace['mkp_rule_packs']['cablefree_diamond']['rules']
+
+
+def apply_rules(rules: List[dict], application: str, text: str) -> Tuple[str, str, str]:
+    """Return (rule id, phase, rewritten application) of the first matching rule"""
+    for rule in rules:
+        if not re.search(rule['match_application'], application):
+            continue
+        for phase, key in (('open', 'match'), ('closed', 'match_ok')):
+            match = re.search(rule[key], text) if key in rule else None
+            if match:
+                return rule['id'], phase, match.expand(rule['set_application'])
+    return '', '', ''
+
+
+async def loopback(names: List[str], index: int, location: str, port: int) -> int:
+    loop = asyncio.get_running_loop()
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', port))
+    receiver.setblocking(False)
+    rules = load_rules()
+    failures = 0
+    for name, scenario in scenarios(index, location).items():
+        if names and name not in names:
+            continue
+        await send(scenario, '127.0.0.1', receiver.getsockname()[1], 'public')
+        datagram = await asyncio.wait_for(loop.sock_recv(receiver, 65535), timeout=5)
+        application, text = decode(datagram)
+        rule, phase, service = apply_rules(rules, application, text)
+        result = bridge.translate(service or application, text, phase or 'open')
+        ok = (result is not None and rule and service == scenario.application
+              and (result.service, result.state) == (scenario.service, scenario.state))
+        failures += not ok
+        sys.stdout.write(f'{"OK  " if ok else "FAIL"} {name:14} {application} {text}\n'
+                         f'     rule={rule or "-"} phase={phase or "-"} application={service or "-"}\n'
+                         f'     {bridge.command("loopback", result).strip() if result else "no result"}\n')
+    receiver.close()
+    return 1 if failures else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__.split('\n\n', 1)[1])
+    parser.add_argument('--index', type=int, default=1, help='channel/unit index (default: %(default)s)')
+    parser.add_argument('--location', default='local', help='location varbind (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    send_parser = commands.add_parser('send', help='send one scenario')
+    send_parser.add_argument('scenario', choices=sorted(scenarios(1, '')))
+    send_parser.add_argument('--address', default='127.0.0.1', help='trap receiver (default: %(default)s)')
+    send_parser.add_argument('--port', type=int, default=162, help='UDP port (default: %(default)s)')
+    send_parser.add_argument('--community', default='public', help='community (default: %(default)s)')
+    loop_parser = commands.add_parser('loopback', help='send and check scenarios on 127.0.0.1')
+    loop_parser.add_argument('scenario', nargs='*', help='scenarios to run (default: all)')
+    loop_parser.add_argument('--port', type=int, default=0, help='UDP port (default: any free port)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'send':
+        scenario = scenarios(args.index, args.location)[args.scenario]
+        asyncio.run(send(scenario, args.address, args.port, args.community))
+        return 0
+    return asyncio.run(loopback(args.scenario, args.index, args.location, args.port))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,10 +19,25 @@
 
 from cmk.gui.i18n import _
 
-from cmk.gui.plugins.metrics import metric_info, check_metrics, perfometer_info, MB
+from cmk.gui.plugins.metrics import metric_info, graph_info, check_metrics, perfometer_info, MB
 
 
+# All metric names are fixed per service, the item is never part of the
+# name. Older versions of the plugins emitted per-item names such as
+# "cablefree_diamond_channel_3_rsl"; the "~" regex entries in check_metrics
+# below translate those so existing RRDs keep showing up in the graphs.
+
 # metrics for general
+metric_info["cablefree_diamond_general_system_uptime"] = {
+    "title": _("System Uptime"),
+    "unit": "s",
+    "color": "#40a0b0",
+}
+metric_info["cablefree_diamond_general_mcu_uptime"] = {
+    "title": _("MCU Uptime"),
+    "unit": "s",
+    "color": "#60c0d0",
+}
 metric_info["cablefree_diamond_general_temperature"] = {
     "title": _("Temperature (°C)"),
     "unit": "count",
@@ -39,6 +54,21 @@ metric_info["cablefree_diamond_general_tr2RSSI"] = {
     "color": "#ff69b4",
 }
 check_metrics["check_mk-cablefree_diamond_general"] = {
+    "~cablefree_diamond_general_.+_system_uptime$": {
+        "name": "cablefree_diamond_general_system_uptime",
+    },
+    "~cablefree_diamond_general_.+_mcu_uptime$": {
+        "name": "cablefree_diamond_general_mcu_uptime",
+    },
+    "~cablefree_diamond_general_.+_temperature$": {
+        "name": "cablefree_diamond_general_temperature",
+    },
+    "~cablefree_diamond_general_.+_tr1RSSI$": {
+        "name": "cablefree_diamond_general_tr1RSSI",
+    },
+    "~cablefree_diamond_general_.+_tr2RSSI$": {
+        "name": "cablefree_diamond_general_tr2RSSI",
+    },
     "temperature": {
         "name": "cablefree_diamond_general_temperature",
     },
@@ -51,16 +81,6 @@ check_metrics["check_mk-cablefree_diamond_general"] = {
 }
 
 # metrics for channel
-metric_info["cablefree_diamond_channel_tx_frequency"] = {
-    "title": _("TX Frequency (kHz)"),
-    "unit": "count",
-    "color": "#00e060",
-}
-metric_info["cablefree_diamond_channel_rx_frequency"] = {
-    "title": _("RX Frequency (kHz)"),
-    "unit": "count",
-    "color": "#00e060",
-}
 metric_info["cablefree_diamond_channel_band_width"] = {
     "title": _("Bandwidth (kHz)"),
     "unit": "count",
@@ -81,17 +101,159 @@ metric_info["cablefree_diamond_channel_snr"] = {
     "unit": "count",
     "color": "#00e060",
 }
+metric_info["cablefree_diamond_channel_rsl_trend"] = {
+    "title": _("RSL trend (dB/h)"),
+    "unit": "count",
+    "color": "#00a040",
+}
+metric_info["cablefree_diamond_channel_snr_trend"] = {
+    "title": _("SNR trend (dB/h)"),
+    "unit": "count",
+    "color": "#a0a000",
+}
+metric_info["cablefree_diamond_channel_rsl_min"] = {
+    "title": _("RSL minimum, sampled (dBm)"),
+    "unit": "count",
+    "color": "#008040",
+}
+metric_info["cablefree_diamond_channel_rsl_p5"] = {
+    "title": _("RSL 5th percentile, sampled (dBm)"),
+    "unit": "count",
+    "color": "#40c080",
+}
+metric_info["cablefree_diamond_channel_snr_min"] = {
+    "title": _("SNR minimum, sampled (dB)"),
+    "unit": "count",
+    "color": "#808000",
+}
+metric_info["cablefree_diamond_channel_snr_p5"] = {
+    "title": _("SNR 5th percentile, sampled (dB)"),
+    "unit": "count",
+    "color": "#c0c040",
+}
+metric_info["cablefree_diamond_channel_unlocked_samples"] = {
+    "title": _("Unlocked samples"),
+    "unit": "count",
+    "color": "#ff0000",
+}
+metric_info["cablefree_diamond_channel_availability_day"] = {
+    "title": _("Availability today"),
+    "unit": "%",
+    "color": "#00c0c0",
+}
+metric_info["cablefree_diamond_channel_availability_month"] = {
+    "title": _("Availability 30 days"),
+    "unit": "%",
+    "color": "#0080c0",
+}
+metric_info["cablefree_diamond_channel_availability_window"] = {
+    "title": _("Availability rolling window"),
+    "unit": "%",
+    "color": "#00a0a0",
+}
+metric_info["cablefree_diamond_channel_unlocked_time_day"] = {
+    "title": _("Time unlocked today"),
+    "unit": "s",
+    "color": "#c0c000",
+}
+metric_info["cablefree_diamond_channel_unlocked_time_month"] = {
+    "title": _("Time unlocked 30 days"),
+    "unit": "s",
+    "color": "#c08000",
+}
+metric_info["cablefree_diamond_channel_unlocked_time_window"] = {
+    "title": _("Time unlocked rolling window"),
+    "unit": "s",
+    "color": "#a0a000",
+}
+metric_info["cablefree_diamond_channel_outages_day"] = {
+    "title": _("Outages today"),
+    "unit": "count",
+    "color": "#ff4040",
+}
+metric_info["cablefree_diamond_channel_outages_month"] = {
+    "title": _("Outages 30 days"),
+    "unit": "count",
+    "color": "#c00000",
+}
+metric_info["cablefree_diamond_channel_outages_window"] = {
+    "title": _("Outages rolling window"),
+    "unit": "count",
+    "color": "#ff8080",
+}
 metric_info["cablefree_diamond_channel_tx_power"] = {
     "title": _("TX Power (dBm)"),
     "unit": "count",
     "color": "#00e060",
 }
+metric_info["cablefree_diamond_channel_tx_modulation"] = {
+    "title": _("TX Modulation level"),
+    "unit": "count",
+    "color": "#1e90ff",
+}
+metric_info["cablefree_diamond_channel_rx_modulation"] = {
+    "title": _("RX Modulation level"),
+    "unit": "count",
+    "color": "#ff8c00",
+}
+# Share of time per modulation level, see MODULATION_NAMES in
+# agent_based/utils/cablefree_diamond.py
+MODULATION_LEVELS = [
+    ('QPSK', '#ff0000'),
+    ('QAM16', '#ff6000'),
+    ('QAM32', '#ffa000'),
+    ('QAM64', '#ffe000'),
+    ('QAM128', '#c0f000'),
+    ('QAM256', '#60e000'),
+    ('QAM512', '#00c060'),
+    ('QAM1024', '#00c0c0'),
+    ('QAM2048', '#0080ff'),
+    ('QAM4096', '#4040ff'),
+    ('ACM', '#a040ff'),
+    ('ACMM', '#ff40c0'),
+]
+for _direction, _label in (('tx', 'TX'), ('rx', 'RX')):
+    for _level, (_name, _color) in enumerate(MODULATION_LEVELS):
+        metric_info[f"cablefree_diamond_channel_{_direction}_modulation_time_{_level}"] = {
+            "title": _("%s time at %s") % (_label, _name),
+            "unit": "%",
+            "color": _color,
+        }
+    metric_info[f"cablefree_diamond_channel_{_direction}_modulation_below"] = {
+        "title": _("%s time below modulation level") % _label,
+        "unit": "%",
+        "color": "#ff4040",
+    }
+    graph_info[f"cablefree_diamond_channel_{_direction}_modulation_time"] = {
+        "title": _("%s time in modulation") % _label,
+        "metrics": [
+            (f"cablefree_diamond_channel_{_direction}_modulation_time_{_level}", "stack")
+            for _level in range(len(MODULATION_LEVELS))
+        ],
+        "range": (0, 100),
+    }
+
 check_metrics["check_mk-cablefree_diamond_channel"] = {
-    "txFrequency": {
-        "name": "cablefree_diamond_channel_tx_frequency",
+    "~cablefree_diamond_channel_.+_band_width$": {
+        "name": "cablefree_diamond_channel_band_width",
+    },
+    "~cablefree_diamond_channel_.+_capacity$": {
+        "name": "cablefree_diamond_channel_capacity",
+    },
+    "~cablefree_diamond_channel_.+_rsl$": {
+        "name": "cablefree_diamond_channel_rsl",
+    },
+    "~cablefree_diamond_channel_.+_snr$": {
+        "name": "cablefree_diamond_channel_snr",
+    },
+    "~cablefree_diamond_channel_.+_tx_power$": {
+        "name": "cablefree_diamond_channel_tx_power",
     },
-    "rxFrequency": {
-        "name": "cablefree_diamond_channel_rx_frequency",
+    "~cablefree_diamond_channel_.+_tx_modulation$": {
+        "name": "cablefree_diamond_channel_tx_modulation",
+    },
+    "~cablefree_diamond_channel_.+_rx_modulation$": {
+        "name": "cablefree_diamond_channel_rx_modulation",
     },
     "bandWidth": {
         "name": "cablefree_diamond_channel_band_width",
@@ -114,3 +276,220 @@ check_metrics["check_mk-cablefree_diamond_channel"] = {
 # Port monitoring is primarily status-based (link up/down, speed, flow control)
 # No numeric metrics are needed as the check plugin reports status information
 check_metrics["check_mk-cablefree_diamond_ports"] = {}
+
+# metrics for utilization
+metric_info["cablefree_diamond_air_capacity"] = {
+    "title": _("Air capacity"),
+    "unit": "bits/s",
+    "color": "#000000",
+}
+metric_info["cablefree_diamond_traffic_in"] = {
+    "title": _("Traffic in (to the air)"),
+    "unit": "bits/s",
+    "color": "#00e060",
+}
+metric_info["cablefree_diamond_traffic_out"] = {
+    "title": _("Traffic out (from the air)"),
+    "unit": "bits/s",
+    "color": "#0080e0",
+}
+metric_info["cablefree_diamond_utilization_in"] = {
+    "title": _("Air utilization in"),
+    "unit": "%",
+    "color": "#00e060",
+}
+metric_info["cablefree_diamond_utilization_out"] = {
+    "title": _("Air utilization out"),
+    "unit": "%",
+    "color": "#0080e0",
+}
+metric_info["cablefree_diamond_headroom_in"] = {
+    "title": _("Headroom in"),
+    "unit": "bits/s",
+    "color": "#80f0b0",
+}
+metric_info["cablefree_diamond_headroom_out"] = {
+    "title": _("Headroom out"),
+    "unit": "bits/s",
+    "color": "#80c0f0",
+}
+metric_info["cablefree_diamond_link_rsl_asymmetry"] = {
+    "title": _("RSL asymmetry (dB)"),
+    "unit": "count",
+    "color": "#c080e0",
+}
+metric_info["cablefree_diamond_link_snr_asymmetry"] = {
+    "title": _("SNR asymmetry (dB)"),
+    "unit": "count",
+    "color": "#80a0e0",
+}
+metric_info["cablefree_diamond_link_path_loss_tx"] = {
+    "title": _("Path loss local to remote (dB)"),
+    "unit": "count",
+    "color": "#40b0a0",
+}
+metric_info["cablefree_diamond_link_path_loss_rx"] = {
+    "title": _("Path loss remote to local (dB)"),
+    "unit": "count",
+    "color": "#b0a040",
+}
+metric_info["cablefree_diamond_hop_locked"] = {
+    "title": _("Locked channels"),
+    "unit": "count",
+    "color": "#60c060",
+}
+metric_info["cablefree_diamond_hop_unlocked"] = {
+    "title": _("Unlocked channels"),
+    "unit": "count",
+    "color": "#e05050",
+}
+metric_info["cablefree_diamond_ports_up"] = {
+    "title": _("Ports up"),
+    "unit": "count",
+    "color": "#60c060",
+}
+metric_info["cablefree_diamond_ports_down"] = {
+    "title": _("Ports down"),
+    "unit": "count",
+    "color": "#e05050",
+}
+metric_info["cablefree_diamond_ports_speed_10m"] = {
+    "title": _("Ports up at 10 MBit/s"),
+    "unit": "count",
+    "color": "#c0c0e0",
+}
+metric_info["cablefree_diamond_ports_speed_100m"] = {
+    "title": _("Ports up at 100 MBit/s"),
+    "unit": "count",
+    "color": "#a0a0e0",
+}
+metric_info["cablefree_diamond_ports_speed_1000m"] = {
+    "title": _("Ports up at 1 GBit/s"),
+    "unit": "count",
+    "color": "#8080e0",
+}
+metric_info["cablefree_diamond_ports_speed_2500m"] = {
+    "title": _("Ports up at 2.5 GBit/s"),
+    "unit": "count",
+    "color": "#6060d0",
+}
+metric_info["cablefree_diamond_ports_speed_5000m"] = {
+    "title": _("Ports up at 5 GBit/s"),
+    "unit": "count",
+    "color": "#4040c0",
+}
+metric_info["cablefree_diamond_ports_speed_10g"] = {
+    "title": _("Ports up at 10 GBit/s"),
+    "unit": "count",
+    "color": "#2020a0",
+}
+metric_info["cablefree_diamond_self_calls"] = {
+    "title": _("Plugin calls"),
+    "unit": "count",
+    "color": "#a0a0a0",
+}
+metric_info["cablefree_diamond_self_parse_time"] = {
+    "title": _("Parse time"),
+    "unit": "s",
+    "color": "#40a0b0",
+}
+metric_info["cablefree_diamond_self_check_time"] = {
+    "title": _("Check time"),
+    "unit": "s",
+    "color": "#a0b040",
+}
+metric_info["cablefree_diamond_self_cpu_time"] = {
+    "title": _("CPU time"),
+    "unit": "s",
+    "color": "#d08040",
+}
+metric_info["cablefree_diamond_self_rows"] = {
+    "title": _("Rows parsed"),
+    "unit": "count",
+    "color": "#6080c0",
+}
+metric_info["cablefree_diamond_self_value_store"] = {
+    "title": _("Value store size"),
+    "unit": "bytes",
+    "color": "#80c080",
+}
+metric_info["cablefree_diamond_self_exceptions"] = {
+    "title": _("Exceptions"),
+    "unit": "count",
+    "color": "#e04040",
+}
+graph_info["cablefree_diamond_air_traffic"] = {
+    "title": _("Traffic versus air capacity"),
+    "metrics": [
+        ("cablefree_diamond_traffic_in", "area"),
+        ("cablefree_diamond_traffic_out", "-area"),
+        ("cablefree_diamond_air_capacity", "line"),
+    ],
+}
+graph_info["cablefree_diamond_air_utilization"] = {
+    "title": _("Air utilization"),
+    "metrics": [
+        ("cablefree_diamond_utilization_in", "area"),
+        ("cablefree_diamond_utilization_out", "-area"),
+    ],
+    "scalars": [
+        "cablefree_diamond_utilization_in:warn",
+        "cablefree_diamond_utilization_in:crit",
+    ],
+    "range": (-100, 100),
+}
+perfometer_info.append({
+    "type": "dual",
+    "perfometers": [
+        {
+            "type": "linear",
+            "segments": ["cablefree_diamond_utilization_in"],
+            "total": 100.0,
+        },
+        {
+            "type": "linear",
+            "segments": ["cablefree_diamond_utilization_out"],
+            "total": 100.0,
+        },
+    ],
+})
+graph_info["cablefree_diamond_link_path_loss"] = {
+    "title": _("Path loss per direction"),
+    "metrics": [
+        ("cablefree_diamond_link_path_loss_tx", "line"),
+        ("cablefree_diamond_link_path_loss_rx", "line"),
+    ],
+}
+graph_info["cablefree_diamond_hop_channels"] = {
+    "title": _("Hop channels"),
+    "metrics": [
+        ("cablefree_diamond_hop_locked", "area"),
+        ("cablefree_diamond_hop_unlocked", "stack"),
+    ],
+}
+graph_info["cablefree_diamond_ports"] = {
+    "title": _("Port links"),
+    "metrics": [
+        ("cablefree_diamond_ports_up", "area"),
+        ("cablefree_diamond_ports_down", "stack"),
+    ],
+}
+graph_info["cablefree_diamond_ports_speed"] = {
+    "title": _("Ports up per speed"),
+    "metrics": [
+        ("cablefree_diamond_ports_speed_10m", "area"),
+        ("cablefree_diamond_ports_speed_100m", "stack"),
+        ("cablefree_diamond_ports_speed_1000m", "stack"),
+        ("cablefree_diamond_ports_speed_2500m", "stack"),
+        ("cablefree_diamond_ports_speed_5000m", "stack"),
+        ("cablefree_diamond_ports_speed_10g", "stack"),
+    ],
+}
+graph_info["cablefree_diamond_self_time"] = {
+    "title": _("Plugin time"),
+    "metrics": [
+        ("cablefree_diamond_self_parse_time", "area"),
+        ("cablefree_diamond_self_check_time", "stack"),
+        ("cablefree_diamond_self_cpu_time", "line"),
+    ],
+}
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Display hints for the CableFree Diamond inventory.
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from cmk.gui.i18n import _
+from cmk.gui.plugins.views import (
+    inventory_displayhints,)
+from cmk.gui.plugins.views.inventory import declare_invtable_view
+
+inventory_displayhints.update({
+    '.networking.cablefree_diamond.': {
+        'title': _('CableFree Diamond'),
+        'keyorder': ['local_site', 'remote_site'],
+    },
+    '.networking.cablefree_diamond.local_site': {'title': _('Local site')},
+    '.networking.cablefree_diamond.remote_site': {'title': _('Remote site')},
+    '.networking.cablefree_diamond.units:': {
+        'title': _('Units'),
+        'keyorder': ['index', 'location', 'site_name', 'ip', 'xpic'],
+        'view': 'invcablefreediamondunits_of_host',
+    },
+    '.networking.cablefree_diamond.units:*.index': {'title': _('Index')},
+    '.networking.cablefree_diamond.units:*.location': {'title': _('Location')},
+    '.networking.cablefree_diamond.units:*.site_name': {'title': _('Site name')},
+    '.networking.cablefree_diamond.units:*.ip': {'title': _('IP address')},
+    '.networking.cablefree_diamond.units:*.xpic': {'title': _('XPIC')},
+    '.networking.cablefree_diamond.channels:': {
+        'title': _('Channels'),
+        'keyorder': [
+            'index', 'location', 'tx_frequency', 'rx_frequency', 'tr_spacing', 'tr_side',
+            'bandwidth'
+        ],
+        'view': 'invcablefreediamondchannels_of_host',
+    },
+    '.networking.cablefree_diamond.channels:*.index': {'title': _('Channel')},
+    '.networking.cablefree_diamond.channels:*.location': {'title': _('Location')},
+    '.networking.cablefree_diamond.channels:*.tx_frequency': {
+        'title': _('TX frequency (kHz)'),
+        'filter': 'FilterInvtableIntegerRange',
+    },
+    '.networking.cablefree_diamond.channels:*.rx_frequency': {
+        'title': _('RX frequency (kHz)'),
+        'filter': 'FilterInvtableIntegerRange',
+    },
+    '.networking.cablefree_diamond.channels:*.tr_spacing': {
+        'title': _('TR spacing (kHz)'),
+        'filter': 'FilterInvtableIntegerRange',
+    },
+    '.networking.cablefree_diamond.channels:*.tr_side': {'title': _('TR side')},
+    '.networking.cablefree_diamond.channels:*.bandwidth': {
+        'title': _('Bandwidth (kHz)'),
+        'filter': 'FilterInvtableIntegerRange',
+    },
+    '.networking.cablefree_diamond.ports:': {
+        'title': _('Ports'),
+        'keyorder': ['index', 'speed', 'flow_control'],
+        'view': 'invcablefreediamondports_of_host',
+    },
+    '.networking.cablefree_diamond.ports:*.index': {'title': _('Port')},
+    '.networking.cablefree_diamond.ports:*.speed': {'title': _('Configured speed')},
+    '.networking.cablefree_diamond.ports:*.flow_control': {'title': _('Flow control')},
+})
+
+# Views over all hosts, e.g. to filter every channel on 18 GHz
+declare_invtable_view('invcablefreediamondunits', '.networking.cablefree_diamond.units:',
+                      _('CableFree Diamond unit'), _('CableFree Diamond units'))
+declare_invtable_view('invcablefreediamondchannels', '.networking.cablefree_diamond.channels:',
+                      _('CableFree Diamond channel'), _('CableFree Diamond channels'))
+declare_invtable_view('invcablefreediamondports', '.networking.cablefree_diamond.ports:',
+                      _('CableFree Diamond port'), _('CableFree Diamond ports'))
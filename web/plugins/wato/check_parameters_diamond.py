@@ -20,17 +20,79 @@
 from cmk.gui.i18n import _
 from cmk.gui.valuespec import (
     Dictionary,
+    DropdownChoice,
+    Float,
     Integer,
+    ListOfStrings,
+    Percentage,
     Tuple
 )
 
 from cmk.gui.plugins.wato import (
     CheckParameterRulespecWithoutItem,
+    HostRulespec,
     rulespec_registry,
     RulespecGroupCheckParametersApplications,
+    RulespecGroupCheckParametersDiscovery,
 )
 
 
+def _dampening_elements():
+    return [
+        (
+            "hold_down",
+            Integer(
+                title=_("Hold-down time"),
+                help=_("A changed value is only taken over once it held for this time. "
+                       "Changes are seen at check cycles, so use a multiple of the check "
+                       "interval. 0 takes every change over at once."),
+                default_value=300,
+                minvalue=0,
+                unit=_("seconds"),
+            ),
+        ),
+        (
+            "flap_window",
+            Integer(
+                title=_("Flap counting window"),
+                default_value=60,
+                minvalue=1,
+                unit=_("minutes"),
+            ),
+        ),
+        (
+            "flap_levels",
+            Tuple(
+                title=_("Changes within the window reported as flapping"),
+                help=_("While flapping, one flapping state is reported instead of every "
+                       "single change."),
+                elements=[
+                    Integer(title=_("Warning at"), default_value=4, unit=_("changes")),
+                    Integer(title=_("Critical at"), default_value=10, unit=_("changes")),
+                ],
+            ),
+        ),
+    ]
+
+
+def _hop_dependent_element():
+    return (
+        "hop_dependent",
+        DropdownChoice(
+            title=_("Dependency on the hop state"),
+            help=_("While all channels of the hop are unlocked, the service \"Diamond Hop "
+                   "State\" is CRIT. Dependent services report their own problems as OK "
+                   "then, so an outage alerts once per device. Without a rule, problems "
+                   "are always reported. Detected restarts are never suppressed."),
+            choices=[
+                (True, _("Suppress problems while the hop is down")),
+                (False, _("Always report problems")),
+            ],
+            default_value=True,
+        ),
+    )
+
+
 def _parameter_valuespec_cablefree_diamond():
     return Dictionary(elements=[
         (
@@ -52,7 +114,245 @@ def _parameter_valuespec_cablefree_diamond():
                 ],
             ),
         ),
-
+        (
+            "trend_period",
+            Integer(
+                title=_("RSL/SNR trend: averaging period"),
+                help=_("Time constant of the exponentially weighted mean, deviation and slope "
+                       "of RSL and SNR. Longer periods react slower but ignore short fades."),
+                default_value=60,
+                minvalue=1,
+                unit=_("minutes"),
+            ),
+        ),
+        (
+            "trend_horizon",
+            Integer(
+                title=_("RSL/SNR trend: warn if the critical RSL is reached within"),
+                help=_("Projects the averaged RSL with its current slope onto the critical RSL "
+                       "threshold above and warns if it is crossed within this time. Only a "
+                       "falling RSL is projected; once the average is below the threshold the "
+                       "RSL levels alert instead. Requires the RSL threshold."),
+                default_value=24,
+                minvalue=1,
+                unit=_("hours"),
+            ),
+        ),
+        (
+            "sample_unlocks",
+            Tuple(
+                title=_("Unlocked samples between two checks"),
+                help=_("Number of samples of the high-resolution sampler "
+                       "(cablefree_diamond_sampler) with the modem unlocked since the last "
+                       "check. Catches short outages the regular poll misses. The sampled "
+                       "RSL minimum is checked against the RSL threshold."),
+                elements=[
+                    Integer(title=_("Warning at"), default_value=1),
+                    Integer(title=_("Critical at"), default_value=5),
+                ],
+            ),
+        ),
+        (
+            "baseline",
+            Dictionary(
+                title=_("RSL/SNR anomaly mode (learned baseline)"),
+                help=_("Learns the distribution of RSL and SNR of every channel with a streaming "
+                       "percentile estimator and warns if the current value falls below the "
+                       "learned percentile by more than the margin. Readings of an unlocked "
+                       "modem and readings that warn are not learned. Useful where a normal RSL "
+                       "depends on the hop length and fixed thresholds do not fit."),
+                elements=[
+                    (
+                        "percentile",
+                        Percentage(
+                            title=_("Learned percentile"),
+                            default_value=5.0,
+                            minvalue=1.0,
+                            maxvalue=99.0,
+                        ),
+                    ),
+                    (
+                        "margin",
+                        Float(
+                            title=_("Warn if below the percentile by more than"),
+                            default_value=3.0,
+                            unit=_("dB"),
+                        ),
+                    ),
+                    (
+                        "learning",
+                        Integer(
+                            title=_("Samples to learn before warning"),
+                            default_value=1440,
+                            minvalue=5,
+                        ),
+                    ),
+                ],
+            ),
+        ),
+        (
+            "availability",
+            Dictionary(
+                title=_("Availability (SLA)"),
+                help=_("Availability of the channel accumulated from the modem lock state at "
+                       "every check: the time unlocked and the number of outages today, in the "
+                       "last 30 days and in a rolling window of up to 24 hours. Time between "
+                       "two checks that are more than an hour apart is not counted."),
+                elements=[
+                    (
+                        "window",
+                        Integer(
+                            title=_("Rolling window"),
+                            default_value=24,
+                            minvalue=1,
+                            maxvalue=24,
+                            unit=_("hours"),
+                        ),
+                    ),
+                    (
+                        "levels_day",
+                        Tuple(
+                            title=_("Minimum availability today"),
+                            elements=[
+                                Percentage(title=_("Warning below"), default_value=99.99),
+                                Percentage(title=_("Critical below"), default_value=99.9),
+                            ],
+                        ),
+                    ),
+                    (
+                        "levels_month",
+                        Tuple(
+                            title=_("Minimum availability last 30 days"),
+                            elements=[
+                                Percentage(title=_("Warning below"), default_value=99.99),
+                                Percentage(title=_("Critical below"), default_value=99.9),
+                            ],
+                        ),
+                    ),
+                    (
+                        "levels_window",
+                        Tuple(
+                            title=_("Minimum availability rolling window"),
+                            elements=[
+                                Percentage(title=_("Warning below"), default_value=99.99),
+                                Percentage(title=_("Critical below"), default_value=99.9),
+                            ],
+                        ),
+                    ),
+                    (
+                        "outages_day",
+                        Tuple(
+                            title=_("Maximum outages today"),
+                            elements=[
+                                Integer(title=_("Warning at"), default_value=1),
+                                Integer(title=_("Critical at"), default_value=5),
+                            ],
+                        ),
+                    ),
+                    (
+                        "outages_month",
+                        Tuple(
+                            title=_("Maximum outages last 30 days"),
+                            elements=[
+                                Integer(title=_("Warning at"), default_value=1),
+                                Integer(title=_("Critical at"), default_value=5),
+                            ],
+                        ),
+                    ),
+                    (
+                        "outages_window",
+                        Tuple(
+                            title=_("Maximum outages rolling window"),
+                            elements=[
+                                Integer(title=_("Warning at"), default_value=1),
+                                Integer(title=_("Critical at"), default_value=5),
+                            ],
+                        ),
+                    ),
+                ],
+            ),
+        ),
+        (
+            "modulation_period",
+            Integer(
+                title=_("Time in modulation: averaging period"),
+                help=_("Every channel keeps the share of time spent at each TX and RX "
+                       "modulation level. Older time fades out with this time constant."),
+                default_value=30,
+                minvalue=1,
+                unit=_("days"),
+            ),
+        ),
+        (
+            "modulation_below",
+            Dictionary(
+                title=_("Time in modulation: maximum share below a level"),
+                help=_("Warns if the TX or RX modulation spent more than the given share of "
+                       "time below the level, i.e. adaptive modulation cost throughput."),
+                elements=[
+                    (
+                        "level",
+                        DropdownChoice(
+                            title=_("Modulation level"),
+                            choices=[
+                                (0, "QPSK"),
+                                (1, "QAM16"),
+                                (2, "QAM32"),
+                                (3, "QAM64"),
+                                (4, "QAM128"),
+                                (5, "QAM256"),
+                                (6, "QAM512"),
+                                (7, "QAM1024"),
+                                (8, "QAM2048"),
+                                (9, "QAM4096"),
+                            ],
+                            default_value=5,
+                        ),
+                    ),
+                    (
+                        "levels",
+                        Tuple(
+                            title=_("Share of time below the level"),
+                            elements=[
+                                Percentage(title=_("Warning at"), default_value=1.0),
+                                Percentage(title=_("Critical at"), default_value=5.0),
+                            ],
+                        ),
+                    ),
+                ],
+                required_keys=["level"],
+            ),
+        ),
+        (
+            "dampening",
+            Dictionary(
+                title=_("Dampening of bandwidth and modulation changes"),
+                help=_("By default every bandwidth or modulation decrease warns for one "
+                       "check cycle and 4 or more changes within an hour are reported "
+                       "as flapping."),
+                elements=_dampening_elements() + [
+                    (
+                        "bandwidth_step",
+                        Integer(
+                            title=_("Minimum bandwidth change"),
+                            default_value=1,
+                            minvalue=1,
+                            unit=_("kHz"),
+                        ),
+                    ),
+                    (
+                        "modulation_step",
+                        Integer(
+                            title=_("Minimum modulation change"),
+                            default_value=1,
+                            minvalue=1,
+                            unit=_("levels"),
+                        ),
+                    ),
+                ],
+            ),
+        ),
+        _hop_dependent_element(),
     ])
 
 
@@ -64,3 +364,167 @@ rulespec_registry.register(
         title=lambda: _('Cablefree Diamond'),
     )
 )
+
+
+def _parameter_valuespec_cablefree_diamond_utilization():
+    return Dictionary(elements=[
+        (
+            "levels",
+            Tuple(
+                title=_("Maximum air utilization"),
+                help=_("Summed throughput of the switch ports in percent of the air capacity, "
+                       "the capacity of all locked local channels including both channels of "
+                       "an XPIC pair. Checked in both directions."),
+                elements=[
+                    Percentage(title=_("Warning at"), default_value=80.0),
+                    Percentage(title=_("Critical at"), default_value=95.0),
+                ],
+            ),
+        ),
+        (
+            "headroom",
+            Tuple(
+                title=_("Minimum headroom"),
+                help=_("Air capacity left over by the current throughput."),
+                elements=[
+                    Integer(title=_("Warning below"), default_value=100, unit=_("MBit/s")),
+                    Integer(title=_("Critical below"), default_value=20, unit=_("MBit/s")),
+                ],
+            ),
+        ),
+        (
+            "ports",
+            ListOfStrings(
+                title=_("Count only these ports"),
+                help=_("Names (ifName) or indices (ifIndex) of the switch ports whose traffic "
+                       "goes over the air. By default the interfaces whose ifIndex is the "
+                       "index of a port in the Diamond's switch port table are counted. If "
+                       "none matches, all interfaces of the ifXTable are counted, which may "
+                       "include internal interfaces and count traffic twice. Select the ports "
+                       "here in that case."),
+                orientation="horizontal",
+            ),
+        ),
+    ])
+
+
+rulespec_registry.register(
+    CheckParameterRulespecWithoutItem(
+        check_group_name='cablefree_diamond_utilization',
+        group=RulespecGroupCheckParametersApplications,
+        parameter_valuespec=_parameter_valuespec_cablefree_diamond_utilization,
+        title=lambda: _('Cablefree Diamond air utilization'),
+    )
+)
+
+
+def _parameter_valuespec_cablefree_diamond_link():
+    return Dictionary(elements=[
+        (
+            "rsl_asymmetry",
+            Tuple(
+                title=_("Maximum RSL asymmetry"),
+                help=_("Difference between the RSL received at the local and at the remote "
+                       "unit of a channel. A healthy hop is roughly symmetric."),
+                elements=[
+                    Float(title=_("Warning at"), default_value=6.0, unit=_("dB")),
+                    Float(title=_("Critical at"), default_value=10.0, unit=_("dB")),
+                ],
+            ),
+        ),
+        (
+            "snr_asymmetry",
+            Tuple(
+                title=_("Maximum SNR asymmetry"),
+                help=_("Difference between the SNR at the local and at the remote unit of "
+                       "a channel."),
+                elements=[
+                    Float(title=_("Warning at"), default_value=4.0, unit=_("dB")),
+                    Float(title=_("Critical at"), default_value=8.0, unit=_("dB")),
+                ],
+            ),
+        ),
+        _hop_dependent_element(),
+    ])
+
+
+rulespec_registry.register(
+    CheckParameterRulespecWithoutItem(
+        check_group_name='cablefree_diamond_link',
+        group=RulespecGroupCheckParametersApplications,
+        parameter_valuespec=_parameter_valuespec_cablefree_diamond_link,
+        title=lambda: _('Cablefree Diamond link asymmetry'),
+    )
+)
+
+
+def _parameter_valuespec_cablefree_diamond_ports():
+    return Dictionary(elements=[
+        (
+            "dampening",
+            Dictionary(
+                title=_("Dampening of link changes"),
+                help=_("By default a port warns as soon as its link is down and 4 or more "
+                       "link changes within an hour are reported as flapping."),
+                elements=_dampening_elements(),
+            ),
+        ),
+        (
+            "expected_up",
+            ListOfStrings(
+                title=_("Ports expected up (Diamond Ports)"),
+                help=_("Indices of the ports whose link down alerts in the aggregated "
+                       "service \"Diamond Ports\". By default the ports that were up at "
+                       "the service discovery are expected up. That list is frozen until "
+                       "the next service discovery: a port patched in later is not "
+                       "watched, and a port taken out of use keeps alerting, until the "
+                       "services of the host are rediscovered or the ports are set here."),
+                orientation="horizontal",
+            ),
+        ),
+    ])
+
+
+rulespec_registry.register(
+    CheckParameterRulespecWithoutItem(
+        check_group_name='cablefree_diamond_ports',
+        group=RulespecGroupCheckParametersApplications,
+        parameter_valuespec=_parameter_valuespec_cablefree_diamond_ports,
+        title=lambda: _('Cablefree Diamond ports'),
+    )
+)
+
+
+def _valuespec_cablefree_diamond_ports_discovery():
+    return Dictionary(
+        title=_('Cablefree Diamond port discovery'),
+        elements=[
+            (
+                "mode",
+                DropdownChoice(
+                    title=_("Port services"),
+                    help=_("The single service \"Diamond Ports\" checks all ports of a "
+                           "device in one pass and lists them in its details, which saves "
+                           "a service per port on large installations. It remembers the "
+                           "ports up at discovery as the ports expected up; rediscover "
+                           "the services after patching ports."),
+                    choices=[
+                        ("per_port", _("One service per port")),
+                        ("aggregated", _("One service for all ports of a device")),
+                        ("both", _("Both")),
+                    ],
+                    default_value="per_port",
+                ),
+            ),
+        ],
+        required_keys=["mode"],
+    )
+
+
+rulespec_registry.register(
+    HostRulespec(
+        group=RulespecGroupCheckParametersDiscovery,
+        match_type='dict',
+        name='cablefree_diamond_ports_discovery',
+        valuespec=_valuespec_cablefree_diamond_ports_discovery,
+    ))
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# Copyright (C) 2021  Marius Rieder <marius.rieder@durchmesser.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from cmk.gui.i18n import _
+from cmk.gui.valuespec import (
+    Dictionary,
+    DropdownChoice,
+    Float,
+    HostAddress,
+    Hostname,
+    Integer,
+    ListOf,
+    Password,
+    Tuple,
+)
+
+from cmk.gui.plugins.wato import (
+    HostRulespec,
+    rulespec_registry,
+)
+from cmk.gui.plugins.wato.datasource_programs import RulespecGroupDatasourceProgramsHardware
+
+
+def _valuespec_special_agents_cablefree_diamond():
+    return Dictionary(
+        title=_('CableFree Diamond via asynchronous SNMP'),
+        help=_('Polls the general, channel and port tables of CableFree Diamond radios '
+               'with a special agent instead of the Checkmk SNMP fetcher. Without a list '
+               'of radios the monitored host itself is polled. With a list of radios the '
+               'host acts as collector and the radios are polled concurrently and '
+               'delivered as piggyback data. Requires pysnmp on the Checkmk server.'),
+        elements=[
+            (
+                'community',
+                Password(
+                    title=_('SNMPv2c community'),
+                    allow_empty=False,
+                ),
+            ),
+            (
+                'port',
+                Integer(
+                    title=_('SNMP port'),
+                    default_value=161,
+                    minvalue=1,
+                    maxvalue=65535,
+                ),
+            ),
+            (
+                'timeout',
+                Float(
+                    title=_('Timeout per request'),
+                    default_value=2.0,
+                    unit=_('s'),
+                ),
+            ),
+            (
+                'retries',
+                Integer(
+                    title=_('Retries per request'),
+                    default_value=1,
+                    minvalue=0,
+                ),
+            ),
+            (
+                'host_timeout',
+                Float(
+                    title=_('Time budget per radio'),
+                    default_value=30.0,
+                    unit=_('s'),
+                ),
+            ),
+            (
+                'max_repetitions',
+                Integer(
+                    title=_('GETBULK max-repetitions'),
+                    default_value=10,
+                    minvalue=1,
+                    maxvalue=100,
+                ),
+            ),
+            (
+                'max_concurrency',
+                Integer(
+                    title=_('Radios polled in parallel'),
+                    default_value=32,
+                    minvalue=1,
+                ),
+            ),
+            (
+                'config_interval',
+                Integer(
+                    title=_('Fetch interval of the static configuration'),
+                    help=_('Frequencies, bandwidth, site name and port speed rarely change. '
+                           'They are fetched once per interval and replayed from a cache in '
+                           'between. 0 fetches them on every run.'),
+                    default_value=21600,
+                    minvalue=0,
+                    unit=_('s'),
+                ),
+            ),
+            (
+                'remote_piggyback',
+                DropdownChoice(
+                    title=_('Monitor the remote unit as piggyback host'),
+                    help=_('The local unit also reports the general and channel status of the '
+                           'remote unit of the hop. Send these rows as piggyback data to a host '
+                           'named after the site name or the IP address of the remote unit, '
+                           'instead of polling it over the air. Create that host (without an '
+                           'SNMP or agent data source) or use a host name translation for '
+                           'piggybacked hosts.'),
+                    choices=[
+                        ('site', _('Named after the site name of the remote unit')),
+                        ('ip', _('Named after the IP address of the remote unit')),
+                    ],
+                    default_value='site',
+                ),
+            ),
+            (
+                'radios',
+                ListOf(
+                    Tuple(
+                        orientation='horizontal',
+                        elements=[
+                            Hostname(title=_('Piggyback host name')),
+                            HostAddress(title=_('Address'), allow_empty=False),
+                        ],
+                    ),
+                    title=_('Radios polled by this collector host'),
+                    add_label=_('Add radio'),
+                ),
+            ),
+        ],
+        optional_keys=['port', 'timeout', 'retries', 'host_timeout', 'max_repetitions',
+                       'max_concurrency', 'config_interval', 'remote_piggyback', 'radios'],
+    )
+
+
+rulespec_registry.register(
+    HostRulespec(
+        group=RulespecGroupDatasourceProgramsHardware,
+        name='special_agents:cablefree_diamond',
+        valuespec=_valuespec_special_agents_cablefree_diamond,
+    ))